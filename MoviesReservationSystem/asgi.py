@@ -3,6 +3,14 @@ ASGI config for MoviesReservationSystem project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live seat stream (``/api/showtimes/<id>/seats/stream/``) keeps connections
+open, serve it through this module (as the compose ``web`` service does):
+
+    uvicorn MoviesReservationSystem.asgi:application --host 0.0.0.0 --port 8000 --workers 2
+
+Under WSGI (``runserver``, plain gunicorn) Django collects each stream into a
+list before sending it, so clients get nothing until it closes.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
 """
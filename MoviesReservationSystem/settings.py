@@ -29,9 +29,57 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = os.getenv("SECRET_KEY")
 STRIPE_PUBLIC_KEY = os.getenv("STRIPE_PUBLIC_KEY")
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
-STRIPE_WEBHOOK_KEY = os.getenv("STRIPE_WEBHOOK_SECRET")
+STRIPE_WEBHOOK_SECRET = os.getenv("STRIPE_WEBHOOK_SECRET")
+# payment phase runs outside the booking transaction, these bound how long it may take
+STRIPE_TIMEOUT = float(os.getenv("STRIPE_TIMEOUT", "10"))
+STRIPE_MAX_NETWORK_RETRIES = int(os.getenv("STRIPE_MAX_NETWORK_RETRIES", "2"))
+# refunds sent per second by process_refunds, well below Stripe's API rate limit
+STRIPE_REFUND_RATE = float(os.getenv("STRIPE_REFUND_RATE", "20"))
+STRIPE_REFUND_MAX_ATTEMPTS = int(os.getenv("STRIPE_REFUND_MAX_ATTEMPTS", "5"))
+# webhook events that keep failing are left in the inbox for a human after this
+STRIPE_EVENT_MAX_ATTEMPTS = int(os.getenv("STRIPE_EVENT_MAX_ATTEMPTS", "5"))
+# how long a Pending booking holds its seats while the customer pays
+SEAT_HOLD_TTL = timedelta(minutes=int(os.getenv("SEAT_HOLD_MINUTES", "10")))
+# how the reserve transaction locks seats: optimistic, select_for_update or
+# advisory (PostgreSQL only), see bookings/locking.py
+BOOKING_LOCK_STRATEGY = os.getenv("BOOKING_LOCK_STRATEGY", "optimistic")
+# seconds a reservation may wait for a lock (PostgreSQL lock_timeout)
+BOOKING_LOCK_TIMEOUT = float(os.getenv("BOOKING_LOCK_TIMEOUT", "2"))
+# retries after a lock timeout, with exponential backoff from BOOKING_LOCK_BACKOFF seconds
+BOOKING_LOCK_RETRIES = int(os.getenv("BOOKING_LOCK_RETRIES", "3"))
+BOOKING_LOCK_BACKOFF = float(os.getenv("BOOKING_LOCK_BACKOFF", "0.05"))
+# times a best-available booking re-picks its seats after losing a race
+BEST_AVAILABLE_ATTEMPTS = int(os.getenv("BEST_AVAILABLE_ATTEMPTS", "3"))
+# how long a booking create/cancel response is replayed for its Idempotency-Key
+IDEMPOTENCY_KEY_TTL = timedelta(hours=int(os.getenv("IDEMPOTENCY_KEY_HOURS", "24")))
+# a request still running after this long is taken to have died with its
+# worker, and a retry with the same Idempotency-Key runs it again
+IDEMPOTENCY_KEY_LEASE = timedelta(
+    seconds=int(os.getenv("IDEMPOTENCY_KEY_LEASE_SECONDS", "60"))
+)
+# directory for the shared memory-mapped seat availability bitmaps (use a tmpfs
+# such as /dev/shm/seatmaps), unset keeps the seat map on plain database queries
+SEAT_BITMAP_DIR = os.getenv("SEAT_BITMAP_DIR")
+# seat layouts are cached per screen, keyed by its layout version (bumped when
+# seats change)
+SEAT_LAYOUT_CACHE_TIMEOUT = int(os.getenv("SEAT_LAYOUT_CACHE_TIMEOUT", "3600"))
+# compiled price matrices, keyed by their inputs (base price, hour, screen type)
+PRICE_MATRIX_CACHE_TIMEOUT = int(os.getenv("PRICE_MATRIX_CACHE_TIMEOUT", "3600"))
+# live seat stream: database poll interval, idle heartbeat and how long one
+# connection stays open before the client is asked to reconnect (seconds)
+SEAT_STREAM_POLL_INTERVAL = float(os.getenv("SEAT_STREAM_POLL_INTERVAL", "1"))
+SEAT_STREAM_HEARTBEAT = float(os.getenv("SEAT_STREAM_HEARTBEAT", "15"))
+SEAT_STREAM_MAX_SECONDS = float(os.getenv("SEAT_STREAM_MAX_SECONDS", "300"))
 EMAIL_BACKEND = os.getenv("EMAIL_BACKEND")
 EMAIL_HOST_USER = os.getenv("EMAIL_HOST_USER")
+# outbox retries back off exponentially from EMAIL_RETRY_DELAY seconds
+EMAIL_RETRY_DELAY = int(os.getenv("EMAIL_RETRY_DELAY", "60"))
+EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", "6"))
+# a mailer claims the emails it sends for this long, so concurrent mailers never
+# send the same email twice (unless one is stuck on its batch past the lease)
+EMAIL_SEND_LEASE = timedelta(seconds=int(os.getenv("EMAIL_SEND_LEASE_SECONDS", "300")))
+# rows fetched per round trip by the booking exports (server-side cursor on Postgres)
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "2000"))
 
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv("DEBUG", "False") == "True"
@@ -201,3 +249,16 @@ else:
     }
 
 STATIC_ROOT = BASE_DIR / "staticfiles"
+
+# Cache (per-process memory by default; a shared backend such as
+# django.core.cache.backends.redis.RedisCache saves memory and warm-up with
+# several workers, but correctness never depends on it: cached layouts and
+# prices are keyed by versions and inputs read from the database)
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", ""),
+    }
+}
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking, Ticket
+from .models import Booking, Ticket, StripeEvent, OutgoingEmail, Refund, SalesRollup
 
 
 # Register your models here.
@@ -19,3 +19,28 @@ class BookingAdmin(admin.ModelAdmin):
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
     list_display = ("booking", "seat")
+
+
+@admin.register(StripeEvent)
+class StripeEventAdmin(admin.ModelAdmin):
+    list_display = ("event_id", "type", "received_at", "processed_at", "attempts")
+    list_filter = ("type", "processed_at")
+    search_fields = ("event_id",)
+
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ("booking", "kind", "status", "attempts", "next_attempt_at")
+    list_filter = ("kind", "status")
+
+
+@admin.register(Refund)
+class RefundAdmin(admin.ModelAdmin):
+    list_display = ("booking", "amount", "status", "attempts", "processed_at")
+    list_filter = ("status",)
+
+
+@admin.register(SalesRollup)
+class SalesRollupAdmin(admin.ModelAdmin):
+    list_display = ("day", "theater", "screen", "movie", "seat_type", "tickets_sold")
+    list_filter = ("day", "seat_type")
@@ -0,0 +1,63 @@
+"""
+Best-available seat allocation.
+
+Picks `count` adjacent free seats from a showtime's occupancy flags with a
+single pass over the layout: every row is split into runs of free,
+consecutively numbered seats (of the wanted type), and the run closest to the
+centre row, then closest to the middle of its row, wins.
+"""
+
+from .pricing import normalize_seat_type
+
+
+def _free_runs(layout, taken_flags, seat_type):
+    """Yield (row index, row, numbers of a run) for every free run."""
+    for row_index, (row, start, numbers) in enumerate(layout.rows):
+        run = []
+        for ordinal, number in enumerate(numbers, start):
+            usable = not taken_flags[ordinal] and (
+                seat_type is None
+                or normalize_seat_type(layout.seat_types[ordinal]) == seat_type
+            )
+            # a gap in the numbering (aisle, missing seat) also ends a run
+            if not usable or (run and number != run[-1] + 1):
+                if run:
+                    yield row_index, row, run
+                run = []
+            if usable:
+                run.append(number)
+        if run:
+            yield row_index, row, run
+
+
+def find_best_available(layout, taken_flags, count, seat_type=None):
+    """
+    Return [(row, number), ...] for the best block of `count` adjacent free
+    seats, or None when no row has one.
+    """
+    if seat_type is not None:
+        seat_type = normalize_seat_type(seat_type)
+    centre_row = (len(layout.rows) - 1) / 2
+
+    best = None
+    for row_index, row, run in _free_runs(layout, taken_flags, seat_type):
+        if len(run) < count:
+            continue
+        row_numbers = layout.rows[row_index][2]
+        row_middle = (row_numbers[0] + row_numbers[-1]) / 2
+
+        # slide the block as close to the middle of the row as the run allows
+        ideal_first = round(row_middle - (count - 1) / 2)
+        first = min(max(ideal_first, run[0]), run[-1] - count + 1)
+
+        score = (
+            abs(row_index - centre_row),
+            abs(first + (count - 1) / 2 - row_middle),
+        )
+        if best is None or score < best[0]:
+            best = (score, row, first)
+
+    if best is None:
+        return None
+    _, row, first = best
+    return [(row, number) for number in range(first, first + count)]
@@ -0,0 +1,364 @@
+"""
+Concurrency benchmark for the booking path.
+
+Drives booking, cancel and webhook-confirm journeys from a pool of threads
+through the real API views against the configured database, with Stripe
+stubbed out. Seats are picked from a small "hot" block so requests really
+fight over them. A confirm worker applies the webhook inbox while the
+journeys run, as `process_stripe_events --loop` would, so its latency (event
+received to booking confirmed) and its lock contention show in the report.
+Used by `manage.py bench_bookings` and bookings/test_benchmark.py.
+
+Every run builds its own theater, screen, showtime and users and deletes them
+afterwards (unless keep=True), so it can point at a scratch copy of a real
+database. Do not run it against production. The caller has to provide the
+test client environment (django.test.utils.setup_test_environment), the test
+runner does that for the test module and the command does it itself.
+"""
+
+import contextlib
+import io
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DatabaseError, connections
+from django.db.models import Count
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from .models import Booking, Ticket, StripeEvent
+from .stripe_events import process_stripe_events
+
+
+LOCK_ERRORS = (
+    "very busy",  # reserve_booking gave up after its lock retries
+    "database is locked",
+    "deadlock",
+    "could not obtain lock",
+    "lock timeout",
+)
+
+
+def percentile(samples, pct):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+def _fake_payment_intent(**kwargs):
+    booking_id = kwargs["metadata"]["booking_id"]
+    return {"id": f"pi_bench_{booking_id}", "client_secret": f"secret_{booking_id}"}
+
+
+def _webhook_event(payload, sig_header, secret):
+    return json.loads(payload)
+
+
+class _Fixture:
+    def __init__(self, rows, seats_per_row, users):
+        self.tag = uuid.uuid4().hex[:8]
+        self.theater = Theater.objects.create(name=f"Bench {self.tag}", city="Bench")
+        self.screen = Screen.objects.create(
+            name="Bench Screen", theater=self.theater, capacity=rows * seats_per_row
+        )
+        Seat.objects.bulk_create(
+            Seat(screen=self.screen, row=chr(ord("A") + r), number=n)
+            for r in range(rows)
+            for n in range(1, seats_per_row + 1)
+        )
+        self.movie = Movie.objects.create(
+            title=f"Bench {self.tag}", duration=90, release_date=timezone.now().date()
+        )
+        self.showtime = Showtime.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+        User.objects.bulk_create(
+            User(username=f"bench_{self.tag}_{i}") for i in range(users)
+        )
+        # re-read, bulk_create does not return ids on every backend
+        self.users = list(
+            User.objects.filter(username__startswith=f"bench_{self.tag}_")
+        )
+        self.seats = list(
+            Seat.objects.filter(screen=self.screen)
+            .order_by("row", "number")
+            .values_list("row", "number")
+        )
+
+    def delete(self):
+        StripeEvent.objects.filter(
+            event_id__startswith=f"evt_bench_{self.tag}"
+        ).delete()
+        User.objects.filter(username__startswith=f"bench_{self.tag}_").delete()
+        self.movie.delete()
+        self.theater.delete()
+
+
+class _Recorder:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.outcomes = defaultdict(Counter)
+
+    def record(self, kind, seconds, outcome):
+        with self.lock:
+            self.latencies[kind].append(seconds)
+            self.outcomes[kind][outcome] += 1
+
+
+def _outcome(response=None, error=None):
+    if error is not None:
+        text = str(error).lower()
+    elif response.status_code < 400:
+        return "ok"
+    else:
+        text = str(getattr(response, "data", "")).lower()
+    if any(marker in text for marker in LOCK_ERRORS):
+        return "lock_error"
+    if response is not None and "already booked" in text:
+        return "conflict"
+    return "error"
+
+
+def _timed(recorder, kind, request):
+    started = time.perf_counter()
+    try:
+        response = request()
+    except Exception as e:
+        recorder.record(kind, time.perf_counter() - started, _outcome(error=e))
+        return None
+    recorder.record(kind, time.perf_counter() - started, _outcome(response))
+    return response
+
+
+def _journey(client, rng, fixture, options, recorder):
+    user = rng.choice(fixture.users)
+    client.force_authenticate(user=user)
+
+    hot = fixture.seats[: options["hot_seats"]]
+    picked = rng.sample(hot, min(options["seats_per_booking"], len(hot)))
+    response = _timed(
+        recorder,
+        "book",
+        lambda: client.post(
+            reverse("booking-list"),
+            {
+                "showtime_id": fixture.showtime.id,
+                "seats": [{"row": row, "number": number} for row, number in picked],
+            },
+            format="json",
+        ),
+    )
+    if response is None or response.status_code != 201:
+        return
+    booking_id = response.data["id"]
+
+    if rng.random() < options["cancel_ratio"]:
+        _timed(
+            recorder,
+            "cancel",
+            lambda: client.post(reverse("booking-cancel", args=[booking_id])),
+        )
+    elif rng.random() < options["confirm_ratio"]:
+        event = {
+            "id": f"evt_bench_{fixture.tag}_{booking_id}",
+            "type": "payment_intent.succeeded",
+            "data": {
+                "object": {
+                    "id": f"pi_bench_{booking_id}",
+                    "metadata": {"booking_id": str(booking_id)},
+                }
+            },
+        }
+        _timed(
+            recorder,
+            "webhook",
+            lambda: client.post(
+                reverse("stripe-webhook"),
+                json.dumps(event),
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE="bench",
+            ),
+        )
+
+
+def _confirm_worker(stop, batch_size):
+    # drains the inbox until asked to stop, then once more for the stragglers
+    try:
+        while True:
+            stopping = stop.is_set()
+            try:
+                if process_stripe_events(batch_size=batch_size):
+                    continue
+            except DatabaseError:
+                # recording a failed event can hit the same lock, run again
+                time.sleep(0.005)
+                continue
+            if stopping:
+                return
+            time.sleep(0.005)
+    finally:
+        connections.close_all()
+
+
+def run_benchmark(
+    workers=16,
+    journeys=500,
+    seats_per_booking=2,
+    hot_seats=40,
+    cancel_ratio=0.2,
+    confirm_ratio=0.5,
+    rows=10,
+    seats_per_row=20,
+    users=50,
+    seed=None,
+    keep=False,
+):
+    """Run the benchmark and return a report dict (see format_report)."""
+    options = {
+        "seats_per_booking": seats_per_booking,
+        "hot_seats": hot_seats,
+        "cancel_ratio": cancel_ratio,
+        "confirm_ratio": confirm_ratio,
+    }
+    seed = random.randrange(2**32) if seed is None else seed
+    recorder = _Recorder()
+    remaining = [journeys]
+    remaining_lock = threading.Lock()
+
+    fixture = _Fixture(rows, seats_per_row, users)
+    try:
+
+        def worker(index):
+            client = APIClient()
+            rng = random.Random(seed + index)
+            try:
+                while True:
+                    with remaining_lock:
+                        if remaining[0] <= 0:
+                            return
+                        remaining[0] -= 1
+                    _journey(client, rng, fixture, options, recorder)
+            finally:
+                connections.close_all()
+
+        stop = threading.Event()
+        confirmer = threading.Thread(target=_confirm_worker, args=(stop, 100))
+        # without the confirm worker's per-event log
+        with patch(
+            "stripe.PaymentIntent.create", side_effect=_fake_payment_intent
+        ), patch(
+            "stripe.Webhook.construct_event", side_effect=_webhook_event
+        ), contextlib.redirect_stdout(io.StringIO()):
+            threads = [
+                threading.Thread(target=worker, args=(i,)) for i in range(workers)
+            ]
+            started = time.perf_counter()
+            confirmer.start()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            stop.set()
+            confirmer.join()
+            elapsed = time.perf_counter() - started
+
+        report = _report(fixture, recorder, elapsed, workers, journeys, seed)
+    finally:
+        if not keep:
+            fixture.delete()
+
+    return report
+
+
+def _record_confirms(fixture, recorder):
+    # time from the webhook's insert to the worker applying the event; one it
+    # never applied counts as waiting until now
+    now = timezone.now()
+    events = StripeEvent.objects.filter(
+        event_id__startswith=f"evt_bench_{fixture.tag}"
+    ).values_list("received_at", "processed_at", "last_error")
+    for received_at, processed_at, last_error in events:
+        if processed_at is not None:
+            outcome = "ok"
+        elif any(marker in last_error.lower() for marker in LOCK_ERRORS):
+            outcome = "lock_error"
+        else:
+            outcome = "error"
+        seconds = ((processed_at or now) - received_at).total_seconds()
+        recorder.record("confirm", seconds, outcome)
+
+
+def _report(fixture, recorder, elapsed, workers, journeys, seed):
+    # api requests only, the confirms below are the worker's, not the clients'
+    requests = sum(len(samples) for samples in recorder.latencies.values())
+    lock_errors = sum(
+        outcomes["lock_error"] for outcomes in recorder.outcomes.values()
+    )
+    _record_confirms(fixture, recorder)
+    double_booked = (
+        Ticket.objects.filter(showtime=fixture.showtime, is_active=True)
+        .values("seat")
+        .annotate(holders=Count("id"))
+        .filter(holders__gt=1)
+        .count()
+    )
+    return {
+        "lock_strategy": settings.BOOKING_LOCK_STRATEGY,
+        "workers": workers,
+        "journeys": journeys,
+        "seed": seed,
+        "elapsed": elapsed,
+        "requests": requests,
+        "throughput": requests / elapsed if elapsed else 0.0,
+        "lock_error_rate": lock_errors / requests if requests else 0.0,
+        "double_booked_seats": double_booked,
+        "confirmed_bookings": Booking.objects.filter(
+            showtime=fixture.showtime, status="Confirmed"
+        ).count(),
+        "operations": {
+            kind: {
+                "count": len(samples),
+                "p50_ms": percentile(samples, 50) * 1000,
+                "p99_ms": percentile(samples, 99) * 1000,
+                "outcomes": dict(recorder.outcomes[kind]),
+            }
+            for kind, samples in recorder.latencies.items()
+        },
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{report['journeys']} journeys on {report['workers']} workers "
+        f"in {report['elapsed']:.2f}s (seed {report['seed']}, "
+        f"{report['lock_strategy']} locking)",
+        f"throughput:      {report['throughput']:.1f} requests/s",
+        f"lock error rate: {report['lock_error_rate']:.2%}",
+        f"double-booked:   {report['double_booked_seats']} seats",
+        f"confirmed:       {report['confirmed_bookings']} bookings",
+    ]
+    for kind, stats in sorted(report["operations"].items()):
+        outcomes = ", ".join(
+            f"{outcome}={count}" for outcome, count in sorted(stats["outcomes"].items())
+        )
+        lines.append(
+            f"{kind:<8} n={stats['count']:<6} p50={stats['p50_ms']:.1f}ms "
+            f"p99={stats['p99_ms']:.1f}ms  {outcomes}"
+        )
+    return "\n".join(lines)
@@ -0,0 +1,122 @@
+"""
+Streaming booking/ticket exports for staff.
+
+One row per ticket with its booking, showtime, movie, theater and seat,
+fetched as plain tuples through `values_list().iterator(chunk_size=...)`.
+On Postgres that is a server-side cursor, so only EXPORT_CHUNK_SIZE rows are
+ever in memory however large the export is; every row is encoded and handed
+to the caller (the HTTP response or the management command) as soon as it
+arrives. Behind a transaction-pooling pgbouncer set
+DISABLE_SERVER_SIDE_CURSORS and the driver buffers each chunk instead.
+
+Under ASGI Django cannot stream a plain iterator, it would collect the whole
+export into a list first; `async_lines` wraps the lines for that case.
+"""
+
+import csv
+import json
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import Ticket
+
+
+# (header, Ticket lookup)
+COLUMNS = [
+    ("ticket_id", "id"),
+    ("booking_id", "booking_id"),
+    ("booking_status", "booking__status"),
+    ("booked_at", "booking__created_at"),
+    ("user", "booking__user__username"),
+    ("email", "booking__user__email"),
+    ("payment_intent", "booking__stripe_payment_intent"),
+    ("showtime_id", "showtime_id"),
+    ("starts_at", "showtime__start_time"),
+    ("movie", "showtime__movie__title"),
+    ("theater", "showtime__screen__theater__name"),
+    ("screen", "showtime__screen__name"),
+    ("seat", "seat__row"),
+    ("seat_number", "seat__number"),
+    ("seat_type", "seat__seat_type"),
+    ("price", "price"),
+    ("active", "is_active"),
+]
+HEADERS = [header for header, _ in COLUMNS]
+
+FORMATS = ("csv", "jsonl")
+CONTENT_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+
+def _day_start(day):
+    return timezone.make_aware(
+        datetime.combine(day, time.min), timezone.get_current_timezone()
+    )
+
+
+def export_rows(start=None, end=None, theater=None, status=None):
+    """
+    Lazily yield one tuple per ticket (in COLUMNS order) of the bookings made
+    between the start and end days (inclusive), optionally of one theater and
+    one booking status.
+    """
+    tickets = Ticket.objects.all()
+    if start:
+        tickets = tickets.filter(booking__created_at__gte=_day_start(start))
+    if end:
+        tickets = tickets.filter(
+            booking__created_at__lt=_day_start(end + timedelta(days=1))
+        )
+    if theater:
+        tickets = tickets.filter(showtime__screen__theater_id=theater)
+    if status:
+        tickets = tickets.filter(booking__status=status)
+
+    # ticket id order, the database can walk the primary key instead of sorting
+    return (
+        tickets.order_by("id")
+        .values_list(*(lookup for _, lookup in COLUMNS))
+        .iterator(chunk_size=settings.EXPORT_CHUNK_SIZE)
+    )
+
+
+class _Line:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(HEADERS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(dict(zip(HEADERS, row)), cls=DjangoJSONEncoder) + "\n"
+
+
+def encode(rows, output):
+    """Encode export rows as text lines of the given output format."""
+    return csv_lines(rows) if output == "csv" else jsonl_lines(rows)
+
+
+async def async_lines(lines):
+    """
+    Async iterator over encoded lines for an ASGI response. Every
+    EXPORT_CHUNK_SIZE lines are read in the request's sync thread (where the
+    cursor lives) and sent as one chunk, so memory stays at one chunk.
+    """
+    next_chunk = sync_to_async(lambda: list(islice(lines, settings.EXPORT_CHUNK_SIZE)))
+    while True:
+        chunk = await next_chunk()
+        if not chunk:
+            return
+        yield "".join(chunk)
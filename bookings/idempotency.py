@@ -0,0 +1,134 @@
+"""
+Idempotency-Key support for unsafe booking endpoints.
+
+A client that retries a request with the same Idempotency-Key header gets the
+first response replayed (marked with an Idempotent-Replayed header) instead of
+running the view again, so a retried booking never claims seats or creates a
+PaymentIntent twice. A retry costs one lookup on the (user, key) unique index.
+"""
+
+import functools
+import hashlib
+import json
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+
+HEADER = "Idempotency-Key"
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(
+        f"{request.method} {request.path}\n{body}".encode()
+    ).hexdigest()
+
+
+def idempotent(view_method):
+    """Make a viewset method replay its first response for a repeated key."""
+
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response(
+                {"error": f"{HEADER} must be at most 255 characters."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        fingerprint = _fingerprint(request)
+        record = IdempotencyKey.objects.filter(user=request.user, key=key).first()
+        if record is not None and record.expires_at <= timezone.now():
+            record.delete()
+            record = None
+
+        if record is None:
+            try:
+                with transaction.atomic():
+                    record = IdempotencyKey.objects.create(
+                        user=request.user,
+                        key=key,
+                        fingerprint=fingerprint,
+                        expires_at=timezone.now() + settings.IDEMPOTENCY_KEY_TTL,
+                    )
+            except IntegrityError:
+                # a concurrent retry claimed the key first
+                record = None
+            else:
+                return _run_and_store(
+                    record, view_method, self, request, *args, **kwargs
+                )
+
+        # checked before any takeover, a different request never reuses the key
+        if record is not None and record.fingerprint != fingerprint:
+            return Response(
+                {"error": f"This {HEADER} was already used for a different request."},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+
+        if record is not None and record.status_code is None:
+            record = _take_over_abandoned(record)
+            if record is not None:
+                return _run_and_store(
+                    record, view_method, self, request, *args, **kwargs
+                )
+
+        if record is None or record.status_code is None:
+            return Response(
+                {"error": f"A request with this {HEADER} is still in progress."},
+                status=status.HTTP_409_CONFLICT,
+            )
+
+        return Response(
+            record.response,
+            status=record.status_code,
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    return wrapper
+
+
+def _take_over_abandoned(record):
+    """
+    Claim an in-progress key whose lease ran out (its worker was killed before
+    storing a response), for a retry of the same request. Returns the record,
+    or None when it is still running or another retry took it over first.
+    """
+    now = timezone.now()
+    if record.created_at > now - settings.IDEMPOTENCY_KEY_LEASE:
+        return None
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk, status_code__isnull=True, created_at=record.created_at
+    ).update(created_at=now)
+    if not taken:
+        return None
+    record.created_at = now
+    return record
+
+
+def _run_and_store(record, view_method, viewset, request, *args, **kwargs):
+    try:
+        response = view_method(viewset, request, *args, **kwargs)
+    except Exception:
+        record.delete()
+        raise
+
+    if response.status_code >= 500:
+        # nothing was kept (e.g. the payment phase rolled back), let the retry run
+        record.delete()
+        return response
+
+    # store what the client saw, so a replay is byte-for-byte the same json
+    record.status_code = response.status_code
+    record.response = json.loads(JSONRenderer().render(response.data))
+    record.save(update_fields=["status_code", "response"])
+    return response
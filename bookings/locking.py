@@ -0,0 +1,79 @@
+"""
+Seat-locking strategies for the reserve transaction, chosen per deployment
+with BOOKING_LOCK_STRATEGY:
+
+- "optimistic" (default): no extra locks, the tickets are inserted and the
+  partial unique index on active (showtime, seat) rejects a taken seat.
+- "select_for_update": lock the requested seat rows first, so requests for
+  the same seats queue up instead of racing to the insert.
+- "advisory": serialize every reservation of a showtime on a Postgres
+  transaction-level advisory lock (Postgres only).
+
+The unique index stays the correctness guarantee in every mode; the locks
+only change how contention is handled. Lock waits are bounded by
+BOOKING_LOCK_TIMEOUT (Postgres lock_timeout), and reserve_booking retries
+when a wait times out or SQLite reports that the database is locked.
+"""
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection
+
+from movies.models import Seat
+
+
+STRATEGIES = ("optimistic", "select_for_update", "advisory")
+
+# first key of the two-int advisory lock, keeps ours apart from other users
+ADVISORY_NAMESPACE = 0x5EA7
+
+# lock_not_available (lock_timeout hit) and deadlock_detected
+_POSTGRES_LOCK_ERRORS = ("55P03", "40P01")
+
+
+def get_strategy():
+    strategy = settings.BOOKING_LOCK_STRATEGY
+    if strategy not in STRATEGIES:
+        raise ImproperlyConfigured(
+            f"BOOKING_LOCK_STRATEGY must be one of {', '.join(STRATEGIES)}."
+        )
+    if strategy == "advisory" and connection.vendor != "postgresql":
+        raise ImproperlyConfigured(
+            "The advisory BOOKING_LOCK_STRATEGY needs PostgreSQL."
+        )
+    return strategy
+
+
+def lock_seats(showtime, seats):
+    """Take the configured locks, must be called inside the reserve transaction."""
+    strategy = get_strategy()
+
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            # SET LOCAL only lasts until the end of this transaction
+            cursor.execute(
+                "SELECT set_config('lock_timeout', %s, true)",
+                [f"{int(settings.BOOKING_LOCK_TIMEOUT * 1000)}ms"],
+            )
+
+    if strategy == "select_for_update":
+        # always lock in id order, so two overlapping requests cannot deadlock
+        list(
+            Seat.objects.select_for_update()
+            .filter(id__in=[seat.id for seat in seats])
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+    elif strategy == "advisory":
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT pg_advisory_xact_lock(%s, %s)",
+                [ADVISORY_NAMESPACE, showtime.id],
+            )
+
+
+def is_lock_error(error):
+    """True for errors that mean "waited too long for a lock", worth a retry."""
+    if getattr(error.__cause__, "pgcode", None) in _POSTGRES_LOCK_ERRORS:
+        return True
+    return "database is locked" in str(error)
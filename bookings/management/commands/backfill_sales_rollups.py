@@ -0,0 +1,39 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.rollups import rebuild, reconcile
+
+
+class Command(BaseCommand):
+    help = "Rebuild the sales rollups from the confirmed tickets."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--since",
+            help="First screening day to rebuild (YYYY-MM-DD), default: the first",
+        )
+        parser.add_argument(
+            "--until",
+            help="Last screening day to rebuild (YYYY-MM-DD), default: the last",
+        )
+        parser.add_argument(
+            "--reconcile",
+            action="store_true",
+            help="Only fix the rows that drifted, safe while bookings are live",
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            since = date.fromisoformat(kwargs["since"]) if kwargs["since"] else None
+            until = date.fromisoformat(kwargs["until"]) if kwargs["until"] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        if kwargs["reconcile"]:
+            fixed = reconcile(since, until)
+            self.stdout.write(self.style.SUCCESS(f"Fixed {fixed} sales rollup rows."))
+            return
+
+        written = rebuild(since, until)
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} sales rollup rows."))
@@ -0,0 +1,85 @@
+import json
+
+from django.core.management.base import BaseCommand
+from django.test.utils import (
+    override_settings,
+    setup_test_environment,
+    teardown_test_environment,
+)
+
+from bookings.benchmark import format_report, run_benchmark
+from bookings.locking import STRATEGIES
+
+
+class Command(BaseCommand):
+    help = (
+        "Stress the booking path with concurrent book/cancel/confirm journeys "
+        "(Stripe stubbed) and report throughput, latency, lock errors and "
+        "double-booked seats. Writes to the configured database, never run it "
+        "against production."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=16)
+        parser.add_argument("--journeys", type=int, default=500)
+        parser.add_argument("--seats-per-booking", type=int, default=2)
+        parser.add_argument(
+            "--hot-seats",
+            type=int,
+            default=40,
+            help="Seats are picked from this many seats, fewer means more contention",
+        )
+        parser.add_argument("--cancel-ratio", type=float, default=0.2)
+        parser.add_argument("--confirm-ratio", type=float, default=0.5)
+        parser.add_argument("--rows", type=int, default=10)
+        parser.add_argument("--seats-per-row", type=int, default=20)
+        parser.add_argument("--users", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=None)
+        parser.add_argument(
+            "--lock-strategy",
+            choices=STRATEGIES,
+            default=None,
+            help="Override BOOKING_LOCK_STRATEGY for this run",
+        )
+        parser.add_argument(
+            "--keep", action="store_true", help="Keep the generated showtime data"
+        )
+        parser.add_argument(
+            "--json", action="store_true", help="Print the report as JSON"
+        )
+
+    def handle(self, *args, **kwargs):
+        # the api is driven through the test client (testserver host, locmem email)
+        setup_test_environment()
+        overrides = {}
+        if kwargs["lock_strategy"]:
+            overrides["BOOKING_LOCK_STRATEGY"] = kwargs["lock_strategy"]
+        try:
+            with override_settings(**overrides):
+                report = run_benchmark(
+                    workers=kwargs["workers"],
+                    journeys=kwargs["journeys"],
+                    seats_per_booking=kwargs["seats_per_booking"],
+                    hot_seats=kwargs["hot_seats"],
+                    cancel_ratio=kwargs["cancel_ratio"],
+                    confirm_ratio=kwargs["confirm_ratio"],
+                    rows=kwargs["rows"],
+                    seats_per_row=kwargs["seats_per_row"],
+                    users=kwargs["users"],
+                    seed=kwargs["seed"],
+                    keep=kwargs["keep"],
+                )
+        finally:
+            teardown_test_environment()
+
+        if kwargs["json"]:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(format_report(report))
+
+        if report["double_booked_seats"]:
+            self.stderr.write(
+                self.style.ERROR(
+                    f"{report['double_booked_seats']} seats were double-booked!"
+                )
+            )
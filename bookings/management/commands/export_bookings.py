@@ -0,0 +1,51 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from bookings.exports import FORMATS, encode, export_rows
+from bookings.models import Booking
+
+
+class Command(BaseCommand):
+    help = "Stream tickets with their booking, showtime and seat as CSV or JSON lines."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--output", choices=FORMATS, default="csv")
+        parser.add_argument("--file", help="Write to this file instead of stdout")
+        parser.add_argument("--start", help="First booking day (YYYY-MM-DD)")
+        parser.add_argument("--end", help="Last booking day (YYYY-MM-DD)")
+        parser.add_argument("--theater", type=int, help="Theater id")
+        parser.add_argument(
+            "--status", choices=[value for value, _ in Booking.STATUS_CHOICES]
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            start = date.fromisoformat(kwargs["start"]) if kwargs["start"] else None
+            end = date.fromisoformat(kwargs["end"]) if kwargs["end"] else None
+        except ValueError as e:
+            raise CommandError(f"Invalid date: {e}")
+
+        lines = encode(
+            export_rows(
+                start=start,
+                end=end,
+                theater=kwargs["theater"],
+                status=kwargs["status"],
+            ),
+            kwargs["output"],
+        )
+
+        if not kwargs["file"]:
+            for line in lines:
+                self.stdout.write(line, ending="")
+            return
+
+        count = -1 if kwargs["output"] == "csv" else 0  # the csv header
+        with open(kwargs["file"], "w", newline="", encoding="utf-8") as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        self.stderr.write(
+            self.style.SUCCESS(f"Exported {count} tickets to {kwargs['file']}.")
+        )
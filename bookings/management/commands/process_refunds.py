@@ -0,0 +1,59 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.models import Refund
+from bookings.services import process_refunds
+
+
+class Command(BaseCommand):
+    help = (
+        "Send queued refunds and payment cancellations to Stripe in "
+        "rate-limited batches."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and check for new refunds every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep when there is nothing to refund in --loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Refunds sent between progress reports",
+        )
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=None,
+            help="Maximum Stripe calls per second (default: STRIPE_REFUND_RATE)",
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs["loop"]
+        interval = kwargs["interval"]
+        batch_size = kwargs["batch_size"]
+        rate = kwargs["rate"]
+
+        while True:
+            succeeded, failed = process_refunds(batch_size=batch_size, rate=rate)
+            pending = Refund.objects.filter(status="pending").count()
+            if succeeded or failed or not loop:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Refunded {succeeded}, failed {failed}, {pending} pending."
+                    )
+                )
+            # keep going while full batches come back, otherwise wait for more
+            if succeeded + failed < batch_size:
+                if not loop:
+                    return
+                time.sleep(interval)
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.stripe_events import process_stripe_events
+
+
+class Command(BaseCommand):
+    help = "Apply the Stripe webhook events waiting in the inbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and drain the inbox every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=1.0,
+            help="Seconds to sleep between runs in --loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Maximum number of events fetched per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs["loop"]
+        interval = kwargs["interval"]
+        batch_size = kwargs["batch_size"]
+
+        while True:
+            processed = self.drain(batch_size)
+            if processed or not loop:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Processed {processed} Stripe events.")
+                )
+            if not loop:
+                return
+            time.sleep(interval)
+
+    def drain(self, batch_size):
+        total = 0
+        while True:
+            processed = process_stripe_events(batch_size=batch_size)
+            total += processed
+            if processed < batch_size:
+                return total
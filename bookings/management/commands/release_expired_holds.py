@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.services import release_expired_holds
+
+
+class Command(BaseCommand):
+    help = "Release the seats of Pending bookings whose hold has expired."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and sweep every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between sweeps in --loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Maximum number of bookings expired per UPDATE",
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs["loop"]
+        interval = kwargs["interval"]
+        batch_size = kwargs["batch_size"]
+
+        while True:
+            released = self.sweep(batch_size)
+            if released or not loop:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Released {released} expired holds.")
+                )
+            if not loop:
+                return
+            time.sleep(interval)
+
+    def sweep(self, batch_size):
+        # drain in batches so a backlog never turns into one huge transaction
+        total = 0
+        while True:
+            released = release_expired_holds(batch_size=batch_size)
+            total += released
+            if released < batch_size:
+                return total
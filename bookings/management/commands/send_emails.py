@@ -0,0 +1,53 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from bookings.utils import send_pending_emails
+
+
+class Command(BaseCommand):
+    help = "Send the emails waiting in the outbox over one reused connection."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and send every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=5.0,
+            help="Seconds to sleep between runs in --loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=50,
+            help="Maximum number of emails sent per connection",
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs["loop"]
+        interval = kwargs["interval"]
+        batch_size = kwargs["batch_size"]
+
+        while True:
+            sent, failed = self.drain(batch_size)
+            if sent or failed or not loop:
+                self.stdout.write(
+                    self.style.SUCCESS(f"Sent {sent} emails, {failed} failed.")
+                )
+            if not loop:
+                return
+            time.sleep(interval)
+
+    def drain(self, batch_size):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = send_pending_emails(batch_size=batch_size)
+            total_sent += sent
+            total_failed += failed
+            # failed emails are rescheduled, leave them for a later run
+            if sent + failed < batch_size or failed:
+                return total_sent, total_failed
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-18 10:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def populate_ticket_showtime(apps, schema_editor):
+    Booking = apps.get_model("bookings", "Booking")
+    Ticket = apps.get_model("bookings", "Ticket")
+
+    # one UPDATE for all tickets, copying the showtime from their booking
+    Ticket.objects.update(
+        showtime=Subquery(
+            Booking.objects.filter(pk=OuterRef("booking_id")).values("showtime")[:1]
+        )
+    )
+
+    # tickets of cancelled bookings must not hold their seats any more
+    Ticket.objects.filter(booking__status="Cancelled").update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0003_booking_stripe_payment_intent'),
+        ('movies', '0004_movie_base_price'),
+        ('shows', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticket',
+            name='is_active',
+            field=models.BooleanField(default=True, help_text='Inactive tickets no longer hold their seat.'),
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='showtime',
+            field=models.ForeignKey(editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='shows.showtime'),
+        ),
+        migrations.RunPython(populate_ticket_showtime, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='ticket',
+            name='showtime',
+            field=models.ForeignKey(editable=False, on_delete=django.db.models.deletion.CASCADE, related_name='tickets', to='shows.showtime'),
+        ),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('showtime', 'seat'), name='unique_active_ticket_per_showtime_seat'),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0005_booking_expires_at_alter_booking_status_and_more'),
+        ('shows', '0002_seatevent'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='booking_user_history_idx'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_idempotencykey'),
+        ('movies', '0005_alter_screen_screen_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('seat_type', models.CharField(max_length=10)),
+                ('tickets_sold', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.movie')),
+                ('screen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.screen')),
+                ('theater', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='movies.theater')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('day', 'screen', 'movie', 'seat_type'), name='unique_sales_rollup')],
+            },
+        ),
+    ]
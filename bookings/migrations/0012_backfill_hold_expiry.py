@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:12
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import F
+
+
+def backfill_hold_expiry(apps, schema_editor):
+    # bookings left Pending before holds had an expiry would block their
+    # seats forever, give them the hold they would have had
+    Booking = apps.get_model("bookings", "Booking")
+    Booking.objects.filter(status="Pending", expires_at__isnull=True).update(
+        expires_at=F("created_at") + settings.SEAT_HOLD_TTL
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0011_salesrollup'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_hold_expiry, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0012_backfill_hold_expiry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refund',
+            name='action',
+            field=models.CharField(choices=[('refund', 'Refund'), ('cancel', 'Cancel payment')], default='refund', max_length=10),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.db import models
 from django.conf import settings
 from django.core.exceptions import ValidationError
+from django.utils import timezone
 
 from shows.models import Showtime
-from movies.models import Seat
+from movies.models import Movie, Screen, Seat, Theater
 
 
 # Create your models here.
@@ -12,6 +13,8 @@ class Booking(models.Model):
         ("Pending", "Pending"),
         ("Confirmed", "Confirmed"),
         ("Cancelled", "Cancelled"),
+        ("Expired", "Expired"),
+        ("Refunded", "Refunded"),
     ]
 
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -19,42 +22,274 @@ class Booking(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="Pending")
     stripe_payment_intent = models.CharField(max_length=255, blank=True, null=True)
+    expires_at = models.DateTimeField(
+        blank=True,
+        null=True,
+        help_text="Pending bookings hold their seats until this time.",
+    )
+
+    class Meta:
+        indexes = [
+            # only pending holds can expire, keeps the sweeper's scan tiny
+            # no matter how many historical bookings exist
+            models.Index(
+                fields=["expires_at"],
+                condition=models.Q(status="Pending"),
+                name="booking_pending_expiry_idx",
+            ),
+            # a user's history in cursor pagination order
+            models.Index(
+                fields=["user", "-created_at", "-id"],
+                name="booking_user_history_idx",
+            ),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.showtime.movie.title} ({self.status})"
 
 
+class TicketQuerySet(models.QuerySet):
+    def holding_seats(self, now=None):
+        """Tickets that currently block their seat (expired holds are treated as free)."""
+        now = now or timezone.now()
+        return self.filter(is_active=True).exclude(
+            booking__status="Pending", booking__expires_at__lte=now
+        )
+
+
 class Ticket(models.Model):
     booking = models.ForeignKey(
         Booking, on_delete=models.CASCADE, related_name="tickets"
     )
+    # copied from the booking so "one active ticket per seat per showtime" can be a db constraint
+    showtime = models.ForeignKey(
+        Showtime, on_delete=models.CASCADE, related_name="tickets", editable=False
+    )
     seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
     price = models.DecimalField(max_digits=6, decimal_places=2)
+    is_active = models.BooleanField(
+        default=True, help_text="Inactive tickets no longer hold their seat."
+    )
     # qr_code = models.ImageField(upload_to="qr_codes/", blank=True, null=True)
 
+    objects = TicketQuerySet.as_manager()
+
     class Meta:
         # act as database constraint to prevent double booking of same seat for *same booking*
         unique_together = ["booking", "seat"]
+        constraints = [
+            # partial unique index: a seat can only be held by one active ticket per showtime,
+            # cancelled tickets stay in the table for history but free the seat
+            models.UniqueConstraint(
+                fields=["showtime", "seat"],
+                condition=models.Q(is_active=True),
+                name="unique_active_ticket_per_showtime_seat",
+            ),
+        ]
 
-    # to check if seat is already booked for the showtime
+    # to check if seat is already booked for the showtime (used by admin forms,
+    # the booking api relies on the unique constraint instead)
     def clean(self):
         taken_seats = Ticket.objects.filter(
-            booking__showtime=self.booking.showtime,
+            showtime=self.booking.showtime,
             seat=self.seat,
-            booking__status="Confirmed",
+            is_active=True,
         )
 
-        if self.booking.pk:
-            taken_seats = taken_seats.exclude(booking=self.booking)
+        if self.pk:
+            taken_seats = taken_seats.exclude(pk=self.pk)
 
-        if taken_seats.exists():
+        if self.is_active and taken_seats.exists():
             raise ValidationError(
                 f"Seat {self.seat} is already booked for this showtime."
             )
 
     def save(self, *args, **kwargs):
-        self.clean()
+        if self.showtime_id is None:
+            self.showtime_id = self.booking.showtime_id
         super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.seat} for {self.booking.showtime}"
+
+
+class StripeEvent(models.Model):
+    """
+    Inbox of verified Stripe webhook events. The webhook only appends here,
+    `manage.py process_stripe_events` applies them. Stripe's event id is the
+    primary key, so redelivered events are dropped on insert.
+    """
+
+    event_id = models.CharField(max_length=255, primary_key=True)
+    type = models.CharField(max_length=100)
+    payload = models.JSONField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            # the worker only ever scans events that are still waiting
+            models.Index(
+                fields=["received_at"],
+                condition=models.Q(processed_at__isnull=True),
+                name="stripe_event_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.type} ({self.event_id})"
+
+
+class OutgoingEmail(models.Model):
+    """
+    Outbox of emails to send. Rows are queued in the same transaction as the
+    change they announce and sent later by `manage.py send_emails`, so a slow
+    mail server never holds up a booking.
+    """
+
+    KIND_CHOICES = [
+        ("ticket", "Ticket confirmation"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("sent", "Sent"),
+        ("failed", "Failed"),
+    ]
+
+    booking = models.ForeignKey(
+        Booking, on_delete=models.CASCADE, related_name="emails"
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            # queueing the same email twice (e.g. a replayed webhook) is a no-op
+            models.UniqueConstraint(
+                fields=["booking", "kind"], name="unique_email_per_booking_kind"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=models.Q(status="pending"),
+                name="outgoing_email_due_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for booking {self.booking_id} ({self.status})"
+
+
+class Refund(models.Model):
+    """
+    A refund waiting to be (or already) issued through Stripe. Queued in bulk
+    when a showtime is cancelled, and for payments a booking could not take;
+    sent by `manage.py process_refunds`. The payment of a booking cancelled
+    while still Pending is cancelled instead, before it can go through.
+    """
+
+    ACTION_CHOICES = [
+        ("refund", "Refund"),
+        ("cancel", "Cancel payment"),
+    ]
+
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+
+    booking = models.OneToOneField(
+        Booking, on_delete=models.CASCADE, related_name="refund"
+    )
+    stripe_payment_intent = models.CharField(max_length=255)
+    amount = models.DecimalField(max_digits=8, decimal_places=2)
+    action = models.CharField(max_length=10, choices=ACTION_CHOICES, default="refund")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    stripe_refund_id = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["created_at"],
+                condition=models.Q(status="pending"),
+                name="refund_pending_idx",
+            ),
+        ]
+
+    def __str__(self):
+        return f"Refund of {self.amount} for booking {self.booking_id} ({self.status})"
+
+
+class IdempotencyKey(models.Model):
+    """
+    First response to a request sent with an Idempotency-Key header, replayed
+    to retries of the same request until it expires.
+    """
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # hash of method, path and body, a key reused for another request is rejected
+    fingerprint = models.CharField(max_length=64)
+    # both empty while the first request is still running, which is given up
+    # on IDEMPOTENCY_KEY_LEASE after created_at
+    status_code = models.PositiveSmallIntegerField(blank=True, null=True)
+    response = models.JSONField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "key"], name="unique_idempotency_key_per_user"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["expires_at"], name="idempotency_key_expiry_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.key} ({self.user_id})"
+
+
+class SalesRollup(models.Model):
+    """
+    Tickets sold and revenue per screening day, screen, movie and seat type.
+    Maintained by the booking services when a booking is confirmed or its
+    tickets are released, rebuilt by `manage.py backfill_sales_rollups`. The
+    sales report only ever reads this table.
+    """
+
+    # local date of the showtime, not of the purchase, so a cancellation
+    # always lands on the row its sale was added to
+    day = models.DateField()
+    theater = models.ForeignKey(Theater, on_delete=models.CASCADE, related_name="+")
+    screen = models.ForeignKey(Screen, on_delete=models.CASCADE, related_name="+")
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE, related_name="+")
+    seat_type = models.CharField(max_length=10)
+    tickets_sold = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            # leads with day, so it also serves the report's date range scans
+            models.UniqueConstraint(
+                fields=["day", "screen", "movie", "seat_type"],
+                name="unique_sales_rollup",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.movie_id}/{self.screen_id} {self.seat_type}"
@@ -0,0 +1,7 @@
+from rest_framework.pagination import CursorPagination
+
+
+class BookingCursorPagination(CursorPagination):
+    # newest first, id breaks ties between bookings made in the same instant;
+    # served by the booking_user_history_idx index
+    ordering = ("-created_at", "-id")
@@ -0,0 +1,133 @@
+"""
+Rule-table pricing.
+
+A showtime's prices only depend on the movie's base price, the time of day,
+the screen type and the seat type, so they are compiled once into a
+{seat_type: price} matrix and cached. Booking create, the seat map and the
+quote endpoint all read the same matrix.
+
+The cache key is made of those inputs, not of the showtime. A price change
+in the database therefore reads a different key in every process at once,
+and nothing has to be invalidated. Showtimes with the same inputs share one
+entry.
+"""
+
+from decimal import Decimal
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+
+# (first hour, last hour exclusive, discount on the base price)
+TIME_OF_DAY_DISCOUNTS = [
+    (0, 12, Decimal("0.20")),  # morning shows
+]
+
+SCREEN_TYPE_SURCHARGES = {
+    "2D": Decimal("0.00"),
+    "3D": Decimal("2.00"),
+    "IMAX": Decimal("4.00"),
+}
+
+# keys match Seat.SEAT_TYPE
+SEAT_TYPE_SURCHARGES = {
+    "REGULAR": Decimal("0.00"),
+    "PREMIUM": Decimal("5.00"),
+    "VIP": Decimal("10.00"),
+}
+
+DEFAULT_SEAT_TYPE = "REGULAR"
+
+# the Showtime lookups the matrix is compiled from, in cached_price_matrix order
+PRICE_FIELDS = ("movie__base_price", "start_time", "screen__screen_type")
+
+
+def _cache_key(base_price, hour, screen_type):
+    return f"price_matrix:{base_price}:{hour}:{screen_type}"
+
+
+def normalize_seat_type(seat_type):
+    # older rows store "Regular"/"Premium", the matrix is keyed by Seat.SEAT_TYPE
+    seat_type = (seat_type or DEFAULT_SEAT_TYPE).upper()
+    return seat_type if seat_type in SEAT_TYPE_SURCHARGES else DEFAULT_SEAT_TYPE
+
+
+def compile_price_matrix(base_price, hour, screen_type):
+    price = base_price
+
+    for first_hour, last_hour, discount in TIME_OF_DAY_DISCOUNTS:
+        if first_hour <= hour < last_hour:
+            price -= price * discount
+
+    price += SCREEN_TYPE_SURCHARGES.get(screen_type, Decimal("0.00"))
+
+    return {
+        seat_type: (price + surcharge).quantize(Decimal("0.01"))
+        for seat_type, surcharge in SEAT_TYPE_SURCHARGES.items()
+    }
+
+
+def get_price_matrix(showtime_id, showtime=None):
+    """
+    Cached {seat_type: price} of a showtime. Pass the showtime (with movie and
+    screen loaded) when the caller already has it, to save the lookup on a miss.
+    """
+    from shows.models import Showtime
+
+    if showtime is None:
+        return cached_price_matrix(
+            *Showtime.objects.filter(pk=showtime_id).values_list(*PRICE_FIELDS).get()
+        )
+    return cached_price_matrix(
+        showtime.movie.base_price, showtime.start_time, showtime.screen.screen_type
+    )
+
+
+def cached_price_matrix(base_price, start_time, screen_type):
+    """Cached {seat_type: price} for price inputs already read (PRICE_FIELDS)."""
+    hour = timezone.localtime(start_time).hour
+
+    key = _cache_key(base_price, hour, screen_type)
+    matrix = cache.get(key)
+    if matrix is None:
+        matrix = compile_price_matrix(base_price, hour, screen_type)
+        cache.set(key, matrix, settings.PRICE_MATRIX_CACHE_TIMEOUT)
+    return matrix
+
+
+def price_for(matrix, seat_type):
+    return matrix[normalize_seat_type(seat_type)]
+
+
+def quote_seats(showtime, seat_selectors):
+    """
+    Price a list of {"row", "number"} seats of a showtime without booking them.
+    Returns ([(row, number, seat_type, price), ...], total).
+    """
+    from movies.layouts import get_layout
+    from .services import BookingError
+
+    matrix = get_price_matrix(showtime.id, showtime)
+    layout = get_layout(showtime.screen_id, showtime.screen.layout_version)
+    seat_types = {
+        (row, number): seat_type
+        for ordinal, seat_id, row, number, seat_type in layout.seats()
+    }
+
+    keys = [(selector["row"], selector["number"]) for selector in seat_selectors]
+    if not keys:
+        raise BookingError("At least one seat is required.")
+    if len(set(keys)) != len(keys):
+        raise BookingError("The same seat was requested more than once.")
+
+    lines = []
+    for row, number in keys:
+        if (row, number) not in seat_types:
+            raise BookingError(
+                f"Seat {row}{number} does not exist in {showtime.screen.name}"
+            )
+        seat_type = seat_types[(row, number)]
+        lines.append((row, number, seat_type, price_for(matrix, seat_type)))
+
+    return lines, sum((line[3] for line in lines), Decimal("0.00"))
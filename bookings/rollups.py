@@ -0,0 +1,208 @@
+"""
+Incrementally maintained sales rollups.
+
+Confirming a booking adds its tickets to the SalesRollup rows of their
+(day, screen, movie, seat type); cancelling, refunding or cancelling the whole
+showtime takes them off again, in the same transaction as the status change.
+Every change is one grouped SELECT over the booking's tickets plus one relative
+UPDATE per seat type. `rebuild` recomputes a date range from the tickets and
+is what `manage.py backfill_sales_rollups` runs; `reconcile` (its --reconcile
+mode) only fixes the rows that drifted and is safe next to live bookings.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import SalesRollup, Ticket
+from .pricing import normalize_seat_type
+
+
+_KEY_FIELDS = (
+    "showtime__screen__theater_id",
+    "showtime__screen_id",
+    "showtime__movie_id",
+    "seat__seat_type",
+)
+
+
+def _group(rows):
+    """Merge grouped ticket rows into {rollup key: [count, revenue]}."""
+    totals = defaultdict(lambda: [0, Decimal("0.00")])
+    for row in rows:
+        key = (
+            row["day"],
+            row["showtime__screen__theater_id"],
+            row["showtime__screen_id"],
+            row["showtime__movie_id"],
+            # "Regular" and "REGULAR" are the same seat type
+            normalize_seat_type(row["seat__seat_type"]),
+        )
+        totals[key][0] += row["count"]
+        totals[key][1] += row["revenue"] or Decimal("0.00")
+    return totals
+
+
+def record(tickets, sign=1):
+    """
+    Add (sign=1) or take off (sign=-1) a set of tickets from the rollups.
+    Call it inside the transaction that confirms or releases them.
+    """
+    rows = (
+        tickets.values("showtime__start_time", *_KEY_FIELDS)
+        .annotate(count=Count("id"), revenue=Sum("price"))
+        .order_by()
+    )
+    rows = [
+        {**row, "day": timezone.localdate(row["showtime__start_time"])}
+        for row in rows
+    ]
+
+    for (day, theater_id, screen_id, movie_id, seat_type), (
+        count,
+        revenue,
+    ) in _group(rows).items():
+        _add(
+            {
+                "day": day,
+                "screen_id": screen_id,
+                "movie_id": movie_id,
+                "seat_type": seat_type,
+            },
+            theater_id,
+            sign * count,
+            sign * revenue,
+        )
+
+
+def _add(key, theater_id, count, revenue):
+    rollup = SalesRollup.objects.filter(**key)
+    changes = {
+        "tickets_sold": F("tickets_sold") + count,
+        "revenue": F("revenue") + revenue,
+    }
+    if rollup.update(**changes):
+        return
+    try:
+        # savepoint, a concurrent first sale of the same key may win the insert
+        with transaction.atomic():
+            SalesRollup.objects.create(
+                **key, theater_id=theater_id, tickets_sold=count, revenue=revenue
+            )
+    except IntegrityError:
+        rollup.update(**changes)
+
+
+def _ticket_rows(since=None, until=None, **filters):
+    """Confirmed tickets of screening days since..until, grouped for _group."""
+    tickets = Ticket.objects.filter(
+        is_active=True, booking__status="Confirmed", **filters
+    )
+    tz = timezone.get_current_timezone()
+    if since:
+        tickets = tickets.filter(
+            showtime__start_time__gte=timezone.make_aware(
+                datetime.combine(since, time.min), tz
+            )
+        )
+    if until:
+        tickets = tickets.filter(
+            showtime__start_time__lte=timezone.make_aware(
+                datetime.combine(until, time.max), tz
+            )
+        )
+    return (
+        tickets.annotate(day=TruncDate("showtime__start_time", tzinfo=tz))
+        .values("day", *_KEY_FIELDS)
+        .annotate(count=Count("id"), revenue=Sum("price"))
+        .order_by()
+    )
+
+
+def _stored(since=None, until=None):
+    rollups = SalesRollup.objects.all()
+    if since:
+        rollups = rollups.filter(day__gte=since)
+    if until:
+        rollups = rollups.filter(day__lte=until)
+    return rollups
+
+
+def rebuild(since=None, until=None, batch_size=1000):
+    """
+    Recompute the rollups of screening days since..until (inclusive, all days
+    when left out) from the confirmed tickets. Returns the number of rows written.
+    """
+    rows = _ticket_rows(since, until)
+
+    with transaction.atomic():
+        _stored(since, until).delete()
+        created = SalesRollup.objects.bulk_create(
+            [
+                SalesRollup(
+                    day=day,
+                    theater_id=theater_id,
+                    screen_id=screen_id,
+                    movie_id=movie_id,
+                    seat_type=seat_type,
+                    tickets_sold=count,
+                    revenue=revenue,
+                )
+                for (day, theater_id, screen_id, movie_id, seat_type), (
+                    count,
+                    revenue,
+                ) in _group(rows).items()
+            ],
+            batch_size=batch_size,
+        )
+    return len(created)
+
+
+def reconcile(since=None, until=None):
+    """
+    Compare the rollups of screening days since..until with the confirmed
+    tickets and fix the rows that drifted (e.g. after tickets were changed
+    behind the services' back). Returns the number of rows fixed.
+    """
+    expected = _group(_ticket_rows(since, until))
+    stored = {
+        (row.day, row.theater_id, row.screen_id, row.movie_id, row.seat_type): (
+            row.tickets_sold,
+            row.revenue,
+        )
+        for row in _stored(since, until)
+    }
+
+    fixed = 0
+    for key in expected.keys() | stored.keys():
+        if tuple(expected.get(key, (0, 0))) != stored.get(key, (0, 0)):
+            fixed += _fix(key)
+    return fixed
+
+
+def _fix(key):
+    # the row lock orders us against the confirming transactions, like
+    # shows.counters: one that already added to the row has committed its
+    # tickets before we count, one that has not yet adds its delta on top
+    day, theater_id, screen_id, movie_id, seat_type = key
+    lookup = {
+        "day": day,
+        "screen_id": screen_id,
+        "movie_id": movie_id,
+        "seat_type": seat_type,
+    }
+    with transaction.atomic():
+        list(SalesRollup.objects.select_for_update().filter(**lookup))
+        rows = _ticket_rows(
+            day, day, showtime__screen_id=screen_id, showtime__movie_id=movie_id
+        )
+        count, revenue = _group(rows).get(key, (0, Decimal("0.00")))
+        rollup = SalesRollup.objects.filter(**lookup)
+        if not rollup.update(tickets_sold=count, revenue=revenue):
+            _add(lookup, theater_id, count, revenue)
+    return 1
@@ -4,6 +4,8 @@ from drf_spectacular.utils import extend_schema
 
 
 from .models import Booking, Ticket
+from .exports import FORMATS
+from movies.models import Seat
 from shows.serializers import ShowtimeSerializer
 
 
@@ -40,12 +42,29 @@ class SeatSelectorSerializer(serializers.Serializer):
     number = serializers.IntegerField()
 
 
+class BestAvailableSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=10)
+    seat_type = serializers.ChoiceField(choices=Seat.SEAT_TYPE, required=False)
+
+
 class CreateBookingSerializer(serializers.Serializer):
     showtime_id = serializers.IntegerField()
     seats = serializers.ListField(
         child=SeatSelectorSerializer(),
+        required=False,
         help_text="List of seats with row('A', 'B', etc) and number(1, 2, etc)",
     )
+    best_available = BestAvailableSerializer(
+        required=False,
+        help_text="Let the server pick 'count' adjacent seats instead of listing them",
+    )
+
+    def validate(self, attrs):
+        if ("seats" in attrs) == ("best_available" in attrs):
+            raise serializers.ValidationError(
+                "Send either 'seats' or 'best_available'."
+            )
+        return attrs
 
 
 class BookingListSerializer(ModelSerializer):
@@ -82,4 +101,60 @@ class BookingListSerializer(ModelSerializer):
         ]
 
     def get_total_price(self, obj):
-        return str(sum(ticket.price for ticket in obj.tickets.all()))
+        # summed by the database when the queryset is annotated (booking list)
+        total = getattr(obj, "ticket_total", None)
+        if total is None:
+            total = sum(ticket.price for ticket in obj.tickets.all())
+        return f"{total:.2f}"
+
+
+# sales report dimensions and the rollup columns each one groups by
+REPORT_DIMENSIONS = {
+    "day": ["day"],
+    "theater": ["theater_id", "theater__name"],
+    "screen": ["screen_id", "screen__name"],
+    "movie": ["movie_id", "movie__title"],
+    "seat_type": ["seat_type"],
+}
+
+
+class SalesReportQuerySerializer(serializers.Serializer):
+    start = serializers.DateField(help_text="First screening day (inclusive)")
+    end = serializers.DateField(help_text="Last screening day (inclusive)")
+    group_by = serializers.CharField(
+        required=False,
+        default="day",
+        help_text=f"Comma separated: {', '.join(REPORT_DIMENSIONS)}",
+    )
+    theater = serializers.IntegerField(required=False)
+    screen = serializers.IntegerField(required=False)
+    movie = serializers.IntegerField(required=False)
+    seat_type = serializers.ChoiceField(choices=Seat.SEAT_TYPE, required=False)
+
+    def validate_group_by(self, value):
+        dimensions = [name.strip() for name in value.split(",") if name.strip()]
+        unknown = [name for name in dimensions if name not in REPORT_DIMENSIONS]
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown dimension(s): {', '.join(unknown)}."
+            )
+        return list(dict.fromkeys(dimensions))
+
+    def validate(self, attrs):
+        if attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("'start' must not be after 'end'.")
+        return attrs
+
+
+class ExportQuerySerializer(serializers.Serializer):
+    # not "format", DRF already uses that query parameter to pick a renderer
+    output = serializers.ChoiceField(choices=FORMATS, required=False, default="csv")
+    start = serializers.DateField(required=False, help_text="First booking day")
+    end = serializers.DateField(required=False, help_text="Last booking day")
+    theater = serializers.IntegerField(required=False)
+    status = serializers.ChoiceField(choices=Booking.STATUS_CHOICES, required=False)
+
+    def validate(self, attrs):
+        if attrs.get("start") and attrs.get("end") and attrs["start"] > attrs["end"]:
+            raise serializers.ValidationError("'start' must not be after 'end'.")
+        return attrs
@@ -0,0 +1,521 @@
+from django.conf import settings
+from django.db import IntegrityError, OperationalError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+from collections import defaultdict
+from decimal import Decimal
+import random
+import time
+import stripe
+
+from movies.models import Seat
+from shows import counters, seat_bitmap
+from shows.models import SeatEvent, Showtime
+from .models import Booking, Ticket, Refund
+from .allocation import find_best_available
+from . import locking, rollups
+
+
+stripe.api_key = settings.STRIPE_SECRET_KEY
+# network errors are retried by the stripe client itself, re-sending the same
+# idempotency key so a retry can never create a second PaymentIntent
+stripe.max_network_retries = settings.STRIPE_MAX_NETWORK_RETRIES
+stripe.default_http_client = stripe.RequestsClient(timeout=settings.STRIPE_TIMEOUT)
+
+
+class BookingError(Exception):
+    """Raised when a booking request cannot be fulfilled (shown to the client)."""
+
+
+class PaymentError(BookingError):
+    """Raised when the payment phase failed and the reservation was rolled back."""
+
+
+class TryAgainError(BookingError):
+    """Raised when a request lost a race under load and may succeed if retried."""
+
+
+class SeatTakenError(BookingError):
+    """Raised when a requested seat is held by another active ticket."""
+
+
+def resolve_seats(screen, seat_selectors):
+    """
+    Resolve every requested {"row", "number"} pair of a screen with one query.
+    Returns the seats in the order they were requested.
+    """
+    wanted = [(selector["row"], selector["number"]) for selector in seat_selectors]
+    if not wanted:
+        raise BookingError("At least one seat is required.")
+    if len(set(wanted)) != len(wanted):
+        raise BookingError("The same seat was requested more than once.")
+
+    lookup = Q()
+    for row, number in wanted:
+        lookup |= Q(row=row, number=number)
+
+    found = {
+        (seat.row, seat.number): seat
+        for seat in Seat.objects.filter(lookup, screen=screen)
+    }
+
+    for row, number in wanted:
+        if (row, number) not in found:
+            raise BookingError(f"Seat {row}{number} does not exist in {screen.name}")
+
+    return [found[key] for key in wanted]
+
+
+def claim_seats(booking, seats, price_for):
+    """
+    Insert one ticket per seat in a single statement.
+
+    Double booking is rejected by the partial unique index on active
+    (showtime, seat) tickets, so there is no racy exists() check before the
+    insert. Must be called inside a transaction.
+    """
+    tickets = [
+        Ticket(
+            booking=booking,
+            showtime_id=booking.showtime_id,
+            seat=seat,
+            price=price_for(seat),
+        )
+        for seat in seats
+    ]
+
+    try:
+        _insert_tickets(tickets)
+    except IntegrityError:
+        # seats may only be blocked by holds that expired but were not swept yet,
+        # release those right away instead of waiting for the sweeper
+        released = release_expired_holds(
+            tickets__showtime_id=booking.showtime_id,
+            tickets__seat__in=seats,
+            tickets__is_active=True,
+        )
+        try:
+            if not released:
+                raise
+            _insert_tickets(tickets)
+        except IntegrityError:
+            taken = (
+                Ticket.objects.filter(
+                    showtime_id=booking.showtime_id, seat__in=seats, is_active=True
+                )
+                .select_related("seat")
+                .first()
+            )
+            if taken is None:
+                raise
+            raise SeatTakenError(
+                f"Seat {taken.seat.row}{taken.seat.number} is already booked!"
+            )
+
+    counters.adjust(booking.showtime_id, held=len(tickets))
+    _seats_changed(
+        booking.showtime_id,
+        [seat.id for seat in seats],
+        seat_bitmap.HELD,
+        booking.expires_at,
+    )
+    return tickets
+
+
+def _seats_changed(showtime_id, seat_ids, state, expires_at=None):
+    """
+    Record seat status changes in the caller's transaction, for the live seat
+    stream and for the shared seat map bitmaps, which replay them when read.
+    """
+    if not seat_ids:
+        return
+
+    # take the versions under the showtime's row lock, held until commit, so
+    # a showtime's events become visible in version order
+    showtimes = Showtime.objects.filter(pk=showtime_id)
+    showtimes.update(seat_version=F("seat_version") + len(seat_ids))
+    last_version = showtimes.values_list("seat_version", flat=True).get()
+
+    status = "available" if state == seat_bitmap.FREE else "taken"
+    SeatEvent.objects.bulk_create(
+        [
+            SeatEvent(
+                showtime_id=showtime_id,
+                seat_id=seat_id,
+                status=status,
+                expires_at=expires_at if state == seat_bitmap.HELD else None,
+                version=version,
+            )
+            for version, seat_id in enumerate(
+                seat_ids, start=last_version - len(seat_ids) + 1
+            )
+        ]
+    )
+
+
+def _seat_ids(tickets):
+    return list(tickets.values_list("seat_id", flat=True))
+
+
+def _insert_tickets(tickets):
+    # savepoint, so the outer transaction is still usable after a conflict
+    with transaction.atomic():
+        Ticket.objects.bulk_create(tickets)
+
+
+def lock_showtime(showtime_id):
+    """
+    Row-lock a showtime inside the current transaction and return whether it
+    is cancelled. Taken before any of its bookings' rows everywhere, so the
+    booking paths and cancel_showtime never deadlock.
+    """
+    return (
+        Showtime.objects.select_for_update()
+        .filter(pk=showtime_id)
+        .values_list("is_cancelled", flat=True)
+        .first()
+    )
+
+
+def release_booking(booking, status="Cancelled"):
+    """Mark the booking as released and free its seats through the partial index."""
+    with transaction.atomic():
+        lock_showtime(booking.showtime_id)
+        # branch on the committed status, the caller's copy may be stale
+        previous = (
+            Booking.objects.select_for_update()
+            .values_list("status", flat=True)
+            .get(pk=booking.pk)
+        )
+        if previous in ("Cancelled", "Expired", "Refunded"):
+            # released already, a second release must not count it off again
+            booking.status = previous
+            return booking
+        booking.status = status
+        booking.save(update_fields=["status"])
+        active = booking.tickets.filter(is_active=True)
+        seat_ids = _seat_ids(active)
+        if previous == "Confirmed":
+            counters.adjust(booking.showtime_id, sold=-len(seat_ids))
+            rollups.record(active, sign=-1)
+        elif previous == "Pending":
+            counters.adjust(booking.showtime_id, held=-len(seat_ids))
+        _seats_changed(booking.showtime_id, seat_ids, seat_bitmap.FREE)
+        active.update(is_active=False)
+    return booking
+
+
+def release_expired_holds(now=None, batch_size=None, **booking_filters):
+    """
+    Expire Pending bookings whose hold ran out and free their seats with two
+    set-based UPDATEs. Only touches the partial expiry index, so it stays cheap
+    however many historical bookings exist. Returns the number of bookings expired.
+    """
+    now = now or timezone.now()
+    expired = Booking.objects.filter(
+        status="Pending", expires_at__lte=now, **booking_filters
+    ).values_list("id", flat=True)
+    if batch_size:
+        expired = expired[:batch_size]
+    booking_ids = list(set(expired))
+    if not booking_ids:
+        return 0
+
+    with transaction.atomic():
+        # re-check the status, a webhook may have confirmed some of them meanwhile
+        count = Booking.objects.filter(id__in=booking_ids, status="Pending").update(
+            status="Expired"
+        )
+        released = Ticket.objects.filter(
+            booking_id__in=booking_ids, booking__status="Expired", is_active=True
+        )
+        seats_by_showtime = defaultdict(list)
+        for showtime_id, seat_id in released.values_list("showtime_id", "seat_id"):
+            seats_by_showtime[showtime_id].append(seat_id)
+        released.update(is_active=False)
+
+        for showtime_id, seat_ids in seats_by_showtime.items():
+            counters.adjust(showtime_id, held=-len(seat_ids))
+            _seats_changed(showtime_id, seat_ids, seat_bitmap.FREE)
+
+    return count
+
+
+def cancel_showtime(showtime):
+    """
+    Cancel a showtime and all of its open bookings with set-based UPDATEs, and
+    queue a refund for every paid booking, and a cancellation of the payment
+    of every Pending or Expired one (both sent by `manage.py process_refunds`).
+    Returns (bookings cancelled, refunds queued).
+    """
+    with transaction.atomic():
+        # every open booking is released below, so the counters drop to zero
+        showtime.is_cancelled = True
+        showtime.seats_sold = showtime.seats_held = 0
+        showtime.save(update_fields=["is_cancelled", "seats_sold", "seats_held"])
+
+        open_bookings = Booking.objects.filter(
+            showtime=showtime, status__in=["Pending", "Confirmed"]
+        )
+        # an expired hold's payment may still go through, stop it as well
+        payments = (
+            Booking.objects.filter(
+                showtime=showtime,
+                status__in=["Pending", "Confirmed", "Expired"],
+                stripe_payment_intent__gt="",
+            )
+            .annotate(total=Sum("tickets__price"))
+            .values_list("id", "status", "stripe_payment_intent", "total")
+        )
+        queued = Refund.objects.bulk_create(
+            [
+                Refund(
+                    booking_id=booking_id,
+                    stripe_payment_intent=intent,
+                    amount=total,
+                    # a payment still open is stopped before the customer pays
+                    action="refund" if status == "Confirmed" else "cancel",
+                )
+                for booking_id, status, intent, total in payments
+                if total
+            ],
+            ignore_conflicts=True,
+        )
+        rollups.record(
+            Ticket.objects.filter(
+                showtime=showtime, is_active=True, booking__status="Confirmed"
+            ),
+            sign=-1,
+        )
+        cancelled = open_bookings.update(status="Cancelled", expires_at=None)
+
+        released = Ticket.objects.filter(showtime=showtime, is_active=True)
+        _seats_changed(showtime.id, _seat_ids(released), seat_bitmap.FREE)
+        released.update(is_active=False)
+
+    return cancelled, sum(refund.action == "refund" for refund in queued)
+
+
+def confirm_booking(booking):
+    """
+    Mark a paid booking as Confirmed. A hold that expired before the payment
+    arrived gets its seats back if nobody else has claimed them meanwhile.
+    Returns False when the seats are gone or the showtime was cancelled.
+    """
+    with transaction.atomic():
+        # the row lock orders us against cancel_showtime
+        if lock_showtime(booking.showtime_id):
+            return False
+
+        previous = booking.status
+        if previous == "Expired":
+            try:
+                with transaction.atomic():
+                    booking.tickets.update(is_active=True)
+            except IntegrityError:
+                return False
+
+        booking.status = "Confirmed"
+        booking.expires_at = None
+        booking.save(update_fields=["status", "expires_at"])
+        seat_ids = _seat_ids(booking.tickets.all())
+        # an expired hold was already taken off seats_held when it was released
+        counters.adjust(
+            booking.showtime_id,
+            sold=len(seat_ids),
+            held=-len(seat_ids) if previous == "Pending" else 0,
+        )
+        rollups.record(booking.tickets.all())
+        _seats_changed(booking.showtime_id, seat_ids, seat_bitmap.TAKEN)
+
+    return True
+
+
+def check_availability(showtime, count):
+    """
+    Reject a request the occupancy counters say cannot fit, before any
+    per-seat work. Holds that expired but were not swept yet are released
+    first, so they never make a show look sold out.
+    """
+    if not showtime.capacity or showtime.seats_available >= count:
+        return
+    if release_expired_holds(showtime_id=showtime.id):
+        showtime.refresh_from_db(fields=["seats_sold", "seats_held"])
+        if showtime.seats_available >= count:
+            return
+    if not showtime.seats_available:
+        raise BookingError("This showtime is sold out.")
+    raise BookingError(f"Only {showtime.seats_available} seats are left.")
+
+
+def reserve_booking(user, showtime, seat_selectors, price_for):
+    """
+    Reserve phase: create the Pending booking and claim its seats in one short
+    transaction. No network calls happen here, so row locks (or SQLite's write
+    lock) are only held for a handful of statements. A transaction that timed
+    out waiting for a lock is retried with backoff (BOOKING_LOCK_RETRIES).
+    """
+    if showtime.is_cancelled:
+        raise BookingError("This showtime has been cancelled.")
+    check_availability(showtime, len(seat_selectors))
+
+    seats = resolve_seats(showtime.screen, seat_selectors)
+
+    attempt = 0
+    while True:
+        try:
+            with transaction.atomic():
+                locking.lock_seats(showtime, seats)
+                booking = Booking.objects.create(
+                    user=user,
+                    showtime=showtime,
+                    status="Pending",
+                    expires_at=timezone.now() + settings.SEAT_HOLD_TTL,
+                )
+                tickets = claim_seats(booking, seats, price_for)
+            return booking, tickets
+        except OperationalError as e:
+            # a lock wait timed out and the attempt was rolled back (to its
+            # savepoint, when the caller has a transaction open), try again
+            if not locking.is_lock_error(e):
+                raise
+            if attempt >= settings.BOOKING_LOCK_RETRIES:
+                raise TryAgainError("This showtime is very busy, please try again.")
+            attempt += 1
+            # exponential backoff with jitter, so the retries do not collide again
+            time.sleep(settings.BOOKING_LOCK_BACKOFF * 2**attempt * random.random())
+
+
+def reserve_best_available(user, showtime, count, price_for, seat_type=None):
+    """
+    Reserve phase for best-available booking: let the server pick `count`
+    adjacent seats and claim them. If another booking wins one of the picked
+    seats first, pick again from the committed state (a few times at most).
+    """
+    from shows.occupancy import load_occupancy
+
+    check_availability(showtime, count)
+    for attempt in range(settings.BEST_AVAILABLE_ATTEMPTS):
+        # the shared bitmap lags commits slightly, retries read the database
+        layout, taken_flags = load_occupancy(showtime.id, use_bitmap=attempt == 0)
+        picked = find_best_available(layout, taken_flags, count, seat_type)
+        if picked is None:
+            raise BookingError(f"There are no {count} adjacent seats available.")
+
+        selectors = [{"row": row, "number": number} for row, number in picked]
+        try:
+            return reserve_booking(user, showtime, selectors, price_for)
+        except SeatTakenError:
+            continue
+
+    raise TryAgainError("Seats are selling fast, please try again.")
+
+
+def attach_payment_intent(booking, amount):
+    """
+    Payment phase: create the Stripe PaymentIntent for a committed reservation.
+
+    Must run outside any transaction. If Stripe keeps failing after the client
+    retries, the reservation is compensated (seats released) and PaymentError
+    is raised.
+    """
+    try:
+        intent = stripe.PaymentIntent.create(
+            amount=int(amount * 100),
+            currency="usd",
+            metadata={"booking_id": booking.id},
+            idempotency_key=f"booking-{booking.id}-payment-intent",
+        )
+    except stripe.error.StripeError as e:
+        release_booking(booking)
+        raise PaymentError(f"Payment could not be started, please try again. ({e})")
+
+    booking.stripe_payment_intent = intent["id"]
+    booking.save(update_fields=["stripe_payment_intent"])
+    return intent
+
+
+def queue_refund(booking, intent):
+    """
+    Queue a refund of a payment the booking could not take (sent by
+    `manage.py process_refunds`). Refunds the amount Stripe reports for the
+    intent, or the tickets' total when the event does not carry it.
+    """
+    cents = intent.get("amount_received") or intent.get("amount")
+    if cents:
+        amount = Decimal(cents) / 100
+    else:
+        amount = booking.tickets.aggregate(total=Sum("price"))["total"]
+    if not amount:
+        return
+    # a booking is refunded once, a redelivered event changes nothing
+    Refund.objects.bulk_create(
+        [Refund(booking=booking, stripe_payment_intent=intent["id"], amount=amount)],
+        ignore_conflicts=True,
+    )
+    # the payment went through before its queued cancellation, refund it
+    Refund.objects.filter(booking=booking, action="cancel").exclude(
+        status="succeeded"
+    ).update(
+        action="refund",
+        status="pending",
+        stripe_payment_intent=intent["id"],
+        amount=amount,
+        attempts=0,
+        last_error="",
+    )
+
+
+def process_refunds(batch_size=100, rate=None):
+    """
+    Send up to batch_size queued refunds (and payment cancellations) to
+    Stripe, at most `rate` calls per second (STRIPE_REFUND_RATE by default).
+    Runs outside any transaction; the idempotency key makes a retried or
+    concurrently sent refund a no-op at Stripe. Returns (succeeded, failed).
+    """
+    interval = 1 / (rate or settings.STRIPE_REFUND_RATE)
+    refunds = Refund.objects.filter(
+        status="pending", attempts__lt=settings.STRIPE_REFUND_MAX_ATTEMPTS
+    ).order_by("created_at")[:batch_size]
+
+    succeeded = failed = 0
+    next_call = time.monotonic()
+    for refund in refunds:
+        time.sleep(max(0, next_call - time.monotonic()))
+        next_call = time.monotonic() + interval
+
+        refund.attempts += 1
+        try:
+            if refund.action == "cancel":
+                stripe.PaymentIntent.cancel(
+                    refund.stripe_payment_intent,
+                    idempotency_key=f"cancel-{refund.id}",
+                )
+            else:
+                result = stripe.Refund.create(
+                    payment_intent=refund.stripe_payment_intent,
+                    amount=int(refund.amount * 100),
+                    metadata={"booking_id": refund.booking_id},
+                    idempotency_key=f"refund-{refund.id}",
+                )
+                refund.stripe_refund_id = result["id"]
+        except stripe.error.StripeError as e:
+            failed += 1
+            refund.last_error = str(e)
+            if refund.attempts >= settings.STRIPE_REFUND_MAX_ATTEMPTS:
+                refund.status = "failed"
+        else:
+            succeeded += 1
+            refund.status = "succeeded"
+            refund.last_error = ""
+            refund.processed_at = timezone.now()
+        # a cancellation turned into a refund meanwhile is sent on the next run
+        Refund.objects.filter(pk=refund.pk, action=refund.action).update(
+            status=refund.status,
+            attempts=refund.attempts,
+            stripe_refund_id=refund.stripe_refund_id,
+            last_error=refund.last_error,
+            processed_at=refund.processed_at,
+        )
+
+    return succeeded, failed
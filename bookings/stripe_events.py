@@ -0,0 +1,156 @@
+"""
+Stripe webhook inbox processing.
+
+The webhook stores each verified event in StripeEvent and answers 200 right
+away; this module applies them from a worker (`manage.py process_stripe_events`).
+Every handler checks the booking's current status before changing it, so an
+event that is applied twice, or arrives out of order, is a no-op.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Booking, StripeEvent
+from .services import confirm_booking, lock_showtime, queue_refund, release_booking
+from .utils import queue_ticket_email
+
+
+def record_event(event_id, event_type, payload):
+    """Append a verified event to the inbox, a redelivered event is ignored."""
+    # single INSERT ... ON CONFLICT DO NOTHING, no read before the write
+    StripeEvent.objects.bulk_create(
+        [StripeEvent(event_id=event_id, type=event_type, payload=payload)],
+        ignore_conflicts=True,
+    )
+
+
+def _locked_booking(**lookup):
+    # showtime row first, then the booking (see services.lock_showtime)
+    showtime_id = (
+        Booking.objects.filter(**lookup).values_list("showtime_id", flat=True).first()
+    )
+    if showtime_id is None:
+        return None
+    lock_showtime(showtime_id)
+    return Booking.objects.select_for_update().filter(**lookup).first()
+
+
+def _booking_for_intent(intent):
+    booking_id = intent.get("metadata", {}).get("booking_id")
+    if booking_id:
+        return _locked_booking(id=booking_id)
+    return _locked_booking(stripe_payment_intent=intent["id"])
+
+
+def _payment_succeeded(event):
+    intent = event.payload["data"]["object"]
+    booking = _booking_for_intent(intent)
+    if booking is None:
+        return f"Booking for {intent['id']} not found."
+    if booking.stripe_payment_intent == intent["id"] and booking.status in (
+        "Confirmed",
+        "Refunded",
+    ):
+        return f"Booking {booking.id} is already {booking.status}."
+    # every payment the booking cannot take goes back to the customer
+    if booking.status not in ("Pending", "Expired"):
+        queue_refund(booking, intent)
+        return f"Booking {booking.id} is {booking.status}, refund queued."
+    # its seats were taken after the hold expired, or the showtime was cancelled
+    if not confirm_booking(booking):
+        queue_refund(booking, intent)
+        return f"Booking {booking.id} cannot be confirmed any more, refund queued."
+
+    # sent by `manage.py send_emails`, queued atomically with the confirmation
+    queue_ticket_email(booking)
+    return f"Booking {booking.id} confirmed."
+
+
+def _payment_failed(event):
+    intent = event.payload["data"]["object"]
+    # not final, the customer may retry with another card until the hold
+    # runs out (or the intent is canceled)
+    return f"Payment for {intent['id']} failed, hold kept."
+
+
+def _payment_canceled(event):
+    intent = event.payload["data"]["object"]
+    booking = _booking_for_intent(intent)
+    if booking is None:
+        return f"Booking for {intent['id']} not found."
+    if booking.status != "Pending":
+        return f"Booking {booking.id} is {booking.status}, not cancelling."
+
+    # free the seats now instead of waiting for the hold to run out
+    release_booking(booking)
+    return f"Booking {booking.id} cancelled, payment canceled."
+
+
+def _charge_refunded(event):
+    charge = event.payload["data"]["object"]
+    if not charge.get("refunded"):
+        return "Partial refund, booking kept."
+    booking = _locked_booking(stripe_payment_intent=charge.get("payment_intent"))
+    if booking is None:
+        return f"Booking for {charge.get('payment_intent')} not found."
+    if booking.status != "Confirmed":
+        return f"Booking {booking.id} is {booking.status}, not refunding."
+
+    release_booking(booking, status="Refunded")
+    return f"Booking {booking.id} refunded."
+
+
+HANDLERS = {
+    "payment_intent.succeeded": _payment_succeeded,
+    "payment_intent.payment_failed": _payment_failed,
+    "payment_intent.canceled": _payment_canceled,
+    "charge.refunded": _charge_refunded,
+}
+
+
+def process_stripe_events(batch_size=100):
+    """
+    Apply up to batch_size waiting events in arrival order, each in its own
+    transaction. Failed events are retried on the next run until they reach
+    STRIPE_EVENT_MAX_ATTEMPTS. Returns the number of events processed.
+    """
+    event_ids = list(
+        StripeEvent.objects.filter(
+            processed_at__isnull=True,
+            attempts__lt=settings.STRIPE_EVENT_MAX_ATTEMPTS,
+        )
+        .order_by("received_at")
+        .values_list("event_id", flat=True)[:batch_size]
+    )
+
+    processed = 0
+    for event_id in event_ids:
+        try:
+            with transaction.atomic():
+                # several workers may drain the inbox, skip events another one holds
+                event = (
+                    StripeEvent.objects.select_for_update(skip_locked=True)
+                    .filter(event_id=event_id, processed_at__isnull=True)
+                    .first()
+                )
+                if event is None:
+                    continue
+
+                handler = HANDLERS.get(event.type)
+                outcome = handler(event) if handler else "Ignored."
+                event.processed_at = timezone.now()
+                event.attempts = F("attempts") + 1
+                event.last_error = ""
+                event.save(update_fields=["processed_at", "attempts", "last_error"])
+        except Exception as e:
+            StripeEvent.objects.filter(event_id=event_id).update(
+                attempts=F("attempts") + 1, last_error=str(e)
+            )
+            print(f"❌ Stripe event {event_id} failed: {e}")
+        else:
+            processed += 1
+            print(f"✅ Stripe event {event_id} ({event.type}): {outcome}")
+
+    return processed
@@ -0,0 +1,34 @@
+from django.test import TransactionTestCase
+
+from bookings.benchmark import format_report, percentile, run_benchmark
+from bookings.models import Booking
+
+
+class BookingBenchmarkTests(TransactionTestCase):
+    def test_concurrent_journeys_never_double_book(self):
+        report = run_benchmark(
+            workers=4,
+            journeys=40,
+            hot_seats=6,
+            rows=2,
+            seats_per_row=5,
+            users=5,
+            seed=7,
+        )
+
+        self.assertEqual(report["double_booked_seats"], 0)
+        self.assertEqual(report["operations"]["book"]["count"], 40)
+        # every webhook that was queued got applied by the worker running alongside
+        no_runs = {"outcomes": {}}
+        queued = report["operations"].get("webhook", no_runs)["outcomes"].get("ok")
+        applied = report["operations"].get("confirm", no_runs)["outcomes"]
+        self.assertEqual(applied, {"ok": queued} if queued else {})
+        self.assertIn("p99", format_report(report))
+        # the generated showtime is cleaned up again
+        self.assertFalse(Booking.objects.exists())
+
+    def test_percentile(self):
+        samples = list(range(1, 101))
+        self.assertEqual(percentile(samples, 50), 50)
+        self.assertEqual(percentile(samples, 99), 99)
+        self.assertIsNone(percentile([], 50))
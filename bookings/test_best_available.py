@@ -0,0 +1,162 @@
+from rest_framework.test import APITestCase
+from django.test import SimpleTestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from movies.layouts import SeatLayout, get_layout
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from shows.occupancy import load_occupancy
+from bookings.allocation import find_best_available
+from bookings.models import Ticket
+
+
+FAKE_INTENT = {"id": "pi_fake_best", "client_secret": "secret_fake_best"}
+
+
+def make_layout(rows):
+    # rows: {"A": "RRRR", ...}, one letter per seat type starting at number 1
+    types = {"R": "REGULAR", "P": "PREMIUM", "V": "VIP"}
+    seats = []
+    for row, letters in rows.items():
+        for number, letter in enumerate(letters, 1):
+            if letter != " ":
+                seats.append((len(seats) + 1, row, number, types[letter]))
+    return SeatLayout(1, seats)
+
+
+def flags_for(layout, taken=()):
+    return bytearray(
+        (row, number) in taken for _, _, row, number, _ in layout.seats()
+    )
+
+
+class FindBestAvailableTests(SimpleTestCase):
+    def test_prefers_centre_row_and_middle_of_row(self):
+        layout = make_layout({row: "RRRRRRRR" for row in "ABCDE"})
+        picked = find_best_available(layout, flags_for(layout), 2)
+        self.assertEqual(picked, [("C", 4), ("C", 5)])
+
+    def test_block_slides_around_taken_seats(self):
+        layout = make_layout({"A": "RRRRRRRR"})
+        taken = {("A", 4), ("A", 5)}
+        picked = find_best_available(layout, flags_for(layout, taken), 3)
+        self.assertEqual(picked, [("A", 1), ("A", 2), ("A", 3)])
+
+    def test_falls_back_to_next_closest_row(self):
+        layout = make_layout({row: "RRRR" for row in "ABC"})
+        taken = {("B", 2), ("B", 3)}
+        picked = find_best_available(layout, flags_for(layout, taken), 3)
+        self.assertEqual(picked, [("A", 2), ("A", 3), ("A", 4)])
+
+    def test_numbering_gaps_and_seat_types_split_runs(self):
+        layout = make_layout({"A": "RR RR", "B": "RPPVV"})
+        self.assertIsNone(
+            find_best_available(layout, flags_for(layout), 3, "REGULAR")
+        )
+        self.assertEqual(
+            find_best_available(layout, flags_for(layout), 2, "VIP"),
+            [("B", 4), ("B", 5)],
+        )
+
+    def test_returns_none_when_sold_out(self):
+        layout = make_layout({"A": "RR"})
+        taken = {("A", 1)}
+        self.assertIsNone(find_best_available(layout, flags_for(layout, taken), 2))
+
+
+class BestAvailableBookingTests(APITestCase):
+    def setUp(self):
+        stripe_patch = patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+        stripe_patch.start()
+        self.addCleanup(stripe_patch.stop)
+
+        theater = Theater.objects.create(name="Best Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=theater, capacity=15
+        )
+        for row in "ABC":
+            for number in range(1, 6):
+                seat_type = "VIP" if row == "C" else "REGULAR"
+                Seat.objects.create(
+                    screen=self.screen, row=row, number=number, seat_type=seat_type
+                )
+        movie = Movie.objects.create(
+            title="Best Movie",
+            duration=90,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+        self.user = User.objects.create_user(username="picky", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("booking-list")
+
+    def book_best(self, count, **extra):
+        return self.client.post(
+            self.url,
+            {
+                "showtime_id": self.showtime.id,
+                "best_available": {"count": count, **extra},
+            },
+            format="json",
+        )
+
+    def booked_seats(self, response):
+        return [ticket["seat_str"] for ticket in response.data["tickets"]]
+
+    def test_server_picks_centre_block(self):
+        response = self.book_best(3)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.booked_seats(response), ["B2", "B3", "B4"])
+
+    def test_seat_type_preference(self):
+        response = self.book_best(2, seat_type="VIP")
+        self.assertEqual(sorted(self.booked_seats(response)), ["C2", "C3"])
+
+    def test_no_block_left(self):
+        response = self.book_best(6)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_seats_and_best_available_are_exclusive(self):
+        response = self.client.post(
+            self.url,
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "A", "number": 1}],
+                "best_available": {"count": 1},
+            },
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_lost_race_picks_again(self):
+        # a stale snapshot says B3 is free, another customer already holds it
+        stale = (get_layout(self.screen.id), bytearray(15))
+        self.client.post(
+            self.url,
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "B", "number": 3}],
+            },
+            format="json",
+        )
+
+        with patch(
+            "shows.occupancy.load_occupancy",
+            side_effect=[stale, load_occupancy(self.showtime.id)],
+        ):
+            response = self.book_best(1)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.booked_seats(response), ["B2"])
+        self.assertEqual(Ticket.objects.filter(is_active=True).count(), 2)
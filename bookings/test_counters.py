@@ -0,0 +1,169 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.catalog import refresh_movies
+from shows.models import Showtime
+from bookings.models import Booking
+from bookings.services import (
+    cancel_showtime,
+    confirm_booking,
+    release_booking,
+    release_expired_holds,
+)
+
+
+FAKE_INTENT = {"id": "pi_fake_counters", "client_secret": "secret_fake_counters"}
+
+
+@patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+class ShowtimeCounterTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Counter Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=theater, capacity=3
+        )
+        for number in range(1, 4):
+            Seat.objects.create(screen=self.screen, row="A", number=number)
+
+        self.movie = Movie.objects.create(
+            title="Counter Movie",
+            duration=120,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+
+        self.user_a = User.objects.create_user(username="user_a", password="pw")
+        self.user_b = User.objects.create_user(username="user_b", password="pw")
+        self.client.force_authenticate(user=self.user_a)
+        self.url = reverse("booking-list")
+
+    def book(self, *numbers):
+        return self.client.post(
+            self.url,
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "A", "number": n} for n in numbers],
+            },
+            format="json",
+        )
+
+    def counters(self):
+        self.showtime.refresh_from_db()
+        return (
+            self.showtime.capacity,
+            self.showtime.seats_sold,
+            self.showtime.seats_held,
+        )
+
+    def test_counters_follow_the_booking_lifecycle(self, mock_stripe):
+        self.assertEqual(self.counters(), (3, 0, 0))
+
+        booking_id = self.book(1, 2).data["id"]
+        self.assertEqual(self.counters(), (3, 0, 2))
+
+        confirm_booking(Booking.objects.get(id=booking_id))
+        self.assertEqual(self.counters(), (3, 2, 0))
+
+        self.client.post(reverse("booking-cancel", args=[booking_id]))
+        self.assertEqual(self.counters(), (3, 0, 0))
+
+    def test_expired_hold_is_taken_off_and_back_on(self, mock_stripe):
+        booking_id = self.book(1).data["id"]
+        Booking.objects.filter(id=booking_id).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        release_expired_holds()
+        self.assertEqual(self.counters(), (3, 0, 0))
+
+        # the payment arrived late, the seat was still free
+        confirm_booking(Booking.objects.get(id=booking_id))
+        self.assertEqual(self.counters(), (3, 1, 0))
+
+    def test_sold_out_show_is_rejected_before_seat_work(self, mock_stripe):
+        self.book(1, 2, 3)
+
+        self.client.force_authenticate(user=self.user_b)
+        with patch("bookings.services.resolve_seats") as resolve_seats:
+            response = self.book(1)
+
+        resolve_seats.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "This showtime is sold out.")
+        self.assertEqual(Booking.objects.filter(user=self.user_b).count(), 0)
+
+    def test_release_uses_the_current_status(self, mock_stripe):
+        stale = Booking.objects.get(id=self.book(1).data["id"])
+        # a webhook confirms it after the cancel view loaded it as Pending
+        confirm_booking(Booking.objects.get(id=stale.id))
+
+        release_booking(stale)
+        self.assertEqual(self.counters(), (3, 0, 0))
+        # releasing it again changes nothing
+        release_booking(stale, status="Refunded")
+        self.assertEqual(self.counters(), (3, 0, 0))
+        self.assertEqual(Booking.objects.get(id=stale.id).status, "Cancelled")
+
+    def test_unswept_expired_holds_do_not_block_the_check(self, mock_stripe):
+        Booking.objects.filter(id=self.book(1, 2, 3).data["id"]).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        self.client.force_authenticate(user=self.user_b)
+        response = self.book(2)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.counters(), (3, 0, 1))
+
+    def test_cancelling_the_showtime_resets_the_counters(self, mock_stripe):
+        confirm_booking(Booking.objects.get(id=self.book(1).data["id"]))
+        self.book(2)
+
+        cancel_showtime(self.showtime)
+        self.assertEqual(self.counters(), (3, 0, 0))
+
+    def test_counters_in_listings(self, mock_stripe):
+        self.book(1)
+
+        response = self.client.get(reverse("showtimes-list"))
+        showtime = response.data["results"][0]
+        self.assertEqual(showtime["seats_held"], 1)
+        self.assertEqual(showtime["seats_available"], 2)
+
+        # the movie's total is denormalized, it catches up on the catalog refresh
+        refresh_movies()
+        response = self.client.get(reverse("movie-list"))
+        self.assertEqual(response.data["results"][0]["seats_available"], 2)
+
+    def test_capacity_follows_the_screen(self, mock_stripe):
+        Seat.objects.create(screen=self.screen, row="B", number=1)
+        self.assertEqual(self.counters(), (4, 0, 0))
+
+    def test_reconcile_fixes_drift(self, mock_stripe):
+        self.book(1, 2)
+        Showtime.objects.filter(id=self.showtime.id).update(
+            seats_sold=5, seats_held=0, capacity=1
+        )
+
+        out = StringIO()
+        call_command("reconcile_showtime_counters", stdout=out)
+        self.assertIn("Fixed the counters of 1 showtimes", out.getvalue())
+        self.assertEqual(self.counters(), (3, 0, 2))
+
+        out = StringIO()
+        call_command("reconcile_showtime_counters", stdout=out)
+        self.assertIn("All showtime counters match", out.getvalue())
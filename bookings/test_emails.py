@@ -0,0 +1,142 @@
+from django.test import TestCase
+from django.core import mail
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket, OutgoingEmail
+from bookings.utils import queue_ticket_email, send_pending_emails
+
+
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Mail Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=4)
+        self.seats = [
+            Seat.objects.create(screen=screen, row="A", number=number)
+            for number in range(1, 5)
+        ]
+        movie = Movie.objects.create(
+            title="Mail Movie", duration=90, release_date=timezone.now().date()
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie, screen=screen, start_time=timezone.now() + timedelta(days=1)
+        )
+
+    def confirmed_booking(self, username, *prices):
+        user = User.objects.create_user(
+            username=username, password="pw", email=f"{username}@example.com"
+        )
+        booking = Booking.objects.create(
+            user=user, showtime=self.showtime, status="Confirmed"
+        )
+        free_seats = self.seats[Ticket.objects.count() :]
+        for seat, price in zip(free_seats, prices):
+            Ticket.objects.create(booking=booking, seat=seat, price=Decimal(price))
+        queue_ticket_email(booking)
+        return booking
+
+    def test_batch_is_sent_over_one_connection(self):
+        self.confirmed_booking("ana", "10.00", "20.00")
+        self.confirmed_booking("ben", "15.00")
+
+        # claim (savepoint, due ids, lease update, release), outbox rows with
+        # everything they render + tickets with seats, one status update per email
+        with patch(
+            "bookings.utils.get_connection", wraps=mail.get_connection
+        ) as get_connection, self.assertNumQueries(8):
+            self.assertEqual(send_pending_emails(), (2, 0))
+        get_connection.assert_called_once()
+
+        self.assertEqual(len(mail.outbox), 2)
+        # total is the sum of the ticket prices, not first price x count
+        self.assertIn("Total Paid: $30.00", mail.outbox[0].body)
+        self.assertIn("Seats:  A1, A2", mail.outbox[0].body)
+        self.assertEqual(send_pending_emails(), (0, 0))
+
+    def test_claimed_emails_are_skipped_by_other_mailers(self):
+        self.confirmed_booking("ana", "10.00")
+        now = timezone.now()
+        concurrent = []
+
+        def send_messages(backend, messages):
+            # another mailer runs while this one is still sending
+            concurrent.append(send_pending_emails(now=now))
+            mail.outbox.extend(messages)
+            return len(messages)
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            autospec=True,
+            side_effect=send_messages,
+        ), self.settings(EMAIL_SEND_LEASE=timedelta(seconds=300)):
+            self.assertEqual(send_pending_emails(now=now), (1, 0))
+        self.assertEqual(concurrent, [(0, 0)])
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claim_of_a_dead_mailer_runs_out(self):
+        self.confirmed_booking("ana", "10.00")
+        now = timezone.now()
+
+        # the mailer dies after claiming, before sending
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.open",
+            side_effect=SystemExit,
+        ), self.settings(EMAIL_SEND_LEASE=timedelta(seconds=300)):
+            with self.assertRaises(SystemExit):
+                send_pending_emails(now=now)
+
+        self.assertEqual(send_pending_emails(now=now + timedelta(seconds=299)), (0, 0))
+        self.assertEqual(send_pending_emails(now=now + timedelta(seconds=300)), (1, 0))
+
+    def test_queueing_twice_sends_once(self):
+        booking = self.confirmed_booking("ana", "10.00")
+        queue_ticket_email(booking)
+
+        send_pending_emails()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_failures_back_off_then_give_up(self):
+        self.confirmed_booking("ana", "10.00")
+        now = timezone.now()
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.send_messages",
+            side_effect=OSError("smtp down"),
+        ), self.settings(EMAIL_RETRY_DELAY=60, EMAIL_MAX_ATTEMPTS=3):
+            self.assertEqual(send_pending_emails(now=now), (0, 1))
+            email = OutgoingEmail.objects.get()
+            self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+            # not due yet
+            self.assertEqual(send_pending_emails(now=now), (0, 0))
+
+            send_pending_emails(now=now + timedelta(seconds=60))
+            email.refresh_from_db()
+            self.assertEqual(email.next_attempt_at, now + timedelta(seconds=180))
+
+            send_pending_emails(now=now + timedelta(seconds=180))
+            email.refresh_from_db()
+            self.assertEqual((email.status, email.attempts), ("failed", 3))
+
+    def test_connection_failure_reschedules_the_batch(self):
+        self.confirmed_booking("ana", "10.00")
+        self.confirmed_booking("ben", "15.00")
+        now = timezone.now()
+
+        with patch(
+            "django.core.mail.backends.locmem.EmailBackend.open",
+            side_effect=ConnectionRefusedError("smtp unreachable"),
+        ), self.settings(EMAIL_RETRY_DELAY=60):
+            # reported like any failed send, `send_emails --loop` keeps going
+            self.assertEqual(send_pending_emails(now=now), (0, 2))
+
+        for email in OutgoingEmail.objects.all():
+            self.assertEqual((email.status, email.attempts), ("pending", 1))
+            self.assertEqual(email.last_error, "smtp unreachable")
+            self.assertEqual(email.next_attempt_at, now + timedelta(seconds=60))
+
+        self.assertEqual(send_pending_emails(now=now + timedelta(seconds=60)), (2, 0))
@@ -0,0 +1,108 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from asgiref.sync import sync_to_async
+from rest_framework_simplejwt.tokens import RefreshToken
+import csv
+import json
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket
+
+
+class TicketExportTests(APITestCase):
+    def setUp(self):
+        self.theaters = []
+        for name in ("North", "South"):
+            theater = Theater.objects.create(name=name, city="Test City")
+            screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=2)
+            seat = Seat.objects.create(screen=screen, row="A", number=1)
+            movie = Movie.objects.create(
+                title=f"{name} Movie", duration=90, release_date=timezone.now().date()
+            )
+            showtime = Showtime.objects.create(
+                movie=movie,
+                screen=screen,
+                start_time=timezone.now() + timedelta(days=1),
+            )
+            self.theaters.append(theater)
+            self.user = User.objects.create_user(
+                username=f"{name.lower()}_fan", password="pw"
+            )
+            booking = Booking.objects.create(
+                user=self.user, showtime=showtime, status="Confirmed"
+            )
+            Ticket.objects.create(booking=booking, seat=seat, price=Decimal("9.50"))
+
+        # booked last week, outside a "today only" export
+        Booking.objects.filter(user__username="south_fan").update(
+            created_at=timezone.now() - timedelta(days=7), status="Cancelled"
+        )
+        self.staff = User.objects.create_user(
+            username="finance", password="pw", is_staff=True
+        )
+        self.url = reverse("ticket-export")
+
+    def export(self, **params):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_export_streams_every_ticket(self):
+        rows = list(csv.DictReader(self.export().splitlines()))
+
+        self.assertEqual([row["theater"] for row in rows], ["North", "South"])
+        self.assertEqual(rows[0]["movie"], "North Movie")
+        self.assertEqual(rows[0]["seat"], "A")
+        self.assertEqual(rows[0]["price"], "9.50")
+
+    def test_jsonl_export_is_filtered(self):
+        today = timezone.localdate().isoformat()
+        lines = self.export(output="jsonl", start=today, end=today).splitlines()
+        self.assertEqual([json.loads(line)["theater"] for line in lines], ["North"])
+
+        lines = self.export(
+            output="jsonl", theater=self.theaters[1].id, status="Cancelled"
+        ).splitlines()
+        self.assertEqual(len(lines), 1)
+        self.assertEqual(json.loads(lines[0])["booking_status"], "Cancelled")
+
+    def test_export_is_staff_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(self.url, {"output": "xlsx"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_asgi_export_streams_asynchronously(self):
+        token = await sync_to_async(RefreshToken.for_user)(self.staff)
+        self.async_client.cookies["access_token"] = str(token.access_token)
+
+        with self.settings(EXPORT_CHUNK_SIZE=1):
+            response = await self.async_client.get(self.url)
+            # an async iterator, Django does not collect it into a list first
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+
+        # the header and one chunk per ticket
+        self.assertEqual(len(chunks), 3)
+        rows = list(csv.DictReader(b"".join(chunks).decode().splitlines()))
+        self.assertEqual(len(rows), 2)
+
+    def test_export_command(self):
+        out = StringIO()
+        call_command("export_bookings", "--status", "Confirmed", stdout=out)
+
+        rows = list(csv.DictReader(out.getvalue().splitlines()))
+        self.assertEqual([row["user"] for row in rows], ["north_fan"])
@@ -0,0 +1,89 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket
+
+
+class BookingHistoryQueryTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="History Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=theater, capacity=40
+        )
+        self.seats = [
+            Seat.objects.create(screen=self.screen, row=row, number=number)
+            for row in "ABCDE"
+            for number in range(1, 9)
+        ]
+        self.movie = Movie.objects.create(
+            title="History Movie", duration=100, release_date=timezone.now().date()
+        )
+        self.user = User.objects.create_user(username="regular", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.seat_iter = iter(self.seats)
+
+    def add_bookings(self, count, tickets_each):
+        for i in range(count):
+            showtime = Showtime.objects.create(
+                movie=self.movie,
+                screen=self.screen,
+                start_time=timezone.now() + timedelta(days=1, hours=3 * i),
+            )
+            booking = Booking.objects.create(user=self.user, showtime=showtime)
+            for _ in range(tickets_each):
+                Ticket.objects.create(
+                    booking=booking, seat=next(self.seat_iter), price=Decimal("7.50")
+                )
+        return booking
+
+    def test_list_query_count_is_flat(self):
+        self.add_bookings(1, 1)
+        # bookings with showtime/movie/screen/theater + totals, tickets with seats
+        with self.assertNumQueries(2):
+            self.client.get(reverse("booking-list"))
+
+        self.add_bookings(8, 4)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("booking-list"))
+
+        self.assertEqual(len(response.data["results"]), 9)
+        self.assertEqual(response.data["results"][0]["total_price"], "30.00")
+        self.assertEqual(len(response.data["results"][0]["tickets"]), 4)
+
+    def test_detail_query_count_is_flat(self):
+        booking = self.add_bookings(1, 4)
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("booking-detail", args=[booking.id]))
+        self.assertEqual(
+            response.data["showtime"]["screen"]["theater"]["city"], "Test City"
+        )
+        self.assertEqual(len(response.data["tickets"]), 4)
+
+    def test_cursor_pages_walk_the_whole_history(self):
+        self.add_bookings(12, 1)
+
+        response = self.client.get(reverse("booking-list"))
+        self.assertNotIn("count", response.data)
+        first_page = [booking["id"] for booking in response.data["results"]]
+
+        response = self.client.get(response.data["next"])
+        second_page = [booking["id"] for booking in response.data["results"]]
+
+        self.assertEqual(len(first_page), 10)
+        self.assertEqual(len(second_page), 2)
+        self.assertIsNone(response.data["next"])
+        # newest first, nothing repeated or skipped
+        self.assertEqual(
+            first_page + second_page,
+            list(
+                Booking.objects.order_by("-created_at", "-id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
@@ -0,0 +1,116 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.apps import apps
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+from unittest.mock import patch
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket
+
+
+FAKE_INTENT = {"id": "pi_fake_hold", "client_secret": "secret_fake_hold"}
+
+
+@patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+class SeatHoldTests(APITestCase):
+    def setUp(self):
+        self.theater = Theater.objects.create(name="Hold Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=self.theater, capacity=2
+        )
+        Seat.objects.create(screen=self.screen, row="A", number=1)
+        Seat.objects.create(screen=self.screen, row="A", number=2)
+
+        self.movie = Movie.objects.create(
+            title="Hold Movie",
+            duration=120,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+
+        self.user_a = User.objects.create_user(username="user_a", password="pw")
+        self.user_b = User.objects.create_user(username="user_b", password="pw")
+        self.client.force_authenticate(user=self.user_a)
+        self.url = reverse("booking-list")
+        self.seat_map_url = reverse("seat_map_api", args=[self.showtime.id])
+        self.payload = {
+            "showtime_id": self.showtime.id,
+            "seats": [{"row": "A", "number": 1}],
+        }
+
+    def expire_holds(self):
+        Booking.objects.filter(status="Pending").update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+    def test_booking_gets_a_hold_expiry(self, mock_stripe):
+        self.client.post(self.url, self.payload, format="json")
+        booking = Booking.objects.get(user=self.user_a)
+        self.assertEqual(booking.status, "Pending")
+        self.assertGreater(booking.expires_at, timezone.now())
+
+    def test_expired_hold_shows_as_available(self, mock_stripe):
+        self.client.post(self.url, self.payload, format="json")
+        response = self.client.get(self.seat_map_url)
+        self.assertEqual(response.data[0]["status"], "taken")
+
+        self.expire_holds()
+        response = self.client.get(self.seat_map_url)
+        self.assertEqual(response.data[0]["status"], "available")
+
+    def test_expired_hold_can_be_booked_before_sweep(self, mock_stripe):
+        self.client.post(self.url, self.payload, format="json")
+        self.expire_holds()
+
+        self.client.force_authenticate(user=self.user_b)
+        response = self.client.post(self.url, self.payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Booking.objects.get(user=self.user_a).status, "Expired")
+
+    def test_sweeper_releases_expired_holds(self, mock_stripe):
+        self.client.post(self.url, self.payload, format="json")
+        self.client.post(
+            self.url,
+            {"showtime_id": self.showtime.id, "seats": [{"row": "A", "number": 2}]},
+            format="json",
+        )
+        self.expire_holds()
+        confirmed = Booking.objects.create(
+            user=self.user_b, showtime=self.showtime, status="Confirmed"
+        )
+
+        out = StringIO()
+        call_command("release_expired_holds", "--batch-size", "1", stdout=out)
+
+        self.assertIn("Released 2", out.getvalue())
+        self.assertEqual(Booking.objects.filter(status="Expired").count(), 2)
+        self.assertFalse(Ticket.objects.filter(is_active=True).exists())
+        confirmed.refresh_from_db()
+        self.assertEqual(confirmed.status, "Confirmed")
+
+    def test_holds_from_before_expiry_are_backfilled(self, mock_stripe):
+        self.client.post(self.url, self.payload, format="json")
+        Booking.objects.update(
+            expires_at=None, created_at=timezone.now() - timedelta(hours=1)
+        )
+
+        migration = import_module("bookings.migrations.0012_backfill_hold_expiry")
+        migration.backfill_hold_expiry(apps, None)
+        call_command("release_expired_holds", stdout=StringIO())
+
+        self.assertEqual(Booking.objects.get().status, "Expired")
+        self.assertFalse(Ticket.objects.filter(is_active=True).exists())
@@ -0,0 +1,130 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+import stripe
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, IdempotencyKey
+from bookings.services import TryAgainError
+
+
+FAKE_INTENT = {"id": "pi_fake_retry", "client_secret": "secret_fake_retry"}
+
+
+@patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+class IdempotencyKeyTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Retry Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=2)
+        for number in (1, 2):
+            Seat.objects.create(screen=screen, row="A", number=number)
+        movie = Movie.objects.create(
+            title="Retry Movie",
+            duration=90,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie, screen=screen, start_time=timezone.now() + timedelta(days=1)
+        )
+        self.user = User.objects.create_user(username="flaky", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("booking-list")
+
+    def book(self, key, number=1):
+        return self.client.post(
+            self.url,
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "A", "number": number}],
+            },
+            format="json",
+            HTTP_IDEMPOTENCY_KEY=key,
+        )
+
+    def test_retry_replays_first_response(self, mock_stripe):
+        first = self.book("checkout-1")
+
+        # one indexed lookup, no seats or stripe touched
+        with self.assertNumQueries(1):
+            retry = self.book("checkout-1")
+
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.json(), first.json())
+        self.assertEqual(retry["Idempotent-Replayed"], "true")
+        self.assertEqual(Booking.objects.count(), 1)
+        mock_stripe.assert_called_once()
+
+    def test_key_reused_for_other_request_is_rejected(self, mock_stripe):
+        self.book("checkout-1")
+        response = self.book("checkout-1", number=2)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    def test_server_errors_are_not_stored(self, mock_stripe):
+        mock_stripe.side_effect = stripe.error.APIConnectionError("down")
+        self.assertEqual(self.book("checkout-1").status_code, 503)
+
+        mock_stripe.side_effect = None
+        self.assertEqual(self.book("checkout-1").status_code, status.HTTP_201_CREATED)
+
+    def test_expired_key_runs_again(self, mock_stripe):
+        response = self.book("checkout-1")
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+        cancel_url = reverse("booking-cancel", args=[response.data["id"]])
+        self.client.post(cancel_url)
+
+        self.book("checkout-1")
+        self.assertEqual(Booking.objects.count(), 2)
+
+    def test_cancel_retry_is_not_an_error(self, mock_stripe):
+        booking_id = self.book("checkout-1").data["id"]
+        cancel_url = reverse("booking-cancel", args=[booking_id])
+
+        first = self.client.post(cancel_url, HTTP_IDEMPOTENCY_KEY="cancel-1")
+        retry = self.client.post(cancel_url, HTTP_IDEMPOTENCY_KEY="cancel-1")
+
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(retry.status_code, status.HTTP_200_OK)
+        # without the key the second cancel is refused
+        self.assertEqual(
+            self.client.post(cancel_url).status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_retryable_errors_are_not_stored(self, mock_stripe):
+        with patch(
+            "bookings.views.reserve_booking",
+            side_effect=TryAgainError("This showtime is very busy, please try again."),
+        ):
+            self.assertEqual(self.book("checkout-1").status_code, 503)
+
+        self.assertEqual(self.book("checkout-1").status_code, status.HTTP_201_CREATED)
+
+    def abandon(self, key):
+        # a worker claimed the key and was killed before it answered
+        with patch("bookings.views.reserve_booking", side_effect=SystemExit):
+            with self.assertRaises(SystemExit):
+                self.book(key)
+
+    def test_abandoned_request_is_taken_over(self, mock_stripe):
+        self.abandon("checkout-1")
+        self.assertEqual(self.book("checkout-1").status_code, status.HTTP_409_CONFLICT)
+
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=1))
+        self.assertEqual(self.book("checkout-1").status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.book("checkout-1")["Idempotent-Replayed"], "true")
+
+    def test_abandoned_key_is_not_taken_over_by_other_request(self, mock_stripe):
+        self.abandon("checkout-1")
+        IdempotencyKey.objects.update(created_at=timezone.now() - timedelta(hours=1))
+
+        response = self.book("checkout-1", number=2)
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertFalse(Booking.objects.exists())
+        # the original request can still be retried
+        self.assertEqual(self.book("checkout-1").status_code, status.HTTP_201_CREATED)
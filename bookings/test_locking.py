@@ -0,0 +1,99 @@
+from rest_framework.test import APITestCase
+from django.core.exceptions import ImproperlyConfigured
+from django.db import OperationalError, connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest import skipIf
+from unittest.mock import patch
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking
+from bookings import services
+
+
+FAKE_INTENT = {"id": "pi_fake_lock", "client_secret": "secret_fake_lock"}
+
+
+@override_settings(BOOKING_LOCK_BACKOFF=0)
+@patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+class LockingStrategyTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Lock Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=4)
+        for number in range(1, 5):
+            Seat.objects.create(screen=screen, row="A", number=number)
+        movie = Movie.objects.create(
+            title="Lock Movie",
+            duration=90,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie, screen=screen, start_time=timezone.now() + timedelta(days=1)
+        )
+        self.user = User.objects.create_user(username="locker", password="pw")
+        self.client.force_authenticate(user=self.user)
+
+    def book(self, *numbers):
+        return self.client.post(
+            reverse("booking-list"),
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "A", "number": n} for n in numbers],
+            },
+            format="json",
+        )
+
+    def test_every_portable_strategy_rejects_taken_seats(self, mock_stripe):
+        for strategy in ("optimistic", "select_for_update"):
+            with self.subTest(strategy=strategy), override_settings(
+                BOOKING_LOCK_STRATEGY=strategy
+            ):
+                Booking.objects.all().delete()
+                first = self.book(1, 2)
+                second = self.book(2, 3)
+                self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+                self.assertEqual(second.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @skipIf(connection.vendor == "postgresql", "advisory locks work on PostgreSQL")
+    @override_settings(BOOKING_LOCK_STRATEGY="advisory")
+    def test_advisory_strategy_needs_postgres(self, mock_stripe):
+        with self.assertRaises(ImproperlyConfigured):
+            services.locking.get_strategy()
+
+    def test_lock_timeout_is_retried(self, mock_stripe):
+        real_claim = services.claim_seats
+        calls = []
+
+        def locked_once(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise OperationalError("database is locked")
+            return real_claim(*args, **kwargs)
+
+        with patch("bookings.services.claim_seats", side_effect=locked_once):
+            response = self.book(1)
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(calls), 2)
+        # the timed out attempt left no booking behind
+        self.assertEqual(Booking.objects.count(), 1)
+
+    @override_settings(BOOKING_LOCK_RETRIES=2)
+    def test_retries_are_bounded(self, mock_stripe):
+        with patch(
+            "bookings.services.claim_seats",
+            side_effect=OperationalError("database is locked"),
+        ) as claim:
+            response = self.book(1)
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn("busy", response.data["error"])
+        self.assertEqual(claim.call_count, 3)
+        self.assertFalse(Booking.objects.exists())
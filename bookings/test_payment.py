@@ -72,3 +72,56 @@ class PaymentFlowTest(APITestCase):
         self.assertEqual(booking.stripe_payment_intent, "pi_fake_12345")
 
         print("\n✅ Payment Intent Mocking Test Passed!")
+
+    @patch("stripe.PaymentIntent.create")
+    def test_stripe_is_called_after_reservation_commits(self, mock_stripe_create):
+        from django.db import connection
+
+        # the test case itself wraps everything in atomic blocks, anything deeper
+        # means the booking transaction is still open during the stripe call
+        outer_depth = len(connection.atomic_blocks)
+        depth_during_call = []
+
+        def fake_create(**kwargs):
+            depth_during_call.append(len(connection.atomic_blocks))
+            return {"id": "pi_fake_2phase", "client_secret": "secret_fake_2phase"}
+
+        mock_stripe_create.side_effect = fake_create
+
+        payload = {
+            "showtime_id": self.showtime.id,
+            "seats": [{"row": "A", "number": 1}],
+        }
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(depth_during_call, [outer_depth])
+        # retries must never be able to create a second intent
+        self.assertIn("idempotency_key", mock_stripe_create.call_args.kwargs)
+
+    @patch("stripe.PaymentIntent.create")
+    def test_stripe_failure_releases_reservation(self, mock_stripe_create):
+        import stripe
+        from bookings.models import Booking, Ticket
+
+        mock_stripe_create.side_effect = stripe.error.APIConnectionError("timeout")
+
+        payload = {
+            "showtime_id": self.showtime.id,
+            "seats": [{"row": "A", "number": 1}],
+        }
+        response = self.client.post(self.url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        booking = Booking.objects.get(user=self.user)
+        self.assertEqual(booking.status, "Cancelled")
+        self.assertFalse(Ticket.objects.filter(is_active=True).exists())
+
+        # the seat is free again for the next attempt
+        mock_stripe_create.side_effect = None
+        mock_stripe_create.return_value = {
+            "id": "pi_fake_retry",
+            "client_secret": "secret_fake_retry",
+        }
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
@@ -0,0 +1,109 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket
+from bookings.pricing import get_price_matrix
+
+
+FAKE_INTENT = {"id": "pi_fake_pricing", "client_secret": "secret_fake_pricing"}
+
+
+class PricingTests(APITestCase):
+    def setUp(self):
+        self.theater = Theater.objects.create(name="Price Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=self.theater, capacity=3, screen_type="IMAX"
+        )
+        for number, seat_type in enumerate(["REGULAR", "PREMIUM", "VIP"], 1):
+            Seat.objects.create(
+                screen=self.screen, row="A", number=number, seat_type=seat_type
+            )
+
+        self.movie = Movie.objects.create(
+            title="Priced Movie",
+            duration=120,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        tomorrow = timezone.now() + timedelta(days=1)
+        self.evening = Showtime.objects.create(
+            movie=self.movie, screen=self.screen, start_time=tomorrow.replace(hour=18)
+        )
+        self.morning = Showtime.objects.create(
+            movie=self.movie, screen=self.screen, start_time=tomorrow.replace(hour=9)
+        )
+
+        self.user = User.objects.create_user(username="shopper", password="pw")
+        self.client.force_authenticate(user=self.user)
+
+    def test_matrix_applies_all_rules(self):
+        # IMAX +4, PREMIUM +5, VIP +10
+        self.assertEqual(
+            get_price_matrix(self.evening.id),
+            {
+                "REGULAR": Decimal("14.00"),
+                "PREMIUM": Decimal("19.00"),
+                "VIP": Decimal("24.00"),
+            },
+        )
+        # 20% off the base price before surcharges
+        self.assertEqual(get_price_matrix(self.morning.id)["PREMIUM"], Decimal("17.00"))
+
+    def test_matrix_is_cached_until_movie_changes(self):
+        showtime = Showtime.objects.select_related("movie", "screen").get(
+            pk=self.evening.id
+        )
+        get_price_matrix(showtime.id, showtime)
+        with self.assertNumQueries(0):
+            get_price_matrix(showtime.id, showtime)
+
+        # changed without signals, as by another process: the inputs are the key
+        Movie.objects.filter(pk=self.movie.pk).update(base_price=Decimal("20.00"))
+        self.assertEqual(get_price_matrix(self.evening.id)["REGULAR"], Decimal("24.00"))
+
+    def test_quote_prices_seats_without_booking(self):
+        response = self.client.post(
+            reverse("booking-quote"),
+            {
+                "showtime_id": self.evening.id,
+                "seats": [{"row": "A", "number": 2}, {"row": "A", "number": 3}],
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["total_amount"], "43.00")
+        self.assertEqual(response.data["seats"][0]["seat_type"], "PREMIUM")
+        self.assertFalse(Booking.objects.exists())
+
+    def test_quote_rejects_unknown_seat(self):
+        response = self.client.post(
+            reverse("booking-quote"),
+            {"showtime_id": self.evening.id, "seats": [{"row": "Z", "number": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+    def test_booking_charges_matrix_prices(self, mock_stripe):
+        response = self.client.post(
+            reverse("booking-list"),
+            {
+                "showtime_id": self.evening.id,
+                "seats": [{"row": "A", "number": 2}, {"row": "A", "number": 3}],
+            },
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        prices = Ticket.objects.order_by("seat__number").values_list("price", flat=True)
+        self.assertEqual(list(prices), [Decimal("19.00"), Decimal("24.00")])
+        self.assertEqual(mock_stripe.call_args.kwargs["amount"], 4300)
@@ -0,0 +1,167 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, SalesRollup, Ticket
+from bookings.services import cancel_showtime, confirm_booking, release_booking
+
+
+class SalesRollupTests(APITestCase):
+    def setUp(self):
+        self.theater = Theater.objects.create(name="Report Cinema", city="Test City")
+        screen = Screen.objects.create(
+            name="Screen 1", theater=self.theater, capacity=4
+        )
+        self.seats = [
+            Seat.objects.create(screen=screen, row="A", number=1),
+            Seat.objects.create(screen=screen, row="A", number=2),
+            Seat.objects.create(screen=screen, row="A", number=3, seat_type="VIP"),
+            # older rows store the display name
+            Seat.objects.create(screen=screen, row="A", number=4, seat_type="Regular"),
+        ]
+        self.movie = Movie.objects.create(
+            title="Report Movie", duration=90, release_date=timezone.now().date()
+        )
+        self.showtime = Showtime.objects.create(
+            movie=self.movie,
+            screen=screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+        self.day = timezone.localdate(self.showtime.start_time)
+        self.user = User.objects.create_user(username="buyer", password="pw")
+        self.staff = User.objects.create_user(
+            username="analyst", password="pw", is_staff=True
+        )
+
+    def book(self, seats, price=Decimal("10.00")):
+        booking = Booking.objects.create(user=self.user, showtime=self.showtime)
+        for seat in seats:
+            Ticket.objects.create(booking=booking, seat=seat, price=price)
+        return booking
+
+    def rollups(self):
+        return {
+            rollup.seat_type: (rollup.tickets_sold, rollup.revenue)
+            for rollup in SalesRollup.objects.all()
+        }
+
+    def test_confirm_and_cancel_update_the_rollups(self):
+        booking = self.book([self.seats[0], self.seats[2], self.seats[3]])
+        confirm_booking(booking)
+        confirm_booking(self.book([self.seats[1]], price=Decimal("8.50")))
+
+        self.assertEqual(
+            self.rollups(),
+            {"REGULAR": (3, Decimal("28.50")), "VIP": (1, Decimal("10.00"))},
+        )
+        self.assertEqual(SalesRollup.objects.get(seat_type="VIP").day, self.day)
+
+        release_booking(booking)
+        self.assertEqual(
+            self.rollups(),
+            {"REGULAR": (1, Decimal("8.50")), "VIP": (0, Decimal("0.00"))},
+        )
+
+    def test_cancelled_showtime_is_taken_off(self):
+        confirm_booking(self.book(self.seats[:2]))
+        self.book(self.seats[2:])  # still pending, never counted
+
+        cancel_showtime(self.showtime)
+        self.assertEqual(self.rollups(), {"REGULAR": (0, Decimal("0.00"))})
+
+    def test_backfill_matches_incremental_rollups(self):
+        confirm_booking(self.book(self.seats[:3]))
+        cancelled = self.book(self.seats[3:])
+        confirm_booking(cancelled)
+        release_booking(cancelled)
+        incremental = self.rollups()
+
+        SalesRollup.objects.all().delete()
+        out = StringIO()
+        call_command("backfill_sales_rollups", stdout=out)
+
+        self.assertIn("Wrote 2 sales rollup rows", out.getvalue())
+        self.assertEqual(self.rollups(), incremental)
+
+    def test_release_of_a_stale_booking_takes_it_off(self):
+        stale = self.book(self.seats[:1])
+        # confirmed by a webhook after the cancel view loaded it as Pending
+        confirm_booking(Booking.objects.get(id=stale.id))
+
+        release_booking(stale)
+        self.assertEqual(self.rollups(), {"REGULAR": (0, Decimal("0.00"))})
+
+    def test_reconcile_fixes_drifted_rows(self):
+        confirm_booking(self.book(self.seats[:2]))
+        confirm_booking(self.book(self.seats[2:3]))
+        # cancelled behind the services' back, the rollups never heard of it
+        Booking.objects.filter(tickets__seat=self.seats[0]).update(status="Cancelled")
+
+        out = StringIO()
+        call_command("backfill_sales_rollups", "--reconcile", stdout=out)
+        self.assertIn("Fixed 1 sales rollup rows", out.getvalue())
+        self.assertEqual(
+            self.rollups(),
+            {"REGULAR": (0, Decimal("0.00")), "VIP": (1, Decimal("10.00"))},
+        )
+
+        out = StringIO()
+        call_command("backfill_sales_rollups", "--reconcile", stdout=out)
+        self.assertIn("Fixed 0 sales rollup rows", out.getvalue())
+
+    def test_report_is_staff_only_and_grouped(self):
+        confirm_booking(self.book(self.seats[:3]))
+        url = reverse("sales-report")
+        params = {
+            "start": self.day.isoformat(),
+            "end": self.day.isoformat(),
+            "group_by": "movie,seat_type",
+        }
+
+        self.client.force_authenticate(user=self.user)
+        self.assertEqual(
+            self.client.get(url, params).status_code, status.HTTP_403_FORBIDDEN
+        )
+
+        self.client.force_authenticate(user=self.staff)
+        with self.assertNumQueries(2):
+            response = self.client.get(url, params)
+
+        self.assertEqual(response.data["tickets_sold"], 3)
+        self.assertEqual(response.data["revenue"], "30.00")
+        self.assertEqual(
+            response.data["results"],
+            [
+                {
+                    "movie_id": self.movie.id,
+                    "movie_title": "Report Movie",
+                    "seat_type": "REGULAR",
+                    "tickets_sold": 2,
+                    "revenue": "20.00",
+                },
+                {
+                    "movie_id": self.movie.id,
+                    "movie_title": "Report Movie",
+                    "seat_type": "VIP",
+                    "tickets_sold": 1,
+                    "revenue": "10.00",
+                },
+            ],
+        )
+
+    def test_report_rejects_bad_queries(self):
+        self.client.force_authenticate(user=self.staff)
+        response = self.client.get(
+            reverse("sales-report"),
+            {"start": "2026-02-01", "end": "2026-01-01", "group_by": "weekday"},
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("group_by", response.data)
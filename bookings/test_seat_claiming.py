@@ -0,0 +1,104 @@
+from rest_framework.test import APITestCase
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from unittest.mock import patch
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket
+from bookings.services import resolve_seats, claim_seats
+
+
+FAKE_INTENT = {"id": "pi_fake_claim", "client_secret": "secret_fake_claim"}
+
+
+@patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+class SeatClaimingTests(APITestCase):
+    def setUp(self):
+        self.theater = Theater.objects.create(name="Claim Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=self.theater, capacity=8
+        )
+        for number in range(1, 9):
+            Seat.objects.create(screen=self.screen, row="A", number=number)
+
+        self.movie = Movie.objects.create(
+            title="Group Movie",
+            duration=120,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+
+        self.user_a = User.objects.create_user(username="user_a", password="pw")
+        self.user_b = User.objects.create_user(username="user_b", password="pw")
+        self.client.force_authenticate(user=self.user_a)
+        self.url = reverse("booking-list")
+
+    def payload(self, *numbers):
+        return {
+            "showtime_id": self.showtime.id,
+            "seats": [{"row": "A", "number": n} for n in numbers],
+        }
+
+    def test_group_claim_runs_constant_queries(self, mock_stripe):
+        """Claiming 8 seats must not issue per-seat queries"""
+        booking = Booking.objects.create(user=self.user_a, showtime=self.showtime)
+        selectors = [{"row": "A", "number": n} for n in range(1, 9)]
+
+        # seat lookup, savepoint, bulk ticket insert, release savepoint,
+        # showtime counter update, seat version bump and read, bulk seat
+        # event insert
+        with self.assertNumQueries(8):
+            seats = resolve_seats(self.screen, selectors)
+            claim_seats(booking, seats, price_for=lambda seat: Decimal("10.00"))
+
+        self.assertEqual(Ticket.objects.filter(showtime=self.showtime).count(), 8)
+
+    def test_overlapping_booking_is_rejected(self, mock_stripe):
+        self.client.post(self.url, self.payload(1, 2), format="json")
+
+        self.client.force_authenticate(user=self.user_b)
+        response = self.client.post(self.url, self.payload(2, 3), format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("A2", response.data["error"])
+        # the failed booking left nothing behind
+        self.assertEqual(Booking.objects.filter(user=self.user_b).count(), 0)
+
+    def test_duplicate_seat_in_request_is_rejected(self, mock_stripe):
+        response = self.client.post(self.url, self.payload(1, 1), format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_database_rejects_second_active_ticket(self, mock_stripe):
+        seat = Seat.objects.get(screen=self.screen, row="A", number=1)
+        first = Booking.objects.create(user=self.user_a, showtime=self.showtime)
+        second = Booking.objects.create(user=self.user_b, showtime=self.showtime)
+        Ticket.objects.create(booking=first, seat=seat, price=Decimal("10.00"))
+
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Ticket.objects.create(booking=second, seat=seat, price=Decimal("10.00"))
+
+    def test_cancel_keeps_tickets_but_frees_seats(self, mock_stripe):
+        response = self.client.post(self.url, self.payload(1, 2), format="json")
+        booking_id = response.data["id"]
+
+        cancel_url = reverse("booking-cancel", args=[booking_id])
+        self.assertEqual(self.client.post(cancel_url).status_code, status.HTTP_200_OK)
+
+        tickets = Ticket.objects.filter(booking_id=booking_id)
+        self.assertEqual(tickets.count(), 2)
+        self.assertFalse(tickets.filter(is_active=True).exists())
+
+        self.client.force_authenticate(user=self.user_b)
+        response = self.client.post(self.url, self.payload(1, 2), format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
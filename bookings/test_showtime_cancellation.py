@@ -0,0 +1,209 @@
+from rest_framework.test import APITestCase
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+import stripe
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket, Refund, SalesRollup
+from bookings.rollups import rebuild as rebuild_rollups
+from bookings.services import cancel_showtime, process_refunds, release_booking
+from bookings.stripe_events import process_stripe_events, record_event
+
+
+class ShowtimeCancellationTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Premiere Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=40)
+        self.seats = [
+            Seat.objects.create(screen=screen, row=row, number=number)
+            for row in "ABCD"
+            for number in range(1, 11)
+        ]
+        movie = Movie.objects.create(
+            title="Premiere", duration=120, release_date=timezone.now().date()
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie, screen=screen, start_time=timezone.now() + timedelta(days=1)
+        )
+        self.staff = User.objects.create_user(
+            username="manager", password="pw", is_staff=True
+        )
+        self.customer = User.objects.create_user(username="fan", password="pw")
+
+    def book(self, seats, status="Confirmed", intent="pi_premiere"):
+        booking = Booking.objects.create(
+            user=self.customer,
+            showtime=self.showtime,
+            status=status,
+            stripe_payment_intent=f"{intent}_{seats[0].id}" if intent else None,
+        )
+        for seat in seats:
+            Ticket.objects.create(booking=booking, seat=seat, price=Decimal("12.50"))
+        return booking
+
+    def sell_out(self):
+        for i in range(0, 36, 2):
+            self.book(self.seats[i : i + 2])
+        self.book(self.seats[36:38], status="Pending", intent=None)
+        self.book(self.seats[38:40], status="Cancelled")
+
+    def test_cancel_runs_constant_queries(self):
+        self.sell_out()
+        # the tickets were sold behind the services' back, count them in
+        rebuild_rollups()
+
+        # showtime update, movie catalog refresh (movie, upcoming showtimes,
+        # update), paid totals, refund insert, rollup totals, rollup update,
+        # booking update, released seats, seat version bump and read, seat
+        # events, ticket update (+ savepoint pair)
+        with self.assertNumQueries(16):
+            cancelled, queued = cancel_showtime(self.showtime)
+
+        self.assertEqual((cancelled, queued), (19, 18))
+        refund = Refund.objects.get(booking__tickets__seat=self.seats[0])
+        self.assertEqual(refund.amount, Decimal("25.00"))
+        self.assertFalse(Ticket.objects.filter(is_active=True).exists())
+        self.assertEqual(Booking.objects.filter(status="Cancelled").count(), 20)
+        self.assertEqual(SalesRollup.objects.get().tickets_sold, 0)
+
+    def test_staff_cancel_and_progress_api(self):
+        self.sell_out()
+        self.client.force_authenticate(user=self.staff)
+
+        url = reverse("showtimes-cancel", args=[self.showtime.id])
+        response = self.client.post(url)
+        self.assertEqual(
+            response.data, {"bookings_cancelled": 19, "refunds_queued": 18}
+        )
+        response = self.client.post(url)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        with patch("stripe.Refund.create", return_value={"id": "re_1"}):
+            process_refunds(batch_size=5, rate=1000)
+
+        response = self.client.get(
+            reverse("showtimes-refunds", args=[self.showtime.id])
+        )
+        self.assertEqual(response.data["succeeded"], 5)
+        self.assertEqual(response.data["pending"], 13)
+        self.assertEqual(response.data["refunded_amount"], "125.00")
+
+    def test_customers_cannot_cancel_showtimes(self):
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(
+            reverse("showtimes-cancel", args=[self.showtime.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cancelled_showtime_cannot_be_booked(self):
+        cancel_showtime(self.showtime)
+        self.client.force_authenticate(user=self.customer)
+        response = self.client.post(
+            reverse("booking-list"),
+            {"showtime_id": self.showtime.id, "seats": [{"row": "A", "number": 1}]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_refunds_are_idempotent_and_retried(self):
+        booking = self.book(self.seats[:2])
+        cancel_showtime(self.showtime)
+
+        with patch(
+            "stripe.Refund.create",
+            side_effect=stripe.error.APIConnectionError("down"),
+        ):
+            self.assertEqual(process_refunds(rate=1000), (0, 1))
+        with patch("stripe.Refund.create", return_value={"id": "re_1"}) as create:
+            call_command("process_refunds", "--rate", "1000", stdout=StringIO())
+
+        create.assert_called_once_with(
+            payment_intent=booking.stripe_payment_intent,
+            amount=2500,
+            metadata={"booking_id": booking.id},
+            idempotency_key=f"refund-{booking.refund.id}",
+        )
+        refund = Refund.objects.get()
+        self.assertEqual((refund.status, refund.attempts), ("succeeded", 2))
+
+    def test_open_payments_are_cancelled(self):
+        booking = self.book(self.seats[:2], status="Pending")
+        self.assertEqual(cancel_showtime(self.showtime), (1, 0))
+
+        refund = Refund.objects.get()
+        self.assertEqual((refund.action, refund.amount), ("cancel", Decimal("25.00")))
+        with patch("stripe.PaymentIntent.cancel") as cancel, patch(
+            "stripe.Refund.create"
+        ) as create:
+            self.assertEqual(process_refunds(rate=1000), (1, 0))
+
+        cancel.assert_called_once_with(
+            booking.stripe_payment_intent, idempotency_key=f"cancel-{refund.id}"
+        )
+        create.assert_not_called()
+        refund.refresh_from_db()
+        self.assertEqual(refund.status, "succeeded")
+
+    def test_payment_arriving_before_its_cancellation_is_refunded(self):
+        booking = self.book(self.seats[:2], status="Pending")
+        cancel_showtime(self.showtime)
+
+        record_event(
+            "evt_paid",
+            "payment_intent.succeeded",
+            {
+                "data": {
+                    "object": {
+                        "id": booking.stripe_payment_intent,
+                        "amount": 2500,
+                        "metadata": {"booking_id": str(booking.id)},
+                    }
+                }
+            },
+        )
+        process_stripe_events()
+
+        refund = Refund.objects.get()
+        self.assertEqual((refund.action, refund.status), ("refund", "pending"))
+        with patch("stripe.Refund.create", return_value={"id": "re_1"}) as create:
+            self.assertEqual(process_refunds(rate=1000), (1, 0))
+        self.assertEqual(create.call_args.kwargs["amount"], 2500)
+
+    def test_late_payment_for_an_expired_hold_is_refunded(self):
+        booking = self.book(self.seats[:2], status="Pending")
+        release_booking(booking, status="Expired")
+        cancel_showtime(self.showtime)
+        # the expired hold's payment is stopped too
+        self.assertEqual(Refund.objects.get().action, "cancel")
+
+        record_event(
+            "evt_late",
+            "payment_intent.succeeded",
+            {
+                "data": {
+                    "object": {
+                        "id": booking.stripe_payment_intent,
+                        "amount": 2500,
+                        "metadata": {"booking_id": str(booking.id)},
+                    }
+                }
+            },
+        )
+        process_stripe_events()
+
+        booking.refresh_from_db()
+        self.showtime.refresh_from_db()
+        self.assertEqual(booking.status, "Expired")
+        self.assertFalse(booking.tickets.filter(is_active=True).exists())
+        self.assertEqual(self.showtime.seats_sold, 0)
+        self.assertFalse(booking.emails.exists())
+        refund = Refund.objects.get()
+        self.assertEqual((refund.action, refund.status), ("refund", "pending"))
@@ -0,0 +1,156 @@
+from rest_framework.test import APITestCase
+from django.core.management import call_command
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+import json
+
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import Showtime
+from bookings.models import Booking, Ticket, StripeEvent, Refund
+from bookings.services import release_booking
+from bookings.stripe_events import process_stripe_events
+
+
+class StripeInboxTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Webhook Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=1)
+        seat = Seat.objects.create(screen=screen, row="A", number=1)
+        movie = Movie.objects.create(
+            title="Webhook Movie", duration=90, release_date=timezone.now().date()
+        )
+        showtime = Showtime.objects.create(
+            movie=movie, screen=screen, start_time=timezone.now() + timedelta(days=1)
+        )
+        user = User.objects.create_user(
+            username="payer", password="pw", email="payer@example.com"
+        )
+        self.booking = Booking.objects.create(
+            user=user,
+            showtime=showtime,
+            stripe_payment_intent="pi_inbox",
+            expires_at=timezone.now() + timedelta(minutes=10),
+        )
+        Ticket.objects.create(booking=self.booking, seat=seat, price=Decimal("10.00"))
+
+    def deliver(self, event_id, event_type, data):
+        event = {"id": event_id, "type": event_type, "data": {"object": data}}
+        with patch("stripe.Webhook.construct_event", return_value=event):
+            return self.client.post(
+                reverse("stripe-webhook"),
+                json.dumps(event),
+                content_type="application/json",
+                HTTP_STRIPE_SIGNATURE="t=1,v1=fake",
+            )
+
+    def intent(self):
+        return {"id": "pi_inbox", "metadata": {"booking_id": str(self.booking.id)}}
+
+    def test_webhook_only_records_the_event(self):
+        with self.assertNumQueries(1):
+            response = self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(StripeEvent.objects.get().type, "payment_intent.succeeded")
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Pending")
+
+    def test_redelivered_event_is_applied_once(self):
+        self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+        self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+        self.assertEqual(StripeEvent.objects.count(), 1)
+
+        self.assertEqual(process_stripe_events(), 1)
+        self.assertEqual(process_stripe_events(), 0)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Confirmed")
+        self.assertEqual(self.booking.emails.count(), 1)
+
+    def test_payment_failure_keeps_the_hold(self):
+        self.deliver("evt_2", "payment_intent.payment_failed", self.intent())
+        process_stripe_events()
+
+        # the customer may still pay with another card until the hold runs out
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Pending")
+        self.assertTrue(self.booking.tickets.filter(is_active=True).exists())
+
+    def test_canceled_intent_releases_the_hold(self):
+        self.deliver("evt_2", "payment_intent.canceled", self.intent())
+        process_stripe_events()
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Cancelled")
+        self.assertFalse(self.booking.tickets.filter(is_active=True).exists())
+
+    def test_payment_for_cancelled_booking_is_refunded(self):
+        release_booking(self.booking)
+        self.deliver(
+            "evt_1", "payment_intent.succeeded", {**self.intent(), "amount": 1000}
+        )
+        self.deliver(
+            "evt_4", "payment_intent.succeeded", {**self.intent(), "amount": 1000}
+        )
+        process_stripe_events()
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Cancelled")
+        refund = Refund.objects.get()
+        self.assertEqual(refund.booking, self.booking)
+        self.assertEqual(refund.stripe_payment_intent, "pi_inbox")
+        self.assertEqual(refund.amount, Decimal("10.00"))
+
+    def test_payment_after_seats_were_taken_is_refunded(self):
+        release_booking(self.booking, status="Expired")
+        other = Booking.objects.create(
+            user=self.booking.user, showtime=self.booking.showtime
+        )
+        Ticket.objects.create(
+            booking=other, seat=self.booking.tickets.get().seat, price=Decimal("10.00")
+        )
+        self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+        process_stripe_events()
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Expired")
+        self.assertEqual(Refund.objects.get().booking, self.booking)
+
+    def test_confirmed_booking_is_not_refunded(self):
+        self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+        self.deliver("evt_4", "payment_intent.succeeded", self.intent())
+        self.assertEqual(process_stripe_events(), 2)
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Confirmed")
+        self.assertFalse(Refund.objects.exists())
+
+    def test_full_refund_releases_confirmed_booking(self):
+        self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+        charge = {"id": "ch_1", "payment_intent": "pi_inbox", "refunded": True}
+        self.deliver("evt_3", "charge.refunded", charge)
+        call_command("process_stripe_events", stdout=StringIO())
+
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Refunded")
+        self.assertEqual(StripeEvent.objects.filter(processed_at=None).count(), 0)
+
+    def test_failed_event_is_retried(self):
+        self.deliver("evt_1", "payment_intent.succeeded", self.intent())
+
+        with patch(
+            "bookings.stripe_events.confirm_booking",
+            side_effect=RuntimeError("db down"),
+        ):
+            self.assertEqual(process_stripe_events(), 0)
+        event = StripeEvent.objects.get()
+        self.assertEqual((event.attempts, event.last_error), (1, "db down"))
+
+        self.assertEqual(process_stripe_events(), 1)
+        self.booking.refresh_from_db()
+        self.assertEqual(self.booking.status, "Confirmed")
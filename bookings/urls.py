@@ -2,7 +2,7 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
 
-from .views import BookingViewSet, stripe_webhook
+from .views import BookingViewSet, SalesReportView, TicketExportView, stripe_webhook
 
 
 router = DefaultRouter()
@@ -11,4 +11,6 @@ router.register(r"bookings", BookingViewSet, basename="booking")
 urlpatterns = [
     path("", include(router.urls)),
     path("webhook/", stripe_webhook, name="stripe-webhook"),
+    path("reports/sales/", SalesReportView.as_view(), name="sales-report"),
+    path("exports/tickets/", TicketExportView.as_view(), name="ticket-export"),
 ]
@@ -1,38 +1,164 @@
-from django.core.mail import send_mail
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.mail import EmailMessage, get_connection
 from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from django.utils import timezone
 
+from .models import OutgoingEmail, Ticket
+
+
+def queue_ticket_email(booking):
+    """Queue the confirmation email, call it inside the confirming transaction."""
+    OutgoingEmail.objects.bulk_create(
+        [OutgoingEmail(booking=booking, kind="ticket")], ignore_conflicts=True
+    )
 
-def send_ticket_email(booking):
-    subject = f"Your Ticket for {booking.showtime.movie.title}"
 
-    seats = booking.tickets.all()
-    seat_list = ", ".join([f"{t.seat.row}{t.seat.number}" for t in seats])
+def build_ticket_email(booking):
+    # expects the booking loaded by send_pending_emails, so no lazy queries here
+    tickets = booking.tickets.all()
+    seat_list = ", ".join([f"{t.seat.row}{t.seat.number}" for t in tickets])
+    total = sum((t.price for t in tickets), Decimal("0.00"))
 
+    subject = f"Your Ticket for {booking.showtime.movie.title}"
     message = f"""
     Hello {booking.user.username},
-    
+
     Your booking is confirmed!
-    
+
     Movie:  {booking.showtime.movie.title}
     Cinema: {booking.showtime.screen.theater.name}
     Screen: {booking.showtime.screen.name}
     Time:   {booking.showtime.start_time.strftime("%Y-%m-%d %H:%M")}
-    
+
     Seats:  {seat_list}
-    
-    Total Paid: ${booking.tickets.first().price * seats.count()}
-    
+
+    Total Paid: ${total}
+
     Please show this email at the entrance.
     """
 
-    try:
-        send_mail(
-            subject=subject,
-            message=message,
-            from_email=settings.EMAIL_HOST_USER,
-            recipient_list=[booking.user.email],
-            fail_silently=False,
+    return EmailMessage(
+        subject=subject,
+        body=message,
+        from_email=settings.EMAIL_HOST_USER,
+        to=[booking.user.email],
+    )
+
+
+BUILDERS = {
+    "ticket": build_ticket_email,
+}
+
+
+def send_pending_emails(batch_size=50, now=None):
+    """
+    Send due outbox emails over a single SMTP connection. A failed email (or
+    the whole batch, when the connection cannot be opened) is retried with
+    exponential backoff and marked failed after EMAIL_MAX_ATTEMPTS. Several
+    mailers may run at once, each sends only the emails it claimed.
+    Returns (sent, failed).
+    """
+    now = now or timezone.now()
+    claimed = _claim(batch_size, now)
+    emails = list(
+        OutgoingEmail.objects.filter(id__in=claimed)
+        .select_related(
+            "booking__user",
+            "booking__showtime__movie",
+            "booking__showtime__screen__theater",
+        )
+        .prefetch_related(
+            Prefetch(
+                "booking__tickets",
+                queryset=Ticket.objects.select_related("seat").order_by(
+                    "seat__row", "seat__number"
+                ),
+            )
         )
-        print("📧 Email sent successfully!")
+        .order_by("next_attempt_at")
+    )
+    if not emails:
+        return 0, 0
+
+    connection = get_connection()
+    try:
+        connection.open()
     except Exception as e:
-        print(f"❌ Failed to send email: {e}")
+        # mail server unreachable, the whole batch backs off and is retried
+        print(f"❌ Failed to connect to the mail server: {e}")
+        for email in emails:
+            _failed(email, e, now)
+        return 0, len(emails)
+
+    sent = failed = 0
+    try:
+        for email in emails:
+            try:
+                connection.send_messages([BUILDERS[email.kind](email.booking)])
+            except Exception as e:
+                failed += 1
+                _failed(email, e, now)
+                print(f"❌ Failed to send email {email.id}: {e}")
+            else:
+                sent += 1
+                email.attempts += 1
+                email.status = "sent"
+                email.sent_at = timezone.now()
+                _save(email)
+    finally:
+        try:
+            connection.close()
+        except Exception as e:
+            # every message was already handed over, nothing to retry
+            print(f"❌ Failed to close the mail server connection: {e}")
+
+    return sent, failed
+
+
+def _claim(batch_size, now):
+    """
+    Claim up to batch_size due emails by pushing them EMAIL_SEND_LEASE into the
+    future, so other mailers skip them while this one sends. Emails of a mailer
+    that dies mid-batch become due again once the lease runs out.
+    """
+    with transaction.atomic():
+        # rows another mailer is claiming right now are skipped, not waited on
+        claimed = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status="pending", next_attempt_at__lte=now)
+            .order_by("next_attempt_at")
+            .values_list("id", flat=True)[:batch_size]
+        )
+        if claimed:
+            OutgoingEmail.objects.filter(id__in=claimed).update(
+                next_attempt_at=now + settings.EMAIL_SEND_LEASE
+            )
+    return claimed
+
+
+def _failed(email, error, now):
+    """Record a failed attempt, back off exponentially until EMAIL_MAX_ATTEMPTS."""
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        email.status = "failed"
+    else:
+        delay = settings.EMAIL_RETRY_DELAY * 2 ** (email.attempts - 1)
+        email.next_attempt_at = now + timedelta(seconds=delay)
+    _save(email)
+
+
+def _save(email):
+    email.save(
+        update_fields=[
+            "status",
+            "attempts",
+            "next_attempt_at",
+            "last_error",
+            "sent_at",
+        ]
+    )
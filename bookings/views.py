@@ -1,49 +1,56 @@
 from django.shortcuts import get_object_or_404
-from django.db import transaction
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
-from django.http import HttpResponse
-from rest_framework import viewsets, status
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.db.models import DecimalField, Prefetch, Sum, Value
+from django.db.models.functions import Coalesce
+from rest_framework import viewsets, views, status
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import action
 from decimal import Decimal
+from drf_spectacular.utils import extend_schema
+import json
 import stripe
 
 
-from movies.models import Seat
 from shows.models import Showtime
-from .models import Booking, Ticket
+from .models import Booking, SalesRollup, Ticket
+from .pagination import BookingCursorPagination
 from .serializers import (
     BookingSerializer,
     CreateBookingSerializer,
     BookingListSerializer,
+    REPORT_DIMENSIONS,
+    SalesReportQuerySerializer,
+    ExportQuerySerializer,
 )
-from .utils import send_ticket_email
-
-
-stripe.api_key = settings.STRIPE_SECRET_KEY
-
-
-def calculate_dynamic_price(showtime, seats):
-    final_price = showtime.movie.base_price
-    if showtime.start_time.hour < 12:
-        discount = final_price * Decimal("0.20")
-        final_price -= discount
-    if seats.seat_type == "VIP":
-        final_price += Decimal("10.00")
-    if seats.seat_type == "Premium":
-        final_price += Decimal("5.00")
-    return final_price
+from .pricing import get_price_matrix, price_for, quote_seats
+from .services import (
+    BookingError,
+    PaymentError,
+    TryAgainError,
+    reserve_booking,
+    reserve_best_available,
+    attach_payment_intent,
+    release_booking,
+)
+from .stripe_events import record_event
+from .exports import CONTENT_TYPES, async_lines, encode, export_rows
+from .idempotency import idempotent
 
 
 class BookingViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
+    # keyset pages, no OFFSET scan or COUNT(*) over the whole history
+    pagination_class = BookingCursorPagination
 
     def get_serializer_class(
         self,
     ) -> CreateBookingSerializer | BookingSerializer | BookingListSerializer:
-        if self.action == "create":
+        if self.action in ("create", "quote"):
             return CreateBookingSerializer
         # control what to show in booking list
         if self.action == "list":
@@ -51,86 +58,116 @@ class BookingViewSet(viewsets.ModelViewSet):
         return BookingSerializer
 
     def get_queryset(self):
-        return Booking.objects.filter(user=self.request.user).order_by("-created_at")
+        queryset = Booking.objects.filter(user=self.request.user).order_by(
+            *BookingCursorPagination.ordering
+        )
+        if self.action in ("list", "retrieve"):
+            # everything the serializers touch, in a fixed number of queries
+            queryset = queryset.select_related(
+                "showtime__movie", "showtime__screen__theater"
+            ).prefetch_related(
+                Prefetch("tickets", queryset=Ticket.objects.select_related("seat"))
+            )
+        if self.action == "list":
+            queryset = queryset.annotate(
+                ticket_total=Coalesce(
+                    Sum("tickets__price"),
+                    Value(Decimal("0.00")),
+                    output_field=DecimalField(max_digits=8, decimal_places=2),
+                )
+            )
+        return queryset
 
+    @idempotent
     def create(self, request, *args, **kwargs):
         serializer = CreateBookingSerializer(data=request.data)
         if serializer.is_valid():
             showtime_id = serializer.validated_data["showtime_id"]
-            seat_ids = serializer.validated_data["seats"]
+            seat_ids = serializer.validated_data.get("seats")
+            best_available = serializer.validated_data.get("best_available")
+
+            showtime = get_object_or_404(
+                Showtime.objects.select_related("movie", "screen"), pk=showtime_id
+            )
+
+            # compiled once per showtime and cached, not once per seat
+            prices = get_price_matrix(showtime.id, showtime)
 
-            showtime = get_object_or_404(Showtime, pk=showtime_id)
-            screen = showtime.screen
+            def seat_price(seat):
+                return price_for(prices, seat.seat_type)
 
             try:
-                with transaction.atomic():
-                    # create booking
-                    booking = Booking.objects.create(
-                        user=request.user,
-                        showtime=showtime,
-                        status="Pending",
+                # phase 1: reserve seats and commit quickly
+                if best_available:
+                    booking, tickets = reserve_best_available(
+                        request.user,
+                        showtime,
+                        best_available["count"],
+                        price_for=seat_price,
+                        seat_type=best_available.get("seat_type"),
                     )
-
-                    total_amount = Decimal("0.00")
-
-                    # create tickets
-                    for seat in seat_ids:
-                        row = seat["row"]
-                        number = seat["number"]
-
-                        try:
-                            seat = Seat.objects.get(
-                                screen=screen,
-                                row=row,
-                                number=number,
-                            )
-                        except Seat.DoesNotExist:
-                            raise Exception(
-                                f"Seat {row}{number} does not exist in {screen.name}"
-                            )
-
-                        if Ticket.objects.filter(
-                            booking__showtime=showtime, seat=seat
-                        ).exists():
-                            raise Exception(f"Seat {row}{number} is already booked!")
-
-                        ticket_price = calculate_dynamic_price(
-                            seats=seat, showtime=showtime
-                        )
-                        total_amount += ticket_price
-
-                        Ticket.objects.create(
-                            booking=booking,
-                            seat=seat,
-                            price=ticket_price,
-                        )
-
-                    # create stripe payment Intent
-                    amount_in_cents = int(total_amount * 100)
-
-                    intent = stripe.PaymentIntent.create(
-                        amount=amount_in_cents,
-                        currency="usd",
-                        metadata={"booking_id": booking.id},
+                else:
+                    booking, tickets = reserve_booking(
+                        request.user, showtime, seat_ids, price_for=seat_price
                     )
+                total_amount = sum(
+                    (ticket.price for ticket in tickets), Decimal("0.00")
+                )
+
+                # phase 2: talk to stripe with no transaction (and no locks) open
+                intent = attach_payment_intent(booking, total_amount)
+            except (PaymentError, TryAgainError) as e:
+                # 5xx, so an Idempotency-Key retry runs again instead of replaying it
+                return Response(
+                    {"error": str(e)}, status=status.HTTP_503_SERVICE_UNAVAILABLE
+                )
+            except Exception as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
-                    # save intent
-                    booking.stripe_payment_intent = intent["id"]
-                    booking.save()
+            # prepare data to send
+            booking_data = BookingListSerializer(booking).data
+            booking_data["total_amount"] = total_amount
+            booking_data["client_secret"] = intent["client_secret"]
 
-                    # prepare data to send
-                    booking_data = BookingListSerializer(booking).data
-                    booking_data["total_amount"] = total_amount
-                    booking_data["client_secret"] = intent["client_secret"]
+            return Response(booking_data, status=status.HTTP_201_CREATED)
 
-                return Response(booking_data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-            except Exception as e:
-                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    @action(detail=False, methods=["post"])
+    def quote(self, request):
+        """Price a set of seats without booking them."""
+        serializer = CreateBookingSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
 
-        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        showtime = get_object_or_404(
+            Showtime.objects.select_related("movie", "screen"),
+            pk=serializer.validated_data["showtime_id"],
+        )
+        try:
+            lines, total = quote_seats(
+                showtime, serializer.validated_data.get("seats", [])
+            )
+        except BookingError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response(
+            {
+                "showtime_id": showtime.id,
+                "seats": [
+                    {
+                        "row": row,
+                        "number": number,
+                        "seat_type": seat_type,
+                        "price": str(price),
+                    }
+                    for row, number, seat_type, price in lines
+                ],
+                "total_amount": str(total),
+            }
+        )
 
     @action(detail=True, methods=["post"])
+    @idempotent
     def cancel(self, request, pk=None):
         booking = self.get_object()
 
@@ -139,19 +176,97 @@ class BookingViewSet(viewsets.ModelViewSet):
                 {"error": "Booking is already cancelled."},
                 status=status.HTTP_400_BAD_REQUEST,
             )
+        if booking.status == "Expired":
+            return Response(
+                {"error": "Booking has expired."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
-        with transaction.atomic():
-            booking.status = "Cancelled"
-            booking.save()
-
-            # delete tickets so the seats become 'Available' again in the Seat Map
-            booking.tickets.all().delete()
+        # deactivate tickets so the seats become 'Available' again in the Seat Map,
+        # the rows are kept for the booking history
+        release_booking(booking)
 
         return Response(
             {"message": "Booking cancelled successfully."}, status=status.HTTP_200_OK
         )
 
 
+class SalesReportView(views.APIView):
+    """Tickets sold and revenue per dimension, read from the sales rollups only."""
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(parameters=[SalesReportQuerySerializer])
+    def get(self, request):
+        query = SalesReportQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = query.validated_data
+
+        rollups = SalesRollup.objects.filter(
+            day__gte=params["start"], day__lte=params["end"]
+        )
+        for name in ("theater", "screen", "movie"):
+            if name in params:
+                rollups = rollups.filter(**{f"{name}_id": params[name]})
+        if "seat_type" in params:
+            rollups = rollups.filter(seat_type=params["seat_type"])
+
+        sums = {"tickets_sold": Sum("tickets_sold"), "revenue": Sum("revenue")}
+        columns = [
+            column for name in params["group_by"] for column in REPORT_DIMENSIONS[name]
+        ]
+        rows = []
+        if columns:
+            rows = rollups.values(*columns).annotate(**sums).order_by(*columns)
+        totals = rollups.aggregate(**sums)
+
+        return Response(
+            {
+                "start": params["start"],
+                "end": params["end"],
+                "group_by": params["group_by"],
+                "tickets_sold": totals["tickets_sold"] or 0,
+                "revenue": f"{totals['revenue'] or 0:.2f}",
+                "results": [
+                    {
+                        **{
+                            column.replace("__", "_"): row[column]
+                            for column in columns
+                        },
+                        "tickets_sold": row["tickets_sold"],
+                        "revenue": f"{row['revenue']:.2f}",
+                    }
+                    for row in rows
+                ],
+            }
+        )
+
+
+class TicketExportView(views.APIView):
+    """Stream every matching ticket as CSV or JSON lines (staff only)."""
+
+    permission_classes = [IsAdminUser]
+
+    @extend_schema(parameters=[ExportQuerySerializer], responses={200: bytes})
+    def get(self, request):
+        query = ExportQuerySerializer(data=request.query_params)
+        if not query.is_valid():
+            return Response(query.errors, status=status.HTTP_400_BAD_REQUEST)
+        params = dict(query.validated_data)
+        output = params.pop("output")
+
+        # rows are read and encoded while the response is being sent
+        lines = encode(export_rows(**params), output)
+        if isinstance(request._request, ASGIRequest):
+            # a sync iterator would be read into a list before the first byte
+            lines = async_lines(lines)
+        response = StreamingHttpResponse(lines, content_type=CONTENT_TYPES[output])
+        filename = f"tickets-{timezone.localdate():%Y%m%d}.{output}"
+        response["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return response
+
+
 @csrf_exempt
 def stripe_webhook(request):
     payload = request.body
@@ -169,19 +284,7 @@ def stripe_webhook(request):
     except stripe.error.SignatureVerificationError as e:
         return HttpResponse(status=400)
 
-    # handle the event
-    if event["type"] == "payment_intent.succeeded":
-        intent = event["data"]["object"]  # the payment intent data
-
-        booking_id = intent["metadata"].get("booking_id")
-
-        if booking_id:
-            try:
-                booking = Booking.objects.get(id=booking_id)
-                booking.status = "Confirmed"
-                booking.save()
-                print(f"✅ Booking {booking.id} Confirmed via Webhook!")
-                send_ticket_email(booking=booking)
-            except Booking.DoesNotExist:
-                print(f"❌ Booking {booking_id} not found!")
+    # only record the event here, `manage.py process_stripe_events` applies it,
+    # so a slow database lock or SMTP server never delays the response to Stripe
+    record_event(event["id"], event["type"], json.loads(payload))
     return HttpResponse(status=200)
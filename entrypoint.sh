@@ -13,6 +13,9 @@ sleep 3
 echo "Applying database migrations..."
 python manage.py migrate
 
+# Rebuild the shared seat maps (no-op unless SEAT_BITMAP_DIR is set)
+python manage.py rebuild_seat_bitmaps
+
 # 3. Create Superuser (Optional automation - removes need to do it manually)
 # You can remove this block if you prefer creating it manually
 # echo "Creating superuser..."
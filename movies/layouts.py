@@ -0,0 +1,103 @@
+"""
+Cached seat layouts.
+
+A screen's seats almost never change, so the sorted layout is computed once
+and cached. Seat-map requests then only have to overlay the showtime's
+occupancy. The cache key carries Screen.layout_version, which is bumped in
+the database when a Seat is saved or deleted or `generate_seats` runs. So
+even with a per-process cache, every process moves to the new layout on its
+next read, whichever process changed the seats. Callers that already load
+the showtime's screen pass the version in; otherwise it costs one primary
+key lookup.
+"""
+
+import zlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F
+
+from .models import Screen, Seat
+
+
+def _cache_key(screen_id, version):
+    return f"seat_layout:{screen_id}:{version}"
+
+
+class SeatLayout:
+    """
+    Seats of one screen in seat-map order (row, number). A seat's position in
+    that order is its ordinal, used to index per-showtime occupancy bitmaps.
+    """
+
+    def __init__(self, screen_id, seats):
+        # seats: (id, row, number, seat_type) tuples, already sorted
+        self.screen_id = screen_id
+        self.seat_ids = tuple(seat[0] for seat in seats)
+        self.seat_types = tuple(seat[3] for seat in seats)
+        self.checksum = zlib.crc32(",".join(map(str, self.seat_ids)).encode())
+
+        # (row label, first ordinal, seat numbers), one entry per row
+        rows = []
+        for ordinal, (seat_id, row, number, seat_type) in enumerate(seats):
+            if not rows or rows[-1][0] != row:
+                rows.append((row, ordinal, []))
+            rows[-1][2].append(number)
+        self.rows = tuple((row, start, tuple(numbers)) for row, start, numbers in rows)
+        self._ordinals = None
+
+    def __len__(self):
+        return len(self.seat_ids)
+
+    def __getstate__(self):
+        # the id -> ordinal index is cheap to rebuild, keep the cached value small
+        return {**self.__dict__, "_ordinals": None}
+
+    def ordinal_of(self, seat_id):
+        if self._ordinals is None:
+            self._ordinals = {sid: i for i, sid in enumerate(self.seat_ids)}
+        return self._ordinals.get(seat_id)
+
+    def seats(self):
+        """Yield (ordinal, seat_id, row, number, seat_type) in seat-map order."""
+        for row, start, numbers in self.rows:
+            for ordinal, number in enumerate(numbers, start):
+                yield (
+                    ordinal,
+                    self.seat_ids[ordinal],
+                    row,
+                    number,
+                    self.seat_types[ordinal],
+                )
+
+
+def build_layout(screen_id):
+    seats = (
+        Seat.objects.filter(screen_id=screen_id)
+        .order_by("row", "number")
+        .values_list("id", "row", "number", "seat_type")
+    )
+    return SeatLayout(screen_id, list(seats))
+
+
+def get_layout(screen_id, version=None):
+    """The screen's layout, `version` is its Screen.layout_version if known."""
+    if version is None:
+        version = (
+            Screen.objects.filter(pk=screen_id)
+            .values_list("layout_version", flat=True)
+            .first()
+        )
+    key = _cache_key(screen_id, version)
+    layout = cache.get(key)
+    if layout is None:
+        layout = build_layout(screen_id)
+        cache.set(key, layout, settings.SEAT_LAYOUT_CACHE_TIMEOUT)
+    return layout
+
+
+def invalidate_layout(screen_id):
+    # a new key for every process, the old entry just expires
+    Screen.objects.filter(pk=screen_id).update(
+        layout_version=F("layout_version") + 1
+    )
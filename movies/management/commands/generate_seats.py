@@ -1,5 +1,7 @@
 from django.core.management.base import BaseCommand
 from movies.models import Screen, Seat
+from movies.layouts import invalidate_layout
+from shows.counters import refresh_capacity
 import math
 import string
 
@@ -47,6 +49,8 @@ class Command(BaseCommand):
 
         if delete_only:
             deleted_count, _ = Seat.objects.filter(screen=screen).delete()
+            invalidate_layout(screen.id)
+            refresh_capacity(screen.id)
             self.stdout.write(
                 self.style.WARNING(f"Deleted {deleted_count} seats for {screen_name}.")
             )
@@ -91,8 +95,11 @@ class Command(BaseCommand):
 
             seats_created_count += seats_in_this_row
 
-        # 4. Save to DB
+        # 4. Save to DB (bulk_create sends no signals, drop the cached layout
+        # and update the showtimes' capacity here)
         Seat.objects.bulk_create(seats_to_create)
+        invalidate_layout(screen.id)
+        refresh_capacity(screen.id)
 
         self.stdout.write(
             self.style.SUCCESS(
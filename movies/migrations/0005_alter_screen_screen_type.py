@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0004_movie_base_price'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='screen',
+            name='screen_type',
+            field=models.CharField(choices=[('2D', 'Standard 2D'), ('3D', '3D'), ('IMAX', 'IMAX')], default='2D', max_length=10),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:30
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+
+
+def populate_now_showing(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Showtime = apps.get_model("shows", "Showtime")
+
+    upcoming = (
+        Showtime.objects.filter(start_time__gt=timezone.now(), is_cancelled=False)
+        .values("movie_id")
+        .annotate(next=Min("start_time"), last=Max("start_time"), count=Count("id"))
+        .order_by()
+    )
+    for row in upcoming:
+        Movie.objects.filter(pk=row["movie_id"]).update(
+            next_showtime=row["next"],
+            last_showtime=row["last"],
+            upcoming_showtime_count=row["count"],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_alter_screen_screen_type'),
+        ('shows', '0006_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='last_showtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='next_showtime',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='movie',
+            name='upcoming_showtime_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='movie',
+            index=models.Index(fields=['last_showtime'], name='movie_now_showing_idx'),
+        ),
+        migrations.RunPython(populate_now_showing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,78 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:10
+
+from django.db import migrations
+
+
+# PostgreSQL: a GIN index on the same expression as movies.search.PG_VECTOR
+PG_FORWARD = [
+    """
+    CREATE INDEX movie_search_idx ON movies_movie USING gin ((
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(description, '')), 'B')
+    ))
+    """,
+]
+PG_REVERSE = ["DROP INDEX IF EXISTS movie_search_idx"]
+
+# SQLite: an FTS5 table over movies_movie, filled once and then kept in sync
+# by triggers (also reinstalled after every migrate, see movies.search)
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE movies_movie_fts USING fts5(
+        title, description,
+        content='movies_movie', content_rowid='id',
+        tokenize='porter unicode61'
+    )
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER movies_movie_fts_au
+    AFTER UPDATE OF title, description ON movies_movie BEGIN
+        INSERT INTO movies_movie_fts(movies_movie_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO movies_movie_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO movies_movie_fts(movies_movie_fts) VALUES ('rebuild')",
+]
+SQLITE_REVERSE = [
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ai",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_ad",
+    "DROP TRIGGER IF EXISTS movies_movie_fts_au",
+    "DROP TABLE IF EXISTS movies_movie_fts",
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0006_movie_now_showing'),
+    ]
+
+    # other databases keep the plain icontains search
+    operations = [
+        migrations.RunPython(
+            run({"postgresql": PG_FORWARD, "sqlite": SQLITE_FORWARD}),
+            run({"postgresql": PG_REVERSE, "sqlite": SQLITE_REVERSE}),
+        ),
+    ]
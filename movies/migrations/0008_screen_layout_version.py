@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0007_movie_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='screen',
+            name='layout_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
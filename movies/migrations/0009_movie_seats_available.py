@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-19 15:20
+
+from django.db import migrations, models
+from django.db.models import F, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+
+def populate_seats_available(apps, schema_editor):
+    Movie = apps.get_model("movies", "Movie")
+    Showtime = apps.get_model("shows", "Showtime")
+
+    upcoming = (
+        Showtime.objects.filter(start_time__gt=timezone.now(), is_cancelled=False)
+        .values("movie_id")
+        .annotate(
+            free=Sum(Greatest(F("capacity") - F("seats_sold") - F("seats_held"), 0))
+        )
+        .order_by()
+    )
+    for row in upcoming:
+        Movie.objects.filter(pk=row["movie_id"]).update(
+            seats_available=row["free"] or 0
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0008_screen_layout_version'),
+        ('shows', '0008_seatevent_expires_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movie',
+            name='seats_available',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_seats_available, migrations.RunPython.noop),
+    ]
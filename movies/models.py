@@ -24,6 +24,38 @@ class Movie(models.Model):
     is_active = models.BooleanField(
         default=True, help_text="Is this movie currently showing?"
     )
+    # denormalized from the upcoming, not cancelled showtimes (shows/catalog.py),
+    # so the customer catalog is a range scan instead of a join over showtimes
+    next_showtime = models.DateTimeField(blank=True, null=True, editable=False)
+    last_showtime = models.DateTimeField(blank=True, null=True, editable=False)
+    upcoming_showtime_count = models.PositiveIntegerField(default=0, editable=False)
+    # free seats over those showtimes, summed from their counters; bookings never
+    # write the movie row, so it trails them by up to one catalog refresh
+    seats_available = models.PositiveIntegerField(default=0, editable=False)
+
+    CATALOG_FIELDS = (
+        "next_showtime",
+        "last_showtime",
+        "upcoming_showtime_count",
+        "seats_available",
+    )
+
+    class Meta:
+        indexes = [
+            # "now showing": the last upcoming showtime is still in the future
+            models.Index(fields=["last_showtime"], name="movie_now_showing_idx"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is None and not self._state.adding:
+            # the catalog fields are only written by shows/catalog.py, a full
+            # save of a stale instance must not put old values back
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.CATALOG_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -51,6 +83,19 @@ class Screen(models.Model):
     )
     capacity = models.PositiveIntegerField(help_text="Total number of seats")
     screen_type = models.CharField(max_length=10, choices=SCREEN_TYPE_CHOICES, default="2D")
+    # bumped whenever the seats change, part of the cached layout's key
+    # (movies/layouts.py), so every process stops using the old layout at once
+    layout_version = models.PositiveIntegerField(default=0, editable=False)
+
+    def save(self, *args, **kwargs):
+        if kwargs.get("update_fields") is None and not self._state.adding:
+            # only moves through F() updates, never write back a stale copy
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != "layout_version"
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.name} at {self.theater}"
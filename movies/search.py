@@ -0,0 +1,119 @@
+"""
+Full-text movie search.
+
+DRF's SearchFilter turns `?search=` into `icontains` lookups, a full scan of
+the movies table with no notion of relevance. MovieSearchFilter keeps the
+same parameter but answers it from a real index:
+
+- PostgreSQL: a GIN expression index over the weighted tsvector of the title
+  (A) and description (B). It is an index on an expression, so Postgres keeps
+  it in sync on every write by itself; results are ranked with ts_rank.
+- SQLite: an external content FTS5 table (movies_movie_fts, porter stemming)
+  kept in sync by insert/update/delete triggers on movies_movie; results are
+  ranked with bm25, a title hit weighing ten times a description hit.
+
+Both are created by migration 0007 for their own vendor only. Every search
+word is a prefix ("incep" finds "Inception") and all of them must match. Any
+other database falls back to the plain SearchFilter.
+"""
+
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+
+FTS_TABLE = "movies_movie_fts"
+
+# must stay identical to the expression indexed by migration 0007, or
+# Postgres cannot use the index
+PG_VECTOR = (
+    "(setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B'))"
+)
+
+# recreated after every migrate: SQLite drops a table's triggers when a
+# migration rebuilds that table to alter it
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, description ON movies_movie BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO {FTS_TABLE}(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+]
+
+
+def install_sqlite_triggers(using=None, **kwargs):
+    """post_migrate handler, puts back the FTS5 sync triggers if they are gone."""
+    conn = connections[using or "default"]
+    if conn.vendor != "sqlite" or FTS_TABLE not in conn.introspection.table_names():
+        return
+    with conn.cursor() as cursor:
+        for statement in SQLITE_TRIGGERS:
+            cursor.execute(statement)
+
+
+def search_words(terms):
+    # only word characters reach the query syntax of either engine
+    return [word for term in terms for word in re.findall(r"\w+", term)]
+
+
+def search_movies(queryset, words):
+    """Filter queryset to the movies matching every word, best match first."""
+    if connection.vendor == "postgresql":
+        query = " & ".join(f"{word}:*" for word in words)
+        match = RawSQL(
+            f"{PG_VECTOR} @@ to_tsquery('english', %s)",
+            [query],
+            output_field=BooleanField(),
+        )
+        rank = RawSQL(
+            f"ts_rank({PG_VECTOR}, to_tsquery('english', %s))",
+            [query],
+            output_field=FloatField(),
+        )
+        queryset = queryset.filter(match)
+    else:
+        query = " ".join(f'"{word}"*' for word in words)
+        matches = RawSQL(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [query]
+        )
+        # bm25 is lower for better matches, negated so both ranks sort alike
+        rank = RawSQL(
+            f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = "movies_movie"."id"',
+            [query],
+            output_field=FloatField(),
+        )
+        queryset = queryset.filter(id__in=matches)
+
+    # rank first, the view's own ordering (or the id) breaks the ties
+    return queryset.alias(search_rank=rank).order_by(
+        "-search_rank", *(queryset.query.order_by or ["id"])
+    )
+
+
+class MovieSearchFilter(filters.SearchFilter):
+    def filter_queryset(self, request, queryset, view):
+        words = search_words(self.get_search_terms(request))
+        if not words or connection.vendor not in ("postgresql", "sqlite"):
+            return super().filter_queryset(request, queryset, view)
+        return search_movies(queryset, words)
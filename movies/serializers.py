@@ -16,6 +16,24 @@ class MovieSerializer(ModelSerializer):
             "genre",
             "poster",
             "release_date",
+            "next_showtime",
+            "upcoming_showtime_count",
+            "seats_available",
+        ]
+
+
+class MovieSummarySerializer(ModelSerializer):
+    # nested in listings, leaves out the long description
+    class Meta:
+        model = Movie
+        fields = [
+            "id",
+            "title",
+            "base_price",
+            "duration",
+            "genre",
+            "poster",
+            "release_date",
         ]
 
 
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from shows.counters import refresh_capacity
+from .layouts import invalidate_layout
+from .models import Seat
+
+
+@receiver([post_save, post_delete], sender=Seat)
+def invalidate_seat_layout(sender, instance, **kwargs):
+    invalidate_layout(instance.screen_id)
+    refresh_capacity(instance.screen_id)
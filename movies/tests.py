@@ -1,3 +1,238 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
 
-# Create your tests here.
+from .layouts import get_layout
+from .models import Movie, Theater, Screen, Seat
+from shows.catalog import refresh_movies
+from shows.models import Showtime
+
+
+class SeatLayoutCacheTests(TestCase):
+    def setUp(self):
+        self.theater = Theater.objects.create(name="Layout Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Layout Screen", theater=self.theater, capacity=12
+        )
+        for row in "BA":
+            for number in (2, 1):
+                Seat.objects.create(screen=self.screen, row=row, number=number)
+
+    def test_layout_is_sorted_and_cached(self):
+        layout = get_layout(self.screen.id)
+        self.assertEqual(
+            [(row, number) for _, _, row, number, _ in layout.seats()],
+            [("A", 1), ("A", 2), ("B", 1), ("B", 2)],
+        )
+
+        # only the screen's layout version is read
+        with self.assertNumQueries(1):
+            self.assertEqual(len(get_layout(self.screen.id)), 4)
+        self.screen.refresh_from_db()
+        with self.assertNumQueries(0):
+            get_layout(self.screen.id, self.screen.layout_version)
+
+    def test_seat_changes_invalidate_layout(self):
+        get_layout(self.screen.id)
+
+        seat = Seat.objects.create(screen=self.screen, row="C", number=1)
+        self.assertEqual(len(get_layout(self.screen.id)), 5)
+
+        seat.delete()
+        self.assertEqual(len(get_layout(self.screen.id)), 4)
+
+    def test_generate_seats_invalidates_layout(self):
+        get_layout(self.screen.id)
+
+        call_command("generate_seats", "Layout Screen", "--clear", stdout=StringIO())
+        self.assertEqual(len(get_layout(self.screen.id)), 12)
+
+    def test_invalidation_does_not_depend_on_the_cache(self):
+        get_layout(self.screen.id)
+
+        # as if generate_seats ran in another process with its own cache
+        with patch("movies.layouts.cache.delete") as delete:
+            call_command("generate_seats", "Layout Screen", "--clear", stdout=StringIO())
+        delete.assert_not_called()
+        self.assertEqual(len(get_layout(self.screen.id)), 12)
+
+        # a stale copy of the screen cannot roll the version back
+        stale = Screen.objects.get(pk=self.screen.pk)
+        Seat.objects.create(screen=self.screen, row="Z", number=1)
+        stale.save()
+        self.assertEqual(len(get_layout(self.screen.id)), 13)
+
+    def test_seat_map_only_queries_occupancy(self):
+        movie = Movie.objects.create(
+            title="Layout Movie", duration=90, release_date=timezone.now().date()
+        )
+        showtime = Showtime.objects.create(
+            movie=movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+        url = reverse("seat_map_api", args=[showtime.id])
+        self.client.get(url)
+
+        # showtime -> screen id, layout version and price inputs, taken seats
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.json()), 4)
+
+
+class NowShowingCatalogTests(TestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Catalog Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Catalog Screen", theater=theater, capacity=1
+        )
+        self.showing = Movie.objects.create(
+            title="Showing", duration=90, release_date=timezone.now().date()
+        )
+        self.ended = Movie.objects.create(
+            title="Ended", duration=90, release_date=timezone.now().date()
+        )
+        now = timezone.now()
+        self.soon = Showtime.objects.create(
+            movie=self.showing, screen=self.screen, start_time=now + timedelta(hours=1)
+        )
+        self.later = Showtime.objects.create(
+            movie=self.showing, screen=self.screen, start_time=now + timedelta(days=2)
+        )
+        Showtime.objects.create(
+            movie=self.ended, screen=self.screen, start_time=now - timedelta(days=1)
+        )
+
+    def test_showtime_changes_keep_the_fields_current(self):
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.next_showtime, self.soon.start_time)
+        self.assertEqual(self.showing.last_showtime, self.later.start_time)
+        self.assertEqual(self.showing.upcoming_showtime_count, 2)
+
+        self.later.is_cancelled = True
+        self.later.save(update_fields=["is_cancelled"])
+        self.soon.delete()
+        self.showing.refresh_from_db()
+        self.assertIsNone(self.showing.last_showtime)
+        self.assertEqual(self.showing.upcoming_showtime_count, 0)
+
+    def test_moving_a_showtime_refreshes_both_movies(self):
+        for showtime in (self.soon, self.later):
+            showtime.movie = self.ended
+            showtime.save()
+
+        self.showing.refresh_from_db()
+        self.ended.refresh_from_db()
+        self.assertIsNone(self.showing.last_showtime)
+        self.assertEqual(self.ended.upcoming_showtime_count, 2)
+        response = self.client.get(reverse("movie-list"))
+        self.assertEqual(
+            [movie["title"] for movie in response.json()["results"]], ["Ended"]
+        )
+
+    def test_saving_a_stale_movie_keeps_the_fields(self):
+        # self.showing was loaded before its showtimes were created
+        self.showing.title = "Still Showing"
+        self.showing.save()
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.title, "Still Showing")
+        self.assertEqual(self.showing.upcoming_showtime_count, 2)
+
+    def test_customer_catalog_skips_the_showtime_join(self):
+        with self.assertNumQueries(2) as queries:
+            response = self.client.get(reverse("movie-list"))
+
+        self.assertEqual(
+            [movie["title"] for movie in response.json()["results"]], ["Showing"]
+        )
+        # seats_available is denormalized too, no query touches the showtimes
+        for query in queries.captured_queries:
+            self.assertNotIn("shows_showtime", query["sql"])
+            self.assertNotIn("DISTINCT", query["sql"])
+
+    def test_refresh_command_catches_up_with_time(self):
+        # the first showtime started since the fields were computed
+        Showtime.objects.filter(id=self.soon.id).update(
+            start_time=timezone.now() - timedelta(minutes=5)
+        )
+
+        out = StringIO()
+        call_command("refresh_movie_catalog", stdout=out)
+        self.assertIn("Refreshed 1 movies", out.getvalue())
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.next_showtime, self.later.start_time)
+        self.assertEqual(self.showing.upcoming_showtime_count, 1)
+
+    def test_refresh_sums_the_free_seats(self):
+        Seat.objects.create(screen=self.screen, row="A", number=1)
+        Seat.objects.create(screen=self.screen, row="A", number=2)
+        Showtime.objects.filter(id=self.soon.id).update(seats_sold=1)
+        # drifted counters never count below zero
+        Showtime.objects.filter(id=self.later.id).update(seats_held=5)
+
+        refresh_movies()
+        self.showing.refresh_from_db()
+        self.assertEqual(self.showing.seats_available, 1)
+
+
+class MovieSearchTests(TestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Search Cinema", city="Test City")
+        screen = Screen.objects.create(
+            name="Search Screen", theater=theater, capacity=1
+        )
+        self.movies = {}
+        for title, description in (
+            ("The Heist", "A crew plans the inception of a perfect robbery."),
+            ("Inception", "A thief steals secrets through dream-sharing."),
+            ("Dreamers", "Three students in Paris."),
+        ):
+            movie = Movie.objects.create(
+                title=title,
+                description=description,
+                duration=120,
+                release_date=timezone.now().date(),
+            )
+            Showtime.objects.create(
+                movie=movie,
+                screen=screen,
+                start_time=timezone.now() + timedelta(days=1),
+            )
+            self.movies[title] = movie
+
+    def search(self, term):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("movie-list"), {"search": term})
+        self.assertEqual(response.status_code, 200)
+        # answered from the FTS5 index, not LIKE scans
+        self.assertIn("movies_movie_fts", queries.captured_queries[0]["sql"])
+        self.assertNotIn("LIKE", queries.captured_queries[0]["sql"])
+        return [movie["title"] for movie in response.json()["results"]]
+
+    def test_title_matches_rank_first(self):
+        self.assertEqual(self.search("inception"), ["Inception", "The Heist"])
+
+    def test_every_word_matches_as_a_prefix(self):
+        self.assertEqual(self.search("incep"), ["Inception", "The Heist"])
+        self.assertEqual(self.search("dream thie"), ["Inception"])
+        # query syntax is stripped, not passed on to the index
+        self.assertEqual(self.search('dream*" OR'), [])
+        self.assertEqual(self.search('"dream* -'), ["Dreamers", "Inception"])
+
+    def test_index_follows_movie_writes(self):
+        movie = self.movies["Dreamers"]
+        movie.title = "Sleepwalkers"
+        movie.save()
+        self.assertEqual(self.search("dreamers"), [])
+        self.assertEqual(self.search("sleepwalk"), ["Sleepwalkers"])
+
+        Movie.objects.filter(title="Inception").update(description="Heist thriller.")
+        self.assertEqual(self.search("dream"), [])
+        self.movies["The Heist"].delete()
+        self.assertEqual(self.search("heist"), ["Inception"])
@@ -12,6 +12,7 @@ from .serializers import (
     ScreenWriteSerializer,
 )
 from .permissions import IsAdminOrReadOnly
+from .search import MovieSearchFilter
 
 
 class MovieViewSet(viewsets.ModelViewSet):
@@ -19,8 +20,9 @@ class MovieViewSet(viewsets.ModelViewSet):
     serializer_class = MovieSerializer
     permission_classes = [IsAdminOrReadOnly]
     # filters
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
+    filter_backends = [DjangoFilterBackend, MovieSearchFilter]
     filterset_fields = ["release_date", "genre", "is_active"]
+    # only used where there is no full-text index (movies/search.py)
     search_fields = ["title", "description"]
     ordering_fields = ["release_date", "duration"]
 
@@ -29,9 +31,11 @@ class MovieViewSet(viewsets.ModelViewSet):
         if self.request.user.is_staff:
             return Movie.objects.all()
 
-        # if customer, show only the with future showtime
-        now = timezone.now()
-        return Movie.objects.filter(showtime__start_time__gt=now).distinct()
+        # if customer, show only the movies with a future showtime: a range
+        # scan over the denormalized last_showtime index, no join or DISTINCT
+        return Movie.objects.filter(last_showtime__gt=timezone.now()).order_by(
+            "next_showtime", "id"
+        )
 
 
 class TheaterViewSet(viewsets.ModelViewSet):
@@ -1,10 +1,33 @@
 from django.contrib import admin
-from .models import Showtime
+from .models import ScheduleTemplate, Showtime
+from bookings.services import cancel_showtime
 
 
 # Register your models here.
 @admin.register(Showtime)
 class ShowtimeAdmin(admin.ModelAdmin):
-    list_display = ("movie", "screen", "start_time", "end_time")
-    list_filter = ("screen", "start_time")
+    list_display = ("movie", "screen", "start_time", "end_time", "is_cancelled")
+    list_filter = ("screen", "start_time", "is_cancelled", "template")
+    autocomplete_fields = ["movie", "screen"]
+    actions = ["cancel_showtimes"]
+
+    @admin.action(description="Cancel selected showtimes and refund their bookings")
+    def cancel_showtimes(self, request, queryset):
+        showtimes = bookings = refunds = 0
+        for showtime in queryset.filter(is_cancelled=False):
+            cancelled, queued = cancel_showtime(showtime)
+            showtimes += 1
+            bookings += cancelled
+            refunds += queued
+        self.message_user(
+            request,
+            f"Cancelled {showtimes} showtimes and {bookings} bookings, "
+            f"{refunds} refunds queued.",
+        )
+
+
+@admin.register(ScheduleTemplate)
+class ScheduleTemplateAdmin(admin.ModelAdmin):
+    list_display = ("movie", "screen", "start_date", "end_date", "is_active")
+    list_filter = ("screen", "is_active")
     autocomplete_fields = ["movie", "screen"]
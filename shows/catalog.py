@@ -0,0 +1,85 @@
+"""
+Denormalized "now showing" fields on Movie.
+
+next_showtime, last_showtime, upcoming_showtime_count and seats_available
+summarize a movie's upcoming, not cancelled showtimes. They are refreshed
+whenever a showtime is created, moved, cancelled or deleted (shows/signals.py
+and the bulk scheduler), so `last_showtime > now` always says whether a movie
+is showing. The others go stale as showtimes start and seats are booked;
+`manage.py refresh_movie_catalog` recomputes them periodically.
+"""
+
+from django.db.models import Count, F, Max, Min, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from movies.models import Movie
+from .models import Showtime
+
+
+FIELDS = [
+    "next_showtime",
+    "last_showtime",
+    "upcoming_showtime_count",
+    "seats_available",
+]
+
+
+def refresh_movies(movie_ids=None, now=None, batch_size=500):
+    """
+    Recompute the fields of the given movies (all when None) and write the
+    ones that changed. Returns the number of movies updated.
+    """
+    now = now or timezone.now()
+    movies = Movie.objects.all()
+    if movie_ids is not None:
+        movies = movies.filter(id__in=movie_ids)
+
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(
+            movies.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", *FIELDS)[:batch_size]
+        )
+        if not batch:
+            return updated
+        last_id = batch[-1][0]
+
+        free_seats = F("capacity") - F("seats_sold") - F("seats_held")
+        upcoming = (
+            Showtime.objects.filter(
+                movie_id__in=[row[0] for row in batch],
+                start_time__gt=now,
+                is_cancelled=False,
+            )
+            .values("movie_id")
+            .annotate(
+                next=Min("start_time"),
+                last=Max("start_time"),
+                count=Count("id"),
+                # clamped per showtime, like Showtime.seats_available
+                free=Sum(Greatest(free_seats, 0)),
+            )
+            .order_by()
+        )
+        fresh = {
+            row["movie_id"]: (
+                row["next"],
+                row["last"],
+                row["count"],
+                row["free"] or 0,
+            )
+            for row in upcoming
+        }
+
+        stale = []
+        for movie_id, *current in batch:
+            values = fresh.get(movie_id, (None, None, 0, 0))
+            if tuple(current) != values:
+                stale.append(Movie(id=movie_id, **dict(zip(FIELDS, values))))
+        Movie.objects.bulk_update(stale, FIELDS)
+        updated += len(stale)
+        if len(batch) < batch_size:
+            return updated
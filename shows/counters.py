@@ -0,0 +1,103 @@
+"""
+Denormalized occupancy counters on Showtime.
+
+seats_sold and seats_held are only ever changed with relative F() updates in
+the same transaction as the ticket inserts and releases that cause them (see
+bookings.services), so listings and the booking pre-check read them instead of
+counting tickets. capacity follows the screen's seat count. Anything that
+touches tickets behind the services' back (the admin, raw SQL, a crashed
+worker) makes them drift; `manage.py reconcile_showtime_counters` recounts
+them from the Ticket table and fixes the rows that are off.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from movies.models import Seat
+from .models import Showtime
+
+
+def adjust(showtime_id, sold=0, held=0):
+    """Shift the counters of one showtime, call it inside the ticket transaction."""
+    if not sold and not held:
+        return
+    Showtime.objects.filter(pk=showtime_id).update(
+        seats_sold=F("seats_sold") + sold, seats_held=F("seats_held") + held
+    )
+
+
+def refresh_capacity(screen_id):
+    """Copy the screen's current seat count to all of its showtimes."""
+    Showtime.objects.filter(screen_id=screen_id).update(
+        capacity=Seat.objects.filter(screen_id=screen_id).count()
+    )
+
+
+def _actual_counts(showtime_ids):
+    """{showtime id: (sold, held)} counted from the active tickets."""
+    from bookings.models import Ticket
+
+    rows = (
+        Ticket.objects.filter(showtime_id__in=showtime_ids, is_active=True)
+        .values("showtime_id")
+        .annotate(
+            sold=Count("id", filter=Q(booking__status="Confirmed")),
+            held=Count("id", filter=Q(booking__status="Pending")),
+        )
+    )
+    return {row["showtime_id"]: (row["sold"], row["held"]) for row in rows}
+
+
+def reconcile(showtimes=None, batch_size=500):
+    """
+    Recount sold, held and capacity for the given showtimes (upcoming ones by
+    default) and fix the rows that drifted. Returns the number of rows fixed.
+    """
+    if showtimes is None:
+        showtimes = Showtime.objects.filter(end_time__gt=timezone.now())
+    showtimes = showtimes.order_by("id")
+
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            showtimes.filter(id__gt=last_id)
+            .annotate(actual_capacity=Count("screen__seats"))
+            .values_list(
+                "id", "seats_sold", "seats_held", "capacity", "actual_capacity"
+            )[:batch_size]
+        )
+        if not batch:
+            return fixed
+        last_id = batch[-1][0]
+
+        counts = _actual_counts([row[0] for row in batch])
+        for showtime_id, sold, held, capacity, actual_capacity in batch:
+            if (sold, held, capacity) != (
+                *counts.get(showtime_id, (0, 0)),
+                actual_capacity,
+            ):
+                fixed += _fix(showtime_id)
+
+
+def _fix(showtime_id):
+    # the row lock orders us against the booking transactions: one that already
+    # bumped the counters has committed its tickets before we count, one that
+    # has not yet will add its delta on top of what we write
+    with transaction.atomic():
+        showtime = (
+            Showtime.objects.select_for_update()
+            .filter(pk=showtime_id)
+            .values("screen_id")
+            .first()
+        )
+        if showtime is None:
+            return 0
+        sold, held = _actual_counts([showtime_id]).get(showtime_id, (0, 0))
+        Showtime.objects.filter(pk=showtime_id).update(
+            seats_sold=sold,
+            seats_held=held,
+            capacity=Seat.objects.filter(screen_id=showtime["screen_id"]).count(),
+        )
+    return 1
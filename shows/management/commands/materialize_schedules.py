@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shows.scheduling import materialize_templates
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the missing showtimes of the active schedule templates. "
+        "Idempotent, meant to run every night."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--days",
+            type=int,
+            default=28,
+            help="How many days ahead to materialize",
+        )
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would be created",
+        )
+
+    def handle(self, *args, **kwargs):
+        dry_run = kwargs["dry_run"]
+        created, conflicts = materialize_templates(
+            days=kwargs["days"], dry_run=dry_run
+        )
+
+        for conflict in conflicts:
+            start_time = timezone.localtime(conflict["start_time"])
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Template {conflict['template']} at "
+                    f"{start_time:%Y-%m-%d %H:%M} skipped: {conflict['error']}"
+                )
+            )
+        verb = "Would create" if dry_run else "Created"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {created} showtimes."))
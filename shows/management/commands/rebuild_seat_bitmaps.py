@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from shows import seat_bitmap
+from shows.models import Showtime
+
+
+class Command(BaseCommand):
+    help = "Rebuild the shared seat availability bitmaps from the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Include showtimes that already started",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not seat_bitmap.is_enabled():
+            self.stdout.write(
+                self.style.WARNING("SEAT_BITMAP_DIR is not set, nothing to rebuild.")
+            )
+            return
+
+        showtimes = Showtime.objects.all()
+        if not kwargs["all"]:
+            showtimes = showtimes.filter(start_time__gt=timezone.now())
+
+        count = 0
+        for showtime_id, screen_id in showtimes.values_list("id", "screen_id"):
+            seat_bitmap.rebuild(showtime_id, screen_id)
+            count += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} seat bitmaps."))
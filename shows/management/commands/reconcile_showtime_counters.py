@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shows import counters
+from shows.models import Showtime
+
+
+class Command(BaseCommand):
+    help = "Recount the sold/held/capacity counters of showtimes and fix drift."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Include showtimes that already ended",
+        )
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and reconcile every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=300.0,
+            help="Seconds to sleep between runs in --loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of showtimes compared per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs["loop"]
+        interval = kwargs["interval"]
+        showtimes = Showtime.objects.all() if kwargs["all"] else None
+
+        while True:
+            fixed = counters.reconcile(showtimes, batch_size=kwargs["batch_size"])
+            if fixed:
+                self.stdout.write(
+                    self.style.WARNING(f"Fixed the counters of {fixed} showtimes.")
+                )
+            elif not loop:
+                self.stdout.write(self.style.SUCCESS("All showtime counters match."))
+            if not loop:
+                return
+            time.sleep(interval)
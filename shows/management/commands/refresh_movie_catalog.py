@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from shows.catalog import refresh_movies
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the movies' next showtime, upcoming showtime count and "
+        "free seats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop",
+            action="store_true",
+            help="Keep running and refresh every --interval seconds",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=60.0,
+            help="Seconds to sleep between refreshes in --loop mode",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of movies recomputed per query",
+        )
+
+    def handle(self, *args, **kwargs):
+        loop = kwargs["loop"]
+        interval = kwargs["interval"]
+
+        while True:
+            updated = refresh_movies(batch_size=kwargs["batch_size"])
+            if updated or not loop:
+                self.stdout.write(self.style.SUCCESS(f"Refreshed {updated} movies."))
+            if not loop:
+                return
+            time.sleep(interval)
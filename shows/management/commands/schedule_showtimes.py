@@ -0,0 +1,72 @@
+import csv
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from shows.scheduling import schedule_showtimes
+
+
+class Command(BaseCommand):
+    help = (
+        "Schedule many showtimes at once from a CSV (movie,screen,start_time) "
+        "or JSON file. Nothing is created when any row conflicts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON file with the showtimes")
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only check the rows for conflicts",
+        )
+
+    def handle(self, *args, **kwargs):
+        entries = [
+            self.parse_entry(index, row)
+            for index, row in enumerate(self.read_rows(kwargs["path"]))
+        ]
+        if not entries:
+            raise CommandError("The file has no showtimes.")
+
+        created, conflicts = schedule_showtimes(entries, dry_run=kwargs["dry_run"])
+        for conflict in conflicts:
+            self.stdout.write(
+                self.style.ERROR(f"Row {conflict['index']}: {conflict['error']}")
+            )
+        if conflicts:
+            raise CommandError(
+                f"{len(conflicts)} rows conflict, nothing was scheduled."
+            )
+
+        if kwargs["dry_run"]:
+            self.stdout.write(self.style.SUCCESS(f"All {len(entries)} rows fit."))
+        else:
+            self.stdout.write(
+                self.style.SUCCESS(f"Scheduled {len(created)} showtimes.")
+            )
+
+    def read_rows(self, path):
+        try:
+            with open(path, newline="", encoding="utf-8") as f:
+                if path.endswith(".json"):
+                    return json.load(f)
+                return list(csv.DictReader(f))
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+    def parse_entry(self, index, row):
+        try:
+            start_time = parse_datetime(str(row["start_time"]))
+            if start_time is None:
+                raise ValueError(f"invalid start_time {row['start_time']!r}")
+            if timezone.is_naive(start_time):
+                start_time = timezone.make_aware(start_time)
+            return {
+                "movie": int(row["movie"]),
+                "screen": int(row["screen"]),
+                "start_time": start_time,
+            }
+        except (KeyError, TypeError, ValueError) as e:
+            raise CommandError(f"Row {index}: {e}")
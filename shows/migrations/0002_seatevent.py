@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_alter_screen_screen_type'),
+        ('shows', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SeatEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('taken', 'Taken'), ('available', 'Available')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('seat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movies.seat')),
+                ('showtime', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='seat_events', to='shows.showtime')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['showtime', 'id'], name='seat_event_stream_idx')],
+            },
+        ),
+    ]
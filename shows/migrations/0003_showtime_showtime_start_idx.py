@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_alter_screen_screen_type'),
+        ('shows', '0002_seatevent'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='showtime',
+            index=models.Index(fields=['start_time', 'id'], name='showtime_start_idx'),
+        ),
+    ]
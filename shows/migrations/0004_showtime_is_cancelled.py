@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0003_showtime_showtime_start_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='is_cancelled',
+            field=models.BooleanField(default=False, help_text='Cancelled showtimes can no longer be booked.'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:17
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def populate_counters(apps, schema_editor):
+    Showtime = apps.get_model("shows", "Showtime")
+    Seat = apps.get_model("movies", "Seat")
+    Ticket = apps.get_model("bookings", "Ticket")
+
+    for screen_id in Showtime.objects.values_list("screen_id", flat=True).distinct():
+        Showtime.objects.filter(screen_id=screen_id).update(
+            capacity=Seat.objects.filter(screen_id=screen_id).count()
+        )
+
+    rows = (
+        Ticket.objects.filter(is_active=True)
+        .values("showtime_id")
+        .annotate(
+            sold=Count("id", filter=Q(booking__status="Confirmed")),
+            held=Count("id", filter=Q(booking__status="Pending")),
+        )
+    )
+    for row in rows:
+        Showtime.objects.filter(pk=row["showtime_id"]).update(
+            seats_sold=row["sold"], seats_held=row["held"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0010_idempotencykey'),
+        ('movies', '0004_movie_base_price'),
+        ('shows', '0004_showtime_is_cancelled'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='capacity',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='seats_held',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='seats_sold',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('movies', '0005_alter_screen_screen_type'),
+        ('shows', '0005_showtime_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScheduleTemplate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('times', models.JSONField(default=list, help_text='Daily start times, e.g. ["13:00", "16:30", "20:00"]')),
+                ('start_date', models.DateField()),
+                ('end_date', models.DateField()),
+                ('weekdays', models.PositiveSmallIntegerField(default=127, help_text='Weekday bitmask: Mon=1, Tue=2, Wed=4 ... Sun=64 (127 = every day)')),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('movie', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movies.movie')),
+                ('screen', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='movies.screen')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='showtime',
+            name='template',
+            field=models.ForeignKey(blank=True, help_text='The schedule template this showtime was materialized from.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='showtimes', to='shows.scheduletemplate'),
+        ),
+        migrations.AddConstraint(
+            model_name='showtime',
+            constraint=models.UniqueConstraint(condition=models.Q(('template__isnull', False)), fields=('template', 'start_time'), name='unique_template_occurrence'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.8 on 2026-10-19 09:40
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def number_existing_events(apps, schema_editor):
+    # the old ids already count up per showtime, keep them as versions so
+    # clients reconnecting with an old ?since= stay in step
+    SeatEvent = apps.get_model("shows", "SeatEvent")
+    Showtime = apps.get_model("shows", "Showtime")
+
+    SeatEvent.objects.update(version=models.F("id"))
+    latest = (
+        SeatEvent.objects.values("showtime_id")
+        .annotate(version=Max("version"))
+        .order_by()
+    )
+    for row in latest:
+        Showtime.objects.filter(pk=row["showtime_id"]).update(
+            seat_version=row["version"]
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0006_scheduletemplate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='showtime',
+            name='seat_version',
+            field=models.PositiveBigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='seatevent',
+            name='version',
+            field=models.PositiveBigIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.RunPython(number_existing_events, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='seatevent',
+            name='seat_event_stream_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='seatevent',
+            constraint=models.UniqueConstraint(fields=('showtime', 'version'), name='seat_event_stream_version'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-19 10:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('shows', '0007_seat_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='seatevent',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,13 +1,80 @@
 from django.db import models
 from django.core.exceptions import ValidationError
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, time, timedelta
 from django.db.models import Q  # for better queries
 
-from movies.models import Movie, Screen
+from movies.models import Movie, Screen, Seat
+
+
+# turnaround between two showtimes on the same screen
+CLEANING_TIME = timedelta(minutes=15)
+
+
+def showtime_end(start_time, duration):
+    """When a showtime of a `duration` minute movie frees its screen again."""
+    return start_time + timedelta(minutes=duration) + CLEANING_TIME
 
 
 # Create your models here.
+class ScheduleTemplate(models.Model):
+    """
+    A recurring programme: one movie on one screen at the same times on the
+    chosen weekdays of a date range. `manage.py materialize_schedules` turns
+    it into Showtime rows a few weeks ahead.
+    """
+
+    WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+    EVERY_DAY = 0b1111111
+
+    movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
+    screen = models.ForeignKey(Screen, on_delete=models.CASCADE)
+    times = models.JSONField(
+        default=list, help_text='Daily start times, e.g. ["13:00", "16:30", "20:00"]'
+    )
+    start_date = models.DateField()
+    end_date = models.DateField()
+    weekdays = models.PositiveSmallIntegerField(
+        default=EVERY_DAY,
+        help_text="Weekday bitmask: Mon=1, Tue=2, Wed=4 ... Sun=64 (127 = every day)",
+    )
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def clean(self):
+        if self.start_date and self.end_date and self.start_date > self.end_date:
+            raise ValidationError("The start date must not be after the end date.")
+        if not 0 < self.weekdays <= self.EVERY_DAY:
+            raise ValidationError("Pick at least one weekday.")
+        try:
+            self.start_times()
+        except (TypeError, ValueError):
+            raise ValidationError('Times must be a list of "HH:MM" strings.')
+
+    def start_times(self):
+        return sorted(time.fromisoformat(value) for value in self.times)
+
+    def runs_on(self, day):
+        return bool(self.weekdays & (1 << day.weekday()))
+
+    def occurrences(self, first_day, last_day):
+        """Yield the aware start times of this template between two days (inclusive)."""
+        day = max(first_day, self.start_date)
+        last_day = min(last_day, self.end_date)
+        start_times = self.start_times()
+        while day <= last_day:
+            if self.runs_on(day):
+                for start_time in start_times:
+                    yield timezone.make_aware(datetime.combine(day, start_time))
+            day += timedelta(days=1)
+
+    def __str__(self):
+        days = ",".join(
+            name for bit, name in enumerate(self.WEEKDAYS) if self.weekdays & (1 << bit)
+        )
+        return f"{self.movie} on {self.screen} at {', '.join(self.times)} ({days})"
+
+
 class Showtime(models.Model):
     movie = models.ForeignKey(Movie, on_delete=models.CASCADE)
     screen = models.ForeignKey(Screen, on_delete=models.CASCADE)
@@ -15,27 +82,78 @@ class Showtime(models.Model):
     end_time = models.DateTimeField(
         blank=True, null=True, help_text="It will be automatically calculated."
     )
+    is_cancelled = models.BooleanField(
+        default=False, help_text="Cancelled showtimes can no longer be booked."
+    )
+    template = models.ForeignKey(
+        ScheduleTemplate,
+        on_delete=models.SET_NULL,
+        blank=True,
+        null=True,
+        related_name="showtimes",
+        help_text="The schedule template this showtime was materialized from.",
+    )
+    # occupancy counters, kept up to date by the booking services (shows/counters.py).
+    # no CHECK >= 0 on sold/held: a drifted counter must never fail a booking,
+    # reconcile_showtime_counters fixes it instead
+    capacity = models.PositiveIntegerField(default=0, editable=False)
+    seats_sold = models.IntegerField(default=0, editable=False)
+    seats_held = models.IntegerField(default=0, editable=False)
+    # version of the latest SeatEvent, bumped in the transaction that records it
+    seat_version = models.PositiveBigIntegerField(default=0, editable=False)
+
+    COUNTER_FIELDS = ("seats_sold", "seats_held", "seat_version")
+
+    class Meta:
+        indexes = [
+            # showtime listing in cursor pagination order
+            models.Index(fields=["start_time", "id"], name="showtime_start_idx"),
+        ]
+        constraints = [
+            # a template occurrence is materialized at most once
+            models.UniqueConstraint(
+                fields=["template", "start_time"],
+                condition=Q(template__isnull=False),
+                name="unique_template_occurrence",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
         if self.movie and self.start_time:
-            duration = timedelta(minutes=self.movie.duration)
-            cleaning_time = timedelta(minutes=15)
-            self.end_time = self.start_time + duration + cleaning_time
+            self.end_time = showtime_end(self.start_time, self.movie.duration)
+
+        update_fields = kwargs.get("update_fields")
+        if update_fields is None or "screen" in update_fields:
+            self.capacity = Seat.objects.filter(screen_id=self.screen_id).count()
+            if update_fields is not None:
+                kwargs["update_fields"] = {*update_fields, "capacity"}
+        if update_fields is None and not self._state.adding:
+            # the counters only move through F() updates, never write back a
+            # stale in-memory copy of them (e.g. from an admin form)
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
         super().save(*args, **kwargs)
 
+    @property
+    def seats_available(self):
+        return max(self.capacity - self.seats_sold - self.seats_held, 0)
+
     # Check for overlapping showtimes before saving or updating
     def clean(self):
         if not self.movie or not self.start_time:
             return
 
-        duration = timedelta(minutes=self.movie.duration)
-        cleaning_time = timedelta(minutes=15)
-        predicted_end = self.start_time + duration + cleaning_time
+        predicted_end = showtime_end(self.start_time, self.movie.duration)
 
+        # a cancelled showtime no longer occupies its screen
         overlapping_shows = Showtime.objects.filter(
             Q(screen=self.screen)
             & Q(start_time__lt=predicted_end)
             & Q(end_time__gt=self.start_time)
+            & Q(is_cancelled=False)
         ).exclude(pk=self.pk)  # Exclude self
 
         if overlapping_shows.exists():
@@ -48,3 +166,39 @@ class Showtime(models.Model):
         def __str__(self):
             local_time = timezone.localtime(self.start_time)
             return f"{self.movie.title} at {local_time.strftime('%Y-%m-%d %H:%M')} on Screen: {self.screen.name}"
+
+
+class SeatEvent(models.Model):
+    """
+    One seat status change of a showtime. `version` is the stream version
+    clients pass back as `?since=` when they reconnect to the seat stream.
+
+    Versions count up per showtime and are taken from Showtime.seat_version
+    under that showtime's row lock, so they become visible in commit order:
+    once a reader sees version n, every version below n is visible too. (The
+    id cannot serve: ids are handed out at insert time, and a transaction
+    with a lower id may still commit after one with a higher id.)
+    """
+
+    STATUS_CHOICES = [
+        ("taken", "Taken"),
+        ("available", "Available"),
+    ]
+
+    showtime = models.ForeignKey(
+        Showtime, on_delete=models.CASCADE, related_name="seat_events"
+    )
+    seat = models.ForeignKey(Seat, on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES)
+    # hold deadline of a "taken" seat, empty once it is sold
+    expires_at = models.DateTimeField(blank=True, null=True)
+    version = models.PositiveBigIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            # also the index the stream reads changes through
+            models.UniqueConstraint(
+                fields=["showtime", "version"], name="seat_event_stream_version"
+            ),
+        ]
@@ -0,0 +1,59 @@
+from movies.layouts import get_layout
+from bookings.models import Ticket
+from bookings.pricing import PRICE_FIELDS, cached_price_matrix
+from .models import Showtime
+from . import seat_bitmap
+
+
+def _load(showtime_id, use_bitmap=True, extra_fields=()):
+    # one showtime lookup, also reading the caller's extra_fields
+    row = (
+        Showtime.objects.filter(pk=showtime_id)
+        .values_list(*seat_bitmap.STATE_FIELDS, *extra_fields)
+        .first()
+    )
+    if row is None:
+        return None
+    split = len(seat_bitmap.STATE_FIELDS)
+    state, extra = row[:split], row[split:]
+
+    if use_bitmap and seat_bitmap.is_enabled():
+        # shared memory-mapped occupancy, no Ticket queries
+        bitmap, layout = seat_bitmap.load(showtime_id, state)
+        return layout, bitmap.taken_flags(), extra
+
+    # the layout (rows, numbers, seat types) is cached per screen
+    screen_id, _, layout_version = state
+    layout = get_layout(screen_id, layout_version)
+
+    # get taken seats for the showtime
+    taken_seat_ids = set(
+        Ticket.objects.filter(showtime_id=showtime_id)
+        .holding_seats()
+        .values_list("seat_id", flat=True)
+    )
+    taken_flags = bytearray(seat_id in taken_seat_ids for seat_id in layout.seat_ids)
+    return layout, taken_flags, extra
+
+
+def load_occupancy(showtime_id, use_bitmap=True):
+    """
+    Return (layout, taken_flags) for a showtime, one 0/1 byte per seat ordinal,
+    or None if the showtime does not exist. Pass use_bitmap=False to read the
+    committed state straight from the database.
+    """
+    loaded = _load(showtime_id, use_bitmap)
+    return None if loaded is None else loaded[:2]
+
+
+def load_seat_map(showtime_id):
+    """
+    Return (layout, taken_flags, prices) for a showtime, or None if it does
+    not exist. The price inputs come with the same showtime lookup, so with
+    the bitmap enabled a warm seat map costs a single query.
+    """
+    loaded = _load(showtime_id, extra_fields=PRICE_FIELDS)
+    if loaded is None:
+        return None
+    layout, taken_flags, price_inputs = loaded
+    return layout, taken_flags, cached_price_matrix(*price_inputs)
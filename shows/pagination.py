@@ -0,0 +1,7 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ShowtimeCursorPagination(CursorPagination):
+    # soonest first, id breaks ties between screens starting at the same time;
+    # served by the showtime_start_idx index
+    ordering = ("start_time", "id")
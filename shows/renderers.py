@@ -0,0 +1,12 @@
+from rest_framework.renderers import JSONRenderer
+
+
+class CompactSeatMapRenderer(JSONRenderer):
+    """
+    Opt-in compact seat map: one entry per row with a status bitstring
+    ("1" = taken) instead of one object per seat. Selected with
+    `?format=compact` or `Accept: application/vnd.seatmap.compact+json`.
+    """
+
+    media_type = "application/vnd.seatmap.compact+json"
+    format = "compact"
@@ -0,0 +1,210 @@
+"""
+Bulk showtime scheduling.
+
+Validates a whole programme at once instead of one Showtime.clean() query per
+row: movie durations, the screens' seat counts and every existing showtime of
+the affected screens inside the batch's time window are loaded with one query
+each, then each screen's new and existing slots are sorted by start time and
+swept once, which finds every overlap within the batch and against the
+database in O(n log n). A clean batch is written with one bulk insert (end
+time and capacity precomputed); a batch with any conflict writes nothing and
+gets a per-row report back (or, with partial=True, the rows that fit are
+still written). Used by the showtime bulk endpoint, `manage.py
+schedule_showtimes` and the schedule template materializer below.
+"""
+
+from collections import defaultdict, namedtuple
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from movies.models import Movie, Screen, Seat
+from .catalog import refresh_movies
+from .models import ScheduleTemplate, Showtime, showtime_end
+
+
+# index is the batch row of a new slot, None for a showtime already scheduled
+_Slot = namedtuple("_Slot", "start end screen_id index showtime_id title")
+
+
+def _describe(slot):
+    times = (
+        f"{timezone.localtime(slot.start):%Y-%m-%d %H:%M}-"
+        f"{timezone.localtime(slot.end):%H:%M}"
+    )
+    if slot.index is None:
+        return f"showtime {slot.showtime_id} ({slot.title}, {times})"
+    return f"row {slot.index} ({slot.title}, {times})"
+
+
+def find_overlaps(slots):
+    """
+    Yield (slot, earlier slot) for overlapping slots of the same screen. One
+    sorted sweep per screen, remembering the slot that reaches furthest: a
+    slot overlaps something exactly when it starts before that slot ends.
+    """
+    by_screen = defaultdict(list)
+    for slot in slots:
+        by_screen[slot.screen_id].append(slot)
+
+    for screen_slots in by_screen.values():
+        screen_slots.sort(key=lambda slot: (slot.start, slot.end))
+        furthest = None
+        for slot in screen_slots:
+            if furthest is not None and slot.start < furthest.end:
+                yield slot, furthest
+            if furthest is None or slot.end > furthest.end:
+                furthest = slot
+
+
+def schedule_showtimes(entries, dry_run=False, partial=False):
+    """
+    Validate and create showtimes from [{"movie": id, "screen": id,
+    "start_time": aware datetime, "template": optional id}, ...]. Returns
+    (created showtimes, conflicts), where conflicts is [{"index": row,
+    "error": message}, ...] sorted by row. Nothing is created when there is
+    any conflict, unless partial=True, and never on a dry_run.
+    """
+    errors = {}
+
+    with transaction.atomic():
+        # lock the screens, so two batches for one screen cannot both pass
+        screens = set(
+            Screen.objects.select_for_update()
+            .filter(id__in={entry["screen"] for entry in entries})
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+        movies = {
+            movie_id: (title, duration)
+            for movie_id, title, duration in Movie.objects.filter(
+                id__in={entry["movie"] for entry in entries}
+            ).values_list("id", "title", "duration")
+        }
+
+        slots = []
+        for index, entry in enumerate(entries):
+            if entry["movie"] not in movies:
+                errors[index] = f"Movie {entry['movie']} does not exist."
+            elif entry["screen"] not in screens:
+                errors[index] = f"Screen {entry['screen']} does not exist."
+            else:
+                title, duration = movies[entry["movie"]]
+                start = entry["start_time"]
+                slots.append(
+                    _Slot(
+                        start,
+                        showtime_end(start, duration),
+                        entry["screen"],
+                        index,
+                        None,
+                        title,
+                    )
+                )
+
+        if slots:
+            # a cancelled showtime no longer occupies its screen
+            existing = Showtime.objects.filter(
+                screen_id__in={slot.screen_id for slot in slots},
+                start_time__lt=max(slot.end for slot in slots),
+                end_time__gt=min(slot.start for slot in slots),
+                is_cancelled=False,
+            ).values_list(
+                "start_time", "end_time", "screen_id", "id", "movie__title"
+            )
+            slots += [
+                _Slot(start, end, screen_id, None, showtime_id, title)
+                for start, end, screen_id, showtime_id, title in existing
+            ]
+
+            for slot, other in find_overlaps(slots):
+                for new, clash in ((slot, other), (other, slot)):
+                    if new.index is not None:
+                        errors.setdefault(
+                            new.index, f"Overlaps {_describe(clash)}."
+                        )
+
+        conflicts = [
+            {"index": index, "error": error}
+            for index, error in sorted(errors.items())
+        ]
+        if dry_run or (conflicts and not partial):
+            return [], conflicts
+
+        capacities = dict(
+            Seat.objects.filter(screen_id__in=screens)
+            .values("screen_id")
+            .annotate(seats=Count("id"))
+            .values_list("screen_id", "seats")
+        )
+        created = Showtime.objects.bulk_create(
+            [
+                Showtime(
+                    movie_id=entries[slot.index]["movie"],
+                    screen_id=slot.screen_id,
+                    start_time=slot.start,
+                    end_time=slot.end,
+                    capacity=capacities.get(slot.screen_id, 0),
+                    template_id=entries[slot.index].get("template"),
+                )
+                for slot in slots
+                if slot.index is not None and slot.index not in errors
+            ],
+            batch_size=1000,
+        )
+        # bulk_create sends no signals, refresh the movies' catalog fields here
+        refresh_movies({showtime.movie_id for showtime in created})
+
+    return created, conflicts
+
+
+def materialize_templates(days=28, templates=None, dry_run=False, today=None):
+    """
+    Create the missing future showtimes of the active schedule templates for
+    the next `days` days. Occurrences that already exist are skipped, so it
+    is safe to run every night; occurrences that would overlap another
+    showtime are reported and skipped, the rest are still created.
+    Returns (occurrences created or due on a dry_run, conflicts), each
+    conflict being {"template": id, "start_time": datetime, "error": message}.
+    """
+    today = today or timezone.localdate()
+    last_day = today + timedelta(days=days)
+    now = timezone.now()
+    if templates is None:
+        templates = ScheduleTemplate.objects.filter(
+            is_active=True, start_date__lte=last_day, end_date__gte=today
+        )
+    templates = list(templates)
+
+    # every occurrence already materialized in the window, in one query
+    existing = set(
+        Showtime.objects.filter(
+            template__in=templates, start_time__gte=now
+        ).values_list("template_id", "start_time")
+    )
+    entries = [
+        {
+            "movie": template.movie_id,
+            "screen": template.screen_id,
+            "start_time": start_time,
+            "template": template.id,
+        }
+        for template in templates
+        for start_time in template.occurrences(today, last_day)
+        if start_time > now and (template.id, start_time) not in existing
+    ]
+    if not entries:
+        return 0, []
+
+    created, conflicts = schedule_showtimes(entries, dry_run=dry_run, partial=True)
+    conflicts = [
+        {
+            "template": entries[conflict["index"]]["template"],
+            "start_time": entries[conflict["index"]]["start_time"],
+            "error": conflict["error"],
+        }
+        for conflict in conflicts
+    ]
+    return (len(entries) - len(conflicts) if dry_run else len(created)), conflicts
@@ -0,0 +1,273 @@
+"""
+Shared seat-availability bitmaps.
+
+Every showtime gets one small file holding a bitset of taken seats (indexed by
+the seat's ordinal in the screen layout) plus a hold deadline per seat. The
+files are memory-mapped, so every worker process on a node reads the same
+pages and a seat-map request never has to query the Ticket table. Point
+SEAT_BITMAP_DIR at a node-local tmpfs (e.g. /dev/shm/seatmaps); leaving it
+unset disables the bitmaps and the seat map reads from the database.
+
+Nothing writes to the files when seats change. The header records the
+showtime's seat version (see SeatEvent) that the bits are current to, and a
+reader compares it with Showtime.seat_version, one primary key lookup. When
+the file is behind, the reader replays the newer SeatEvents into it. This
+way a change made in any process or container (the Stripe worker confirming
+a payment, the sweeper releasing holds) reaches every node's files, and no
+directory has to be shared between services. A missing or outdated file,
+or one too far behind, is rebuilt from the database. `manage.py
+rebuild_seat_bitmaps` rebuilds everything on startup.
+"""
+
+import math
+import mmap
+import os
+import struct
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+from movies.layouts import get_layout
+
+
+# magic, screen id, seat count, layout checksum, seat version
+HEADER = struct.Struct("<4sQIIQ")
+VERSION = struct.Struct("<Q")
+VERSION_OFFSET = HEADER.size - VERSION.size
+MAGIC = b"SMB2"
+# hold deadline per seat as unix seconds, 0 means sold (never expires)
+DEADLINE = struct.Struct("<I")
+
+TAKEN = "taken"
+HELD = "held"
+FREE = "free"
+
+
+def is_enabled():
+    return bool(getattr(settings, "SEAT_BITMAP_DIR", None))
+
+
+def _path(showtime_id):
+    return os.path.join(settings.SEAT_BITMAP_DIR, f"showtime-{showtime_id}.bin")
+
+
+@contextmanager
+def _locked(showtime_id):
+    import fcntl
+
+    os.makedirs(settings.SEAT_BITMAP_DIR, exist_ok=True)
+    with open(_path(showtime_id) + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+class SeatBitmap:
+    def __init__(self, buffer):
+        self.buffer = buffer
+        magic, self.screen_id, self.seat_count, self.layout_crc, _ = (
+            HEADER.unpack_from(buffer)
+        )
+        if magic != MAGIC:
+            raise ValueError("Not a seat bitmap.")
+        self.bits_offset = HEADER.size
+        self.deadlines_offset = self.bits_offset + math.ceil(self.seat_count / 8)
+
+    @property
+    def version(self):
+        # read live, other processes advance it in the shared pages
+        return VERSION.unpack_from(self.buffer, VERSION_OFFSET)[0]
+
+    @version.setter
+    def version(self, version):
+        VERSION.pack_into(self.buffer, VERSION_OFFSET, version)
+
+    @staticmethod
+    def size_for(seat_count):
+        return HEADER.size + math.ceil(seat_count / 8) + DEADLINE.size * seat_count
+
+    def is_taken(self, ordinal, now=None):
+        byte = self.buffer[self.bits_offset + ordinal // 8]
+        if not (byte >> (ordinal % 8)) & 1:
+            return False
+        deadline = DEADLINE.unpack_from(
+            self.buffer, self.deadlines_offset + DEADLINE.size * ordinal
+        )[0]
+        return deadline == 0 or deadline > (now or time.time())
+
+    def taken_flags(self, now=None):
+        """One 0/1 byte per seat ordinal, expired holds count as free."""
+        now = now or time.time()
+        bits = self.buffer[self.bits_offset : self.deadlines_offset]
+        flags = bytearray(self.seat_count)
+        for ordinal in range(self.seat_count):
+            if (bits[ordinal >> 3] >> (ordinal & 7)) & 1:
+                flags[ordinal] = self.is_taken(ordinal, now)
+        return flags
+
+    def set(self, ordinal, state, deadline=0):
+        index = self.bits_offset + ordinal // 8
+        mask = 1 << (ordinal % 8)
+        if state == FREE:
+            self.buffer[index] &= ~mask & 0xFF
+            deadline = 0
+        else:
+            self.buffer[index] |= mask
+        DEADLINE.pack_into(
+            self.buffer, self.deadlines_offset + DEADLINE.size * ordinal, deadline
+        )
+
+
+# per-process cache of mapped files: path -> (inode, SeatBitmap), a rebuilt
+# file gets a new inode and is mapped again
+_mapped = {}
+
+
+def _open(showtime_id):
+    path = _path(showtime_id)
+    try:
+        inode = os.stat(path).st_ino
+    except FileNotFoundError:
+        _mapped.pop(path, None)
+        return None
+
+    cached = _mapped.get(path)
+    if cached and cached[0] == inode:
+        return cached[1]
+
+    with open(path, "rb") as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        bitmap = SeatBitmap(buffer)
+    except (ValueError, struct.error):
+        # written by an older format, rebuilt by the caller
+        return None
+    _mapped[path] = (inode, bitmap)
+    return bitmap
+
+
+def rebuild(showtime_id, screen_id, layout=None):
+    """Write the bitmap of a showtime from the database and swap it in atomically."""
+    from bookings.models import Ticket
+    from .models import Showtime
+
+    layout = get_layout(screen_id) if layout is None else layout
+
+    with _locked(showtime_id):
+        # version before tickets: changes committed in between are in the
+        # tickets and replayed once more later, which sets the same states
+        version = (
+            Showtime.objects.filter(pk=showtime_id)
+            .values_list("seat_version", flat=True)
+            .first()
+        )
+        buffer = bytearray(SeatBitmap.size_for(len(layout)))
+        HEADER.pack_into(
+            buffer, 0, MAGIC, screen_id, len(layout), layout.checksum, version or 0
+        )
+        bitmap = SeatBitmap(buffer)
+
+        holding = (
+            Ticket.objects.filter(showtime_id=showtime_id)
+            .holding_seats()
+            .values_list("seat_id", "booking__status", "booking__expires_at")
+        )
+        for seat_id, booking_status, expires_at in holding:
+            ordinal = layout.ordinal_of(seat_id)
+            if ordinal is not None:
+                state, deadline = _state_for(booking_status, expires_at)
+                bitmap.set(ordinal, state, deadline)
+
+        tmp_path = f"{_path(showtime_id)}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(buffer)
+        os.replace(tmp_path, _path(showtime_id))
+
+    return _open(showtime_id)
+
+
+def _state_for(booking_status, expires_at):
+    if booking_status == "Pending" and expires_at is not None:
+        return HELD, math.ceil(expires_at.timestamp())
+    return TAKEN, 0
+
+
+def _catch_up(showtime_id, layout, version):
+    """
+    Replay the SeatEvents the file has not seen yet, up to `version`. Returns
+    False when it is too far behind, rebuilding it is cheaper then.
+    """
+    from .models import SeatEvent
+
+    with _locked(showtime_id):
+        try:
+            f = open(_path(showtime_id), "r+b")
+        except FileNotFoundError:
+            return False
+        with f, mmap.mmap(f.fileno(), 0) as buffer:
+            bitmap = SeatBitmap(buffer)
+            # another process may have caught up while we waited for the lock
+            if bitmap.version >= version:
+                return True
+            if version - bitmap.version > max(len(layout), 1):
+                return False
+
+            changes = (
+                SeatEvent.objects.filter(
+                    showtime_id=showtime_id,
+                    version__gt=bitmap.version,
+                    version__lte=version,
+                )
+                .order_by("version")
+                .values_list("seat_id", "status", "expires_at")
+            )
+            for seat_id, status, expires_at in changes:
+                ordinal = layout.ordinal_of(seat_id)
+                if ordinal is None:
+                    continue
+                if status == "available":
+                    bitmap.set(ordinal, FREE)
+                else:
+                    bitmap.set(ordinal, *_state_for("Pending", expires_at))
+            bitmap.version = version
+    return True
+
+
+# what load() needs to know about the showtime
+STATE_FIELDS = ("screen_id", "seat_version", "screen__layout_version")
+
+
+def load(showtime_id, current=None):
+    """
+    Return (bitmap, layout) for a showtime, bringing the bitmap up to the
+    showtime's seat version first: replaying the changes it missed, or
+    rebuilding it when it is missing, far behind or was built for a
+    different seat layout. None if the showtime does not exist. A caller that
+    already read the showtime passes its (screen_id, seat_version,
+    screen__layout_version) as current.
+    """
+    from .models import Showtime
+
+    if current is None:
+        current = (
+            Showtime.objects.filter(pk=showtime_id)
+            .values_list(*STATE_FIELDS)
+            .first()
+        )
+    if current is None:
+        return None
+    screen_id, version, layout_version = current
+
+    layout = get_layout(screen_id, layout_version)
+    bitmap = _open(showtime_id)
+    if (
+        bitmap is None
+        or bitmap.screen_id != screen_id
+        or bitmap.layout_crc != layout.checksum
+        or (bitmap.version < version and not _catch_up(showtime_id, layout, version))
+    ):
+        bitmap = rebuild(showtime_id, screen_id, layout)
+    return bitmap, layout
@@ -1,19 +1,55 @@
+from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
 
 from .models import Showtime
-from movies.serializers import MovieSerializer, ScreenReadSerializer
+from movies.serializers import (
+    MovieSerializer,
+    MovieSummarySerializer,
+    ScreenReadSerializer,
+)
 
 class ShowtimeSerializer(ModelSerializer):
     movie = MovieSerializer(read_only=True)
     screen = ScreenReadSerializer(read_only=True)
+    seats_available = serializers.IntegerField(read_only=True)
     
     class Meta:
         model = Showtime
-        fields = ['id', 'movie', 'screen', 'start_time', 'end_time']
-        
+        fields = [
+            'id',
+            'movie',
+            'screen',
+            'start_time',
+            'end_time',
+            'capacity',
+            'seats_sold',
+            'seats_held',
+            'seats_available',
+        ]
         
+
+
+class ShowtimeListSerializer(ShowtimeSerializer):
+    movie = MovieSummarySerializer(read_only=True)
+
+
 class CreateShowtimeSerializer(ModelSerializer):
     class Meta:
         model = Showtime
-        fields = ['movie', 'screen', 'start_time']
\ No newline at end of file
+        fields = ['movie', 'screen', 'start_time']
+
+class ScheduleEntrySerializer(serializers.Serializer):
+    # plain ids, checked for the whole batch at once by schedule_showtimes
+    movie = serializers.IntegerField()
+    screen = serializers.IntegerField()
+    start_time = serializers.DateTimeField()
+
+
+class BulkScheduleSerializer(serializers.Serializer):
+    showtimes = serializers.ListField(
+        child=ScheduleEntrySerializer(), min_length=1, max_length=5000
+    )
+    dry_run = serializers.BooleanField(
+        required=False, default=False, help_text="Only report conflicts"
+    )
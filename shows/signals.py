@@ -0,0 +1,39 @@
+from django.db.models.signals import post_save, post_delete, pre_save
+from django.dispatch import receiver
+
+from .catalog import refresh_movies
+from .models import Showtime
+
+
+# the fields a movie's "now showing" summary depends on
+_CATALOG_FIELDS = {"movie", "start_time", "is_cancelled"}
+
+
+@receiver(pre_save, sender=Showtime)
+def remember_previous_movie(sender, instance, update_fields=None, **kwargs):
+    # a showtime moved to another movie must drop out of the old one's summary
+    instance._previous_movie_id = None
+    if instance._state.adding or (
+        update_fields is not None and "movie" not in update_fields
+    ):
+        return
+    instance._previous_movie_id = (
+        Showtime.objects.filter(pk=instance.pk)
+        .values_list("movie_id", flat=True)
+        .first()
+    )
+
+
+@receiver(post_save, sender=Showtime)
+def refresh_movie_on_save(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and not _CATALOG_FIELDS & set(update_fields):
+        return
+    movie_ids = {instance.movie_id}
+    if getattr(instance, "_previous_movie_id", None) is not None:
+        movie_ids.add(instance._previous_movie_id)
+    refresh_movies(movie_ids)
+
+
+@receiver(post_delete, sender=Showtime)
+def refresh_movie_on_delete(sender, instance, **kwargs):
+    refresh_movies([instance.movie_id])
@@ -0,0 +1,232 @@
+"""
+Live seat-map deltas over Server-Sent Events.
+
+Served by the ASGI application (MoviesReservationSystem/asgi.py, which the
+compose `web` service runs under uvicorn); under WSGI Django collects the
+whole stream into a list before sending a byte. A fresh client first receives
+a `snapshot` event with the compact seat map and its version, then one `seat`
+event per status change. Reconnecting clients pass the last version they saw
+as `?since=<version>` (or the standard Last-Event-ID header) and only get the
+changes they missed.
+
+Versions are SeatEvent.version, which become visible in commit order, so
+"everything after n" never skips a change that committed late. Each process
+runs one feed per watched showtime: a single task polls the database for new
+changes and fans them out to the queues of all of that showtime's clients, so
+a thousand watchers cost one query per poll interval, not a thousand. A
+client only reads the database itself to catch up from its `since` to where
+the feed was when it joined.
+"""
+
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+
+from .models import Showtime, SeatEvent
+from .occupancy import load_seat_map
+from .views import compact_seat_map
+
+
+# changes read per database query, a client far behind catches up in pages
+BATCH_SIZE = 500
+# changes buffered per client; a client that falls further behind is
+# disconnected and catches up from the database when it reconnects
+QUEUE_SIZE = 1000
+
+
+def _message(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+def _seat_message(change):
+    version, row, number, status = change
+    return _message("seat", {"row": row, "number": number, "status": status}, version)
+
+
+async def _latest_version(showtime_id):
+    version = await (
+        Showtime.objects.filter(pk=showtime_id)
+        .values_list("seat_version", flat=True)
+        .afirst()
+    )
+    return version or 0
+
+
+async def _changes(showtime_id, since, until=None):
+    changes = SeatEvent.objects.filter(showtime_id=showtime_id, version__gt=since)
+    if until is not None:
+        changes = changes.filter(version__lte=until)
+    return [
+        change
+        async for change in changes.order_by("version").values_list(
+            "version", "seat__row", "seat__number", "status"
+        )[:BATCH_SIZE]
+    ]
+
+
+class _Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(QUEUE_SIZE)
+        # set when the feed stops serving this client
+        self.closed = False
+
+
+class _Feed:
+    """Polls the changes of one showtime and hands them to every subscriber."""
+
+    def __init__(self, showtime_id):
+        self.showtime_id = showtime_id
+        self.subscribers = set()
+        # every change up to here has been handed to the subscribers
+        self.version = None
+        self.ready = asyncio.Event()
+        self.loop = asyncio.get_running_loop()
+        self.task = self.loop.create_task(self.run())
+
+    async def run(self):
+        try:
+            self.version = await _latest_version(self.showtime_id)
+            self.ready.set()
+            while self.subscribers:
+                changes = await _changes(self.showtime_id, self.version)
+                for change in changes:
+                    self.publish(change)
+                if changes:
+                    self.version = changes[-1][0]
+                if len(changes) < BATCH_SIZE:
+                    await asyncio.sleep(settings.SEAT_STREAM_POLL_INTERVAL)
+        finally:
+            if _feeds.get(self.showtime_id) is self:
+                del _feeds[self.showtime_id]
+            self.ready.set()
+            # wake whoever is still waiting, they end their stream
+            for subscriber in self.subscribers:
+                self.drop(subscriber)
+
+    def publish(self, change):
+        for subscriber in list(self.subscribers):
+            try:
+                subscriber.queue.put_nowait(change)
+            except asyncio.QueueFull:
+                self.subscribers.discard(subscriber)
+                subscriber.closed = True
+
+    def drop(self, subscriber):
+        subscriber.closed = True
+        try:
+            subscriber.queue.put_nowait(None)
+        except asyncio.QueueFull:
+            pass
+
+
+# per-process feeds of the showtimes someone is watching
+_feeds = {}
+
+
+async def _subscribe(showtime_id):
+    feed = _feeds.get(showtime_id)
+    if (
+        feed is None
+        or feed.task.done()
+        or feed.loop is not asyncio.get_running_loop()
+    ):
+        feed = _feeds[showtime_id] = _Feed(showtime_id)
+    subscriber = _Subscriber()
+    feed.subscribers.add(subscriber)
+    await feed.ready.wait()
+    return feed, subscriber
+
+
+async def _event_stream(showtime_id, since):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.SEAT_STREAM_MAX_SECONDS
+    heartbeat = settings.SEAT_STREAM_HEARTBEAT
+
+    # tell the browser how fast to reconnect once the stream is closed
+    yield f"retry: {int(settings.SEAT_STREAM_POLL_INTERVAL * 1000)}\n\n"
+
+    feed, subscriber = await _subscribe(showtime_id)
+    try:
+        # changes after this version come through the queue
+        joined = feed.version
+        if joined is None:
+            return
+
+        if since is None:
+            # snapshot after joining, so changes racing with it are re-sent, not lost
+            seat_map = await sync_to_async(load_seat_map)(showtime_id)
+            if seat_map is None:
+                return
+            layout, taken_flags, prices = seat_map
+            snapshot = {
+                "version": joined,
+                **compact_seat_map(layout, taken_flags, prices),
+            }
+            yield _message("snapshot", snapshot, event_id=joined)
+            since = joined
+
+        while since < joined:
+            changes = await _changes(showtime_id, since, joined)
+            if not changes:
+                break
+            for change in changes:
+                yield _seat_message(change)
+            since = changes[-1][0]
+
+        last_sent = loop.time()
+        while True:
+            if not subscriber.queue.empty():
+                change = subscriber.queue.get_nowait()
+            else:
+                now = loop.time()
+                if now >= deadline or subscriber.closed:
+                    return
+                try:
+                    change = await asyncio.wait_for(
+                        subscriber.queue.get(),
+                        min(deadline - now, heartbeat - (now - last_sent)),
+                    )
+                except asyncio.TimeoutError:
+                    if loop.time() - last_sent >= heartbeat:
+                        # comment line keeps proxies from closing an idle connection
+                        yield ": keep-alive\n\n"
+                        last_sent = loop.time()
+                    continue
+
+            if change is None:
+                return
+            # the queue may repeat what the catch-up already sent
+            if change[0] > since:
+                yield _seat_message(change)
+                since = change[0]
+                last_sent = loop.time()
+    finally:
+        feed.subscribers.discard(subscriber)
+
+
+async def seat_stream(request, showtime_id):
+    since = request.GET.get("since") or request.headers.get("Last-Event-ID")
+    if since is not None:
+        try:
+            since = int(since)
+        except ValueError:
+            return JsonResponse({"error": "since must be an integer."}, status=400)
+
+    if not await Showtime.objects.filter(pk=showtime_id).aexists():
+        return JsonResponse({"error": "Showtime not found."}, status=404)
+
+    response = StreamingHttpResponse(
+        _event_stream(showtime_id, since), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    # let nginx pass events through as they happen
+    response["X-Accel-Buffering"] = "no"
+    return response
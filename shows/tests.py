@@ -1,3 +1,582 @@
-from django.test import TestCase
+from rest_framework.test import APITestCase
+from asgiref.sync import sync_to_async
+from django.urls import reverse
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+import asyncio
+import os
+import tempfile
 
-# Create your tests here.
+from movies.models import Movie, Theater, Screen, Seat
+from shows.models import ScheduleTemplate, Showtime, SeatEvent
+from shows.scheduling import materialize_templates
+from shows import seat_bitmap
+from shows import streams as streams_module
+from bookings.models import Booking
+
+
+FAKE_INTENT = {"id": "pi_fake_bitmap", "client_secret": "secret_fake_bitmap"}
+
+
+@patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+class SeatBitmapTests(APITestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        settings_override = override_settings(SEAT_BITMAP_DIR=self.tmp_dir.name)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.theater = Theater.objects.create(name="Bitmap Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 1", theater=self.theater, capacity=20
+        )
+        for row in "AB":
+            for number in range(1, 11):
+                Seat.objects.create(screen=self.screen, row=row, number=number)
+
+        self.movie = Movie.objects.create(
+            title="Bitmap Movie",
+            duration=120,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            start_time=timezone.now() + timedelta(days=1),
+        )
+
+        self.user = User.objects.create_user(username="viewer", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.booking_url = reverse("booking-list")
+        self.seat_map_url = reverse("seat_map_api", args=[self.showtime.id])
+
+    def book(self, *seats):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(
+                self.booking_url,
+                {
+                    "showtime_id": self.showtime.id,
+                    "seats": [{"row": r, "number": n} for r, n in seats],
+                },
+                format="json",
+            )
+
+    def statuses(self):
+        return {
+            f"{seat['row']}{seat['number']}": seat["status"]
+            for seat in self.client.get(self.seat_map_url).data
+        }
+
+    def test_seat_map_is_built_from_database_on_first_read(self, mock_stripe):
+        # booked before the bitmap file exists
+        self.book(("A", 3))
+        bitmap_path = os.path.join(
+            self.tmp_dir.name, f"showtime-{self.showtime.id}.bin"
+        )
+        self.assertFalse(os.path.exists(bitmap_path))
+
+        statuses = self.statuses()
+        self.assertEqual(len(statuses), 20)
+        self.assertEqual(statuses["A3"], "taken")
+        self.assertEqual(statuses["A4"], "available")
+
+    def test_bookings_update_bitmap_incrementally(self, mock_stripe):
+        self.statuses()  # build the bitmap
+
+        response = self.book(("B", 1), ("B", 2))
+        self.assertEqual(self.statuses()["B2"], "taken")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("booking-cancel", args=[response.data["id"]]))
+        self.assertEqual(self.statuses()["B2"], "available")
+
+    def test_steady_state_reads_skip_ticket_table(self, mock_stripe):
+        self.statuses()
+        self.book(("A", 1))
+        self.statuses()  # catch up with the booking
+
+        # occupancy comes from the bitmap and the layout from the cache, the
+        # seat/layout versions and price inputs are one showtime lookup
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.seat_map_url)
+        self.assertEqual(len(queries), 1)
+        for query in queries.captured_queries:
+            self.assertNotIn("bookings_ticket", query["sql"])
+
+    def test_changes_from_other_processes_are_replayed(self, mock_stripe):
+        self.statuses()
+        bitmap, _ = seat_bitmap.load(self.showtime.id)
+        self.assertEqual(bitmap.version, 0)
+
+        # as if confirmed by the stripe worker: only the database changed
+        self.book(("A", 1), ("A", 2))
+        Booking.objects.get(user=self.user).tickets.filter(seat__number=2).delete()
+        self.showtime.refresh_from_db()
+
+        statuses = self.statuses()
+        self.assertEqual(statuses["A1"], "taken")
+        # replayed from the seat events, not recounted from the tickets
+        self.assertEqual(statuses["A2"], "taken")
+        self.assertEqual(bitmap.version, self.showtime.seat_version)
+
+    def test_expired_hold_reads_as_available(self, mock_stripe):
+        self.statuses()
+        self.book(("A", 1))
+        SeatEvent.objects.update(expires_at=timezone.now() - timedelta(seconds=5))
+
+        self.assertEqual(self.statuses()["A1"], "available")
+
+    def test_unknown_showtime_returns_404(self, mock_stripe):
+        response = self.client.get(reverse("seat_map_api", args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+
+class CompactSeatMapTests(APITestCase):
+    def setUp(self):
+        stripe_patch = patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+        stripe_patch.start()
+        self.addCleanup(stripe_patch.stop)
+
+        theater = Theater.objects.create(name="Compact Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=7)
+        for number in range(1, 5):
+            Seat.objects.create(screen=screen, row="A", number=number)
+        for number in (1, 2, 5):
+            Seat.objects.create(screen=screen, row="B", number=number)
+        Seat.objects.create(screen=screen, row="C", number=1, seat_type="VIP")
+
+        movie = Movie.objects.create(
+            title="Compact Movie",
+            duration=90,
+            release_date=timezone.now().date(),
+            base_price=Decimal("10.00"),
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie,
+            screen=screen,
+            start_time=timezone.now().replace(hour=18) + timedelta(days=1),
+        )
+        self.user = User.objects.create_user(username="mobile", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.client.post(
+            reverse("booking-list"),
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "A", "number": 2}, {"row": "B", "number": 5}],
+            },
+            format="json",
+        )
+        self.url = reverse("seat_map_api", args=[self.showtime.id])
+
+    def test_format_parameter_selects_compact_rows(self):
+        response = self.client.get(self.url, {"format": "compact"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json(),
+            {
+                "prices": {"R": "10.00", "P": "15.00", "V": "20.00"},
+                "rows": [
+                    {"row": "A", "start": 1, "status": "0100"},
+                    {"row": "B", "start": 1, "status": "001", "numbers": [1, 2, 5]},
+                    {"row": "C", "start": 1, "status": "0", "types": "V"},
+                ]
+            },
+        )
+
+    def test_accept_header_selects_compact_rows(self):
+        response = self.client.get(
+            self.url, HTTP_ACCEPT="application/vnd.seatmap.compact+json"
+        )
+        self.assertEqual(
+            response["Content-Type"], "application/vnd.seatmap.compact+json"
+        )
+        self.assertEqual(response.json()["rows"][0]["status"], "0100")
+
+    def test_default_format_is_unchanged(self):
+        response = self.client.get(self.url)
+        self.assertEqual(len(response.json()), 8)
+        self.assertEqual(response.json()[1]["status"], "taken")
+        self.assertEqual(response.json()[7]["price"], "20.00")
+
+
+@override_settings(SEAT_STREAM_MAX_SECONDS=0, SEAT_STREAM_POLL_INTERVAL=0)
+class SeatStreamTests(APITestCase):
+    def setUp(self):
+        stripe_patch = patch("stripe.PaymentIntent.create", return_value=FAKE_INTENT)
+        stripe_patch.start()
+        self.addCleanup(stripe_patch.stop)
+
+        theater = Theater.objects.create(name="Stream Cinema", city="Test City")
+        screen = Screen.objects.create(name="Screen 1", theater=theater, capacity=3)
+        for number in range(1, 4):
+            Seat.objects.create(screen=screen, row="A", number=number)
+        movie = Movie.objects.create(
+            title="Stream Movie", duration=90, release_date=timezone.now().date()
+        )
+        self.showtime = Showtime.objects.create(
+            movie=movie, screen=screen, start_time=timezone.now() + timedelta(days=1)
+        )
+        self.user = User.objects.create_user(username="streamer", password="pw")
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("seat_stream", args=[self.showtime.id])
+
+    def book(self, number):
+        return self.client.post(
+            reverse("booking-list"),
+            {
+                "showtime_id": self.showtime.id,
+                "seats": [{"row": "A", "number": number}],
+            },
+            format="json",
+        )
+
+    async def read_stream(self, **params):
+        response = await self.async_client.get(self.url, params)
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        return b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+    async def test_fresh_client_gets_snapshot(self):
+        await sync_to_async(self.book)(2)
+
+        body = await self.read_stream()
+
+        self.assertIn("event: snapshot", body)
+        self.assertIn('"status":"010"', body)
+        self.assertNotIn("event: seat", body)
+
+    async def test_since_replays_only_missed_changes(self):
+        await sync_to_async(self.book)(1)
+        version = (await SeatEvent.objects.alatest("version")).version
+        response = await sync_to_async(self.book)(3)
+        await sync_to_async(self.client.post)(
+            reverse("booking-cancel", args=[response.data["id"]])
+        )
+
+        body = await self.read_stream(since=version)
+
+        self.assertNotIn("event: snapshot", body)
+        self.assertNotIn('"number":1,', body)
+        self.assertIn('"row":"A","number":3,"status":"taken"', body)
+        self.assertIn('"row":"A","number":3,"status":"available"', body)
+
+    async def test_unknown_showtime_returns_404(self):
+        response = await self.async_client.get(reverse("seat_stream", args=[9999]))
+        self.assertEqual(response.status_code, 404)
+
+    async def test_watchers_of_a_showtime_share_one_feed(self):
+        with self.settings(SEAT_STREAM_MAX_SECONDS=5):
+            streams = [
+                streams_module._event_stream(self.showtime.id, 0) for _ in range(2)
+            ]
+            for stream in streams:
+                await anext(stream)  # the retry line
+            waiting = [asyncio.ensure_future(anext(stream)) for stream in streams]
+            feed = None
+            while feed is None or len(feed.subscribers) < 2:
+                await asyncio.sleep(0.01)
+                feed = streams_module._feeds.get(self.showtime.id)
+
+            await sync_to_async(self.book)(2)
+            messages = await asyncio.wait_for(asyncio.gather(*waiting), 5)
+
+        for message in messages:
+            self.assertIn('"row":"A","number":2,"status":"taken"', message)
+        for stream in streams:
+            await stream.aclose()
+        # the feed stops with its last watcher
+        await asyncio.wait_for(feed.task, 5)
+        self.assertNotIn(self.showtime.id, streams_module._feeds)
+
+    async def test_versions_count_up_per_showtime(self):
+        await sync_to_async(self.book)(1)
+        response = await sync_to_async(self.book)(2)
+        await sync_to_async(self.client.post)(
+            reverse("booking-cancel", args=[response.data["id"]])
+        )
+
+        versions = [
+            version
+            async for version in SeatEvent.objects.filter(
+                showtime=self.showtime
+            ).values_list("version", flat=True).order_by("id")
+        ]
+        self.assertEqual(versions, [1, 2, 3])
+        await self.showtime.arefresh_from_db()
+        self.assertEqual(self.showtime.seat_version, 3)
+
+
+class ShowtimePaginationTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Paging Cinema", city="Test City")
+        movie = Movie.objects.create(
+            title="Paging Movie", duration=60, release_date=timezone.now().date()
+        )
+        start = timezone.now() + timedelta(days=1)
+        # two screens starting together, so id has to break the ties
+        for name in ("Screen 1", "Screen 2"):
+            screen = Screen.objects.create(name=name, theater=theater, capacity=1)
+            for i in range(6):
+                Showtime.objects.create(
+                    movie=movie,
+                    screen=screen,
+                    start_time=start + timedelta(hours=2 * i),
+                )
+
+    def test_cursor_pages_are_ordered_by_start_time(self):
+        response = self.client.get(reverse("showtimes-list"))
+        self.assertNotIn("count", response.data)
+        showtimes = response.data["results"]
+        response = self.client.get(response.data["next"])
+        showtimes += response.data["results"]
+
+        self.assertIsNone(response.data["next"])
+        self.assertEqual(
+            [showtime["id"] for showtime in showtimes],
+            list(
+                Showtime.objects.order_by("start_time", "id").values_list(
+                    "id", flat=True
+                )
+            ),
+        )
+
+
+class ShowtimeListQueryTests(APITestCase):
+    def setUp(self):
+        start = timezone.now() + timedelta(days=1)
+        for i in range(4):
+            theater = Theater.objects.create(name=f"Cinema {i}", city="Test City")
+            screen = Screen.objects.create(
+                name="Screen 1", theater=theater, capacity=1
+            )
+            movie = Movie.objects.create(
+                title=f"Movie {i}",
+                description="A very long synopsis. " * 200,
+                duration=60,
+                release_date=timezone.now().date(),
+            )
+            Showtime.objects.create(
+                movie=movie, screen=screen, start_time=start + timedelta(hours=i)
+            )
+
+    def test_list_is_one_query_without_descriptions(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("showtimes-list"))
+
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn("description", queries[0]["sql"])
+
+        showtimes = response.data["results"]
+        self.assertEqual(len(showtimes), 4)
+        self.assertEqual(showtimes[0]["screen"]["theater"]["name"], "Cinema 0")
+        self.assertNotIn("description", showtimes[0]["movie"])
+
+    def test_retrieve_is_one_query_with_the_full_movie(self):
+        showtime = Showtime.objects.first()
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse("showtimes-detail", args=[showtime.id])
+            )
+
+        self.assertTrue(response.data["movie"]["description"].startswith("A very"))
+
+
+class BulkScheduleTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Multiplex", city="Test City")
+        self.screens = []
+        for number in range(1, 4):
+            screen = Screen.objects.create(
+                name=f"Screen {number}", theater=theater, capacity=2
+            )
+            Seat.objects.create(screen=screen, row="A", number=1)
+            Seat.objects.create(screen=screen, row="A", number=2)
+            self.screens.append(screen)
+        # 90 minutes + 15 minutes cleaning
+        self.movie = Movie.objects.create(
+            title="Bulk Movie", duration=90, release_date=timezone.now().date()
+        )
+        self.day = timezone.now().replace(
+            hour=10, minute=0, second=0, microsecond=0
+        ) + timedelta(days=2)
+        self.staff = User.objects.create_user(
+            username="programmer", password="pw", is_staff=True
+        )
+        self.client.force_authenticate(user=self.staff)
+        self.url = reverse("showtimes-bulk")
+
+    def entry(self, screen, hours):
+        return {
+            "movie": self.movie.id,
+            "screen": screen.id,
+            "start_time": (self.day + timedelta(hours=hours)).isoformat(),
+        }
+
+    def test_week_of_showtimes_in_constant_queries(self):
+        entries = [
+            self.entry(screen, day * 24 + slot * 2)
+            for screen in self.screens
+            for day in range(7)
+            for slot in range(5)
+        ]
+
+        # screens, movies, existing showtimes, seat counts, bulk insert (two
+        # statements under SQLite's parameter limit), movie catalog refresh
+        # (movie, upcoming showtimes, update) (+ savepoint pair)
+        with self.assertNumQueries(11):
+            response = self.client.post(
+                self.url, {"showtimes": entries}, format="json"
+            )
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 105)
+        self.movie.refresh_from_db()
+        self.assertEqual(self.movie.upcoming_showtime_count, 105)
+        showtime = Showtime.objects.get(id=response.data["ids"][0])
+        self.assertEqual(
+            showtime.end_time - showtime.start_time, timedelta(minutes=105)
+        )
+        self.assertEqual(showtime.capacity, 2)
+
+    def test_conflicts_are_reported_per_row(self):
+        screen = self.screens[0]
+        Showtime.objects.create(movie=self.movie, screen=screen, start_time=self.day)
+        Showtime.objects.create(
+            movie=self.movie,
+            screen=screen,
+            start_time=self.day + timedelta(hours=6),
+            is_cancelled=True,
+        )
+        entries = [
+            self.entry(screen, 1),  # overlaps the existing 10:00 show
+            self.entry(screen, 3),
+            self.entry(screen, 4),  # starts before row 1 is cleaned
+            self.entry(screen, 6),  # the cancelled show frees the slot
+            self.entry(self.screens[1], 1),
+            {**self.entry(screen, 9), "movie": 0},
+        ]
+
+        response = self.client.post(self.url, {"showtimes": entries}, format="json")
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            [conflict["index"] for conflict in response.data["conflicts"]],
+            [0, 1, 2, 5],
+        )
+        self.assertIn("Overlaps showtime", response.data["conflicts"][0]["error"])
+        self.assertIn("Overlaps row 1", response.data["conflicts"][2]["error"])
+        self.assertIn("Movie 0 does not exist", response.data["conflicts"][3]["error"])
+        self.assertEqual(Showtime.objects.count(), 2)
+
+    def test_dry_run_and_permissions(self):
+        response = self.client.post(
+            self.url,
+            {"showtimes": [self.entry(self.screens[0], 0)], "dry_run": True},
+            format="json",
+        )
+        self.assertEqual(response.data, {"created": 0, "conflicts": []})
+        self.assertFalse(Showtime.objects.exists())
+
+        self.client.force_authenticate(
+            user=User.objects.create_user(username="guest", password="pw")
+        )
+        response = self.client.post(
+            self.url, {"showtimes": [self.entry(self.screens[0], 0)]}, format="json"
+        )
+        self.assertEqual(response.status_code, 403)
+
+    def test_schedule_command_reads_csv(self):
+        path = os.path.join(tempfile.mkdtemp(), "week.csv")
+        self.addCleanup(os.remove, path)
+        with open(path, "w") as f:
+            f.write("movie,screen,start_time\n")
+            for hours in (0, 2):
+                entry = self.entry(self.screens[0], hours)
+                f.write(f"{entry['movie']},{entry['screen']},{entry['start_time']}\n")
+
+        out = StringIO()
+        call_command("schedule_showtimes", path, stdout=out)
+        self.assertIn("Scheduled 2 showtimes", out.getvalue())
+
+        with self.assertRaises(CommandError):
+            call_command("schedule_showtimes", path, stdout=StringIO())
+
+
+class ScheduleTemplateTests(APITestCase):
+    def setUp(self):
+        theater = Theater.objects.create(name="Template Cinema", city="Test City")
+        self.screen = Screen.objects.create(
+            name="Screen 3", theater=theater, capacity=1
+        )
+        Seat.objects.create(screen=self.screen, row="A", number=1)
+        # 150 minutes + 15 minutes cleaning
+        self.movie = Movie.objects.create(
+            title="Weekly Movie", duration=150, release_date=timezone.now().date()
+        )
+        self.tomorrow = timezone.localdate() + timedelta(days=1)
+        self.template = ScheduleTemplate.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            times=["13:00", "16:30", "20:00"],
+            start_date=self.tomorrow,
+            end_date=self.tomorrow + timedelta(days=27),
+            # Mondays and Saturdays
+            weekdays=0b0100001,
+        )
+
+    def test_materialize_is_incremental_and_idempotent(self):
+        created, conflicts = materialize_templates(days=40)
+        self.assertEqual((created, conflicts), (24, []))
+
+        showtimes = self.template.showtimes.all()
+        self.assertEqual(showtimes.count(), 24)
+        self.assertEqual(
+            {timezone.localtime(s.start_time).weekday() for s in showtimes}, {0, 5}
+        )
+        self.assertEqual(showtimes.first().capacity, 1)
+
+        self.assertEqual(materialize_templates(days=40), (0, []))
+
+        # a new time only adds its own occurrences
+        self.template.times.append("23:00")
+        self.template.save()
+        self.assertEqual(materialize_templates(days=40), (8, []))
+
+    def test_overlapping_occurrences_are_skipped_and_reported(self):
+        # a 14:00-16:45 showing collides with the 13:00 and 16:30 occurrences
+        first = next(self.template.occurrences(self.tomorrow, self.template.end_date))
+        Showtime.objects.create(
+            movie=self.movie,
+            screen=self.screen,
+            start_time=first + timedelta(hours=1),
+        )
+
+        out = StringIO()
+        call_command("materialize_schedules", "--days", "40", stdout=out)
+
+        self.assertIn("Created 22 showtimes", out.getvalue())
+        self.assertIn(f"Template {self.template.id} at", out.getvalue())
+        self.assertFalse(self.template.showtimes.filter(start_time=first).exists())
+
+    def test_invalid_templates_are_rejected(self):
+        template = ScheduleTemplate(
+            movie=self.movie,
+            screen=self.screen,
+            times=["25:00"],
+            start_date=self.tomorrow,
+            end_date=self.tomorrow,
+        )
+        with self.assertRaises(ValidationError):
+            template.full_clean()
@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ShowtimeViewSet, SeatMapView
+from .streams import seat_stream
 
 router = DefaultRouter()
 router.register(r"showtimes", ShowtimeViewSet, basename="showtimes")
@@ -9,4 +10,6 @@ urlpatterns = [
     path("", include(router.urls)),
     # Custom endpoint for the seat map
     path("showtimes/<int:showtime_id>/seats/", SeatMapView.as_view(), name="seat_map_api"),
+    # Live seat status changes (Server-Sent Events, needs the ASGI server)
+    path("showtimes/<int:showtime_id>/seats/stream/", seat_stream, name="seat_stream"),
 ]
@@ -1,3 +1,4 @@
+from django.db.models import Count, Sum
 from django.db.models.manager import BaseManager
 from rest_framework import viewsets, views, status
 from rest_framework.response import Response
@@ -6,11 +7,25 @@ from django.utils import timezone
 from drf_spectacular.utils import extend_schema, inline_serializer
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from rest_framework.settings import api_settings
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
 
 
 from .models import Showtime
-from .serializers import ShowtimeSerializer, CreateShowtimeSerializer
-from bookings.models import Ticket
+from .serializers import (
+    ShowtimeSerializer,
+    ShowtimeListSerializer,
+    CreateShowtimeSerializer,
+    BulkScheduleSerializer,
+)
+from .renderers import CompactSeatMapRenderer
+from .pagination import ShowtimeCursorPagination
+from .occupancy import load_seat_map
+from .scheduling import schedule_showtimes
+from bookings.models import Refund
+from bookings.services import cancel_showtime
+from bookings.pricing import normalize_seat_type
 from movies.permissions import IsAdminOrReadOnly
 
 
@@ -20,19 +35,143 @@ class ShowtimeViewSet(viewsets.ModelViewSet):
     filterset_fields = ["movie", "screen"]
     ordering_fields = ["start_time", "price_multiplier"]
     permission_classes = [IsAdminOrReadOnly]
+    # keyset pages, no OFFSET scan or COUNT(*) over every showtime
+    pagination_class = ShowtimeCursorPagination
 
-    def get_serializer_class(self) -> CreateShowtimeSerializer | ShowtimeSerializer:
+    def get_serializer_class(
+        self,
+    ) -> CreateShowtimeSerializer | ShowtimeSerializer | ShowtimeListSerializer:
         if self.action == "create":
             return CreateShowtimeSerializer
+        if self.action == "list":
+            return ShowtimeListSerializer
         return ShowtimeSerializer
 
     def get_queryset(self) -> BaseManager[Showtime]:
-        if self.request.user.is_superuser:
-            return Showtime.objects.all()
-        return Showtime.objects.filter(start_time__gt=timezone.now())
+        queryset = Showtime.objects.all()
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(start_time__gt=timezone.now())
+            # staff still reach cancelled showtimes to follow their refunds
+            if not self.request.user.is_staff:
+                queryset = queryset.filter(is_cancelled=False)
+
+        if self.action in ("list", "retrieve"):
+            # movie, screen and theater in the same query as the showtimes
+            queryset = queryset.select_related("movie", "screen__theater")
+        if self.action == "list":
+            # the list shows a movie summary, never read the long description
+            queryset = queryset.defer("movie__description")
+        return queryset
+
+    @extend_schema(request=BulkScheduleSerializer)
+    @action(detail=False, methods=["post"], permission_classes=[IsAdminUser])
+    def bulk(self, request):
+        """
+        Schedule many showtimes at once. Nothing is created when any row
+        overlaps another row or an existing showtime, the conflicts are
+        reported per row instead.
+        """
+        serializer = BulkScheduleSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        dry_run = serializer.validated_data["dry_run"]
+        created, conflicts = schedule_showtimes(
+            serializer.validated_data["showtimes"], dry_run=dry_run
+        )
+        if conflicts:
+            return Response(
+                {
+                    "error": f"{len(conflicts)} rows conflict, nothing was scheduled.",
+                    "conflicts": conflicts,
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if dry_run:
+            return Response({"created": 0, "conflicts": []})
+        return Response(
+            {"created": len(created), "ids": [showtime.id for showtime in created]},
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(detail=True, methods=["post"], permission_classes=[IsAdminUser])
+    def cancel(self, request, pk=None):
+        """Cancel the showtime, every booking on it, and queue their refunds."""
+        showtime = self.get_object()
+        if showtime.is_cancelled:
+            return Response(
+                {"error": "Showtime is already cancelled."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        cancelled, refunds = cancel_showtime(showtime)
+        return Response(
+            {"bookings_cancelled": cancelled, "refunds_queued": refunds},
+            status=status.HTTP_200_OK,
+        )
+
+    @action(detail=True, methods=["get"], permission_classes=[IsAdminUser])
+    def refunds(self, request, pk=None):
+        """Progress of the refunds queued for this showtime."""
+        showtime = self.get_object()
+        progress = {"pending": 0, "succeeded": 0, "failed": 0}
+        refunded = 0
+        rows = (
+            Refund.objects.filter(booking__showtime=showtime, action="refund")
+            .values("status")
+            .annotate(count=Count("id"), amount=Sum("amount"))
+        )
+        for row in rows:
+            progress[row["status"]] = row["count"]
+            if row["status"] == "succeeded":
+                refunded = row["amount"]
+
+        return Response(
+            {
+                "is_cancelled": showtime.is_cancelled,
+                **progress,
+                "refunded_amount": f"{refunded:.2f}",
+            }
+        )
+
+
+# 0/1 flag bytes -> b"0"/b"1"
+_BITSTRING = bytes.maketrans(b"\x00\x01", b"01")
+
+
+def compact_seat_map(layout, taken_flags, prices):
+    """Encode a seat map row by row straight from the occupancy flag bytes."""
+    flags = bytes(taken_flags).translate(_BITSTRING).decode("ascii")
+    # one letter per seat type (R, P, V), priced once in "prices"
+    types = "".join(
+        normalize_seat_type(seat_type)[0] for seat_type in layout.seat_types
+    )
+    rows = []
+    for row, start, numbers in layout.rows:
+        entry = {
+            "row": row,
+            "start": numbers[0],
+            "status": flags[start : start + len(numbers)],
+        }
+        # only rows with gaps in their numbering need the explicit numbers
+        if numbers[-1] - numbers[0] + 1 != len(numbers):
+            entry["numbers"] = numbers
+        # rows of regular seats are the common case, leave their types out
+        row_types = types[start : start + len(numbers)]
+        if row_types.strip("R"):
+            entry["types"] = row_types
+        rows.append(entry)
+    return {
+        "prices": {seat_type[0]: str(price) for seat_type, price in prices.items()},
+        "rows": rows,
+    }
 
 
 class SeatMapView(views.APIView):
+    renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES + [
+        CompactSeatMapRenderer
+    ]
+
     @extend_schema(
         responses=inline_serializer(
             name="SeatMapResponse",
@@ -41,35 +180,34 @@ class SeatMapView(views.APIView):
                 "row": serializers.CharField(),
                 "number": serializers.IntegerField(),
                 "status": serializers.CharField(),
+                "seat_type": serializers.CharField(),
+                "price": serializers.DecimalField(max_digits=6, decimal_places=2),
             },
             many=True,
         )
     )
     def get(self, request, showtime_id=None):
-        try:
-            showtime = Showtime.objects.get(pk=showtime_id)
-        except Showtime.DoesNotExist:
+        # prices are cached by their inputs, read with the same showtime lookup
+        seat_map = load_seat_map(showtime_id)
+        if seat_map is None:
             return Response(
                 {"error": "Showtime not found."}, status=status.HTTP_404_NOT_FOUND
             )
+        layout, taken_flags, prices = seat_map
 
-        # get all seats for the screen associated with the showtime
-        seats = showtime.screen.seats.all().order_by("row", "number")
+        if request.accepted_renderer.format == CompactSeatMapRenderer.format:
+            return Response(compact_seat_map(layout, taken_flags, prices))
 
-        # get taken seats for the showtime
-        taken_seat_ids = Ticket.objects.filter(
-            booking__showtime=showtime, booking__status__in=["Confirmed", "Pending"]
-        ).values_list("seat_id", flat=True)
-
-        seat_data = []
-        for seat in seats:
-            seat_data.append(
-                {
-                    # "id": seat.id,
-                    "row": seat.row,
-                    "number": seat.number,
-                    "status": "taken" if seat.id in taken_seat_ids else "available",
-                }
-            )
+        seat_data = [
+            {
+                # "id": seat_id,
+                "row": row,
+                "number": number,
+                "status": "taken" if taken_flags[ordinal] else "available",
+                "seat_type": seat_type,
+                "price": str(prices[normalize_seat_type(seat_type)]),
+            }
+            for ordinal, seat_id, row, number, seat_type in layout.seats()
+        ]
 
         return Response(seat_data)